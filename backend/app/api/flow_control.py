@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from ..core.config import (ADMISSION_MAX_SESSIONS, FLOW_MAX_FPS, FLOW_MIN_FPS, FLOW_ROI_PADDING, FLOW_TARGET_UTILIZATION,
+                           FLOW_UPDATE_INTERVAL, FRAME_EXECUTOR_WORKERS)
+from ..core.executor import executor_backlog
+
+# Frame sizes and JPEG qualities a client is stepped down through as the worker gets busier.
+# The first one is what the web client always sent before flow control.
+RESOLUTION_LADDER = ((320, 240, 0.7), (256, 192, 0.6), (160, 120, 0.5))
+INITIAL_FPS = 4  # Until frames have been timed: the web client's historic fixed rate
+# Part of a frame's cost that does not shrink with its pixel count (contour search setup, messages)
+FIXED_COST_FRACTION = 0.4
+_REFERENCE_PIXELS = RESOLUTION_LADDER[0][0] * RESOLUTION_LADDER[0][1]
+_EWMA_ALPHA = 0.1
+
+
+def cost_ratio(pixels: int) -> float:
+    """
+    Cost of a frame of `pixels` pixels relative to one at the first ladder resolution.
+    """
+    return FIXED_COST_FRACTION + (1 - FIXED_COST_FRACTION) * pixels / _REFERENCE_PIXELS
+
+
+class AdmissionController:
+    """
+    Worker-wide frame budget shared by the sessions of this worker.
+
+    Every processed frame reports its service time, normalized to the first ladder resolution. The
+    worker can sustain about parallelism / cost frames per second; FLOW_TARGET_UTILIZATION of that
+    is split evenly between sessions, and halved while the frame executor has a backlog. New
+    sessions are refused once even the smallest resolution at FLOW_MIN_FPS would not fit.
+    """
+
+    def __init__(self, max_sessions: int = ADMISSION_MAX_SESSIONS, utilization: float = FLOW_TARGET_UTILIZATION):
+        self.max_sessions = max_sessions
+        self.utilization = utilization
+        self.parallelism = max(1, min(FRAME_EXECUTOR_WORKERS, os.cpu_count() or 1))
+        self.cost = None  # EWMA of the normalized per-frame service time in seconds
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, pixels: int):
+        normalized = seconds / cost_ratio(pixels)
+        with self._lock:
+            self.cost = normalized if self.cost is None else self.cost + _EWMA_ALPHA * (normalized - self.cost)
+
+    def capacity(self) -> Optional[float]:
+        """
+        Frames per second (at the first ladder resolution) this worker can serve, None before any frame.
+        """
+        if self.cost is None:
+            return None
+        capacity = self.parallelism * self.utilization / self.cost
+        if executor_backlog() > self.parallelism:
+            capacity /= 2  # Jobs are queueing: the estimate is behind, back off until it catches up
+        return capacity
+
+    def share(self, sessions: int) -> Optional[float]:
+        capacity = self.capacity()
+        return None if capacity is None else capacity / max(1, sessions)
+
+    def admit(self, sessions: int) -> bool:
+        """
+        Whether a new session may join the `sessions` already served.
+        """
+        admitted = not (self.max_sessions and sessions >= self.max_sessions)
+        share = self.share(sessions + 1)
+        lowest = RESOLUTION_LADDER[-1]
+        if admitted and share is not None:
+            admitted = share / cost_ratio(lowest[0] * lowest[1]) >= FLOW_MIN_FPS
+        if admitted:
+            self.admitted += 1
+        else:
+            self.rejected += 1
+        return admitted
+
+    def stats(self) -> dict:
+        capacity = self.capacity()
+        return {
+            "frame_cost_ms": round(self.cost * 1000, 3) if self.cost is not None else None,
+            "capacity_fps": round(capacity, 1) if capacity is not None else None,
+            "parallelism": self.parallelism,
+            "max_sessions": self.max_sessions,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionController()
+        return _admission
+
+
+def _padded_roi(bbox, frame_shape, padding: float, crop=None):
+    """
+    Normalized (x, y, w, h) in the client's full frame of the bbox grown by `padding` of its size on
+    every side. bbox is in the pixels of a frame the client cut from `crop` (normalized, None for
+    its whole frame). None when the bbox touches the edge of a cropped frame: the cube may extend
+    past the crop, which must widen again rather than keep narrowing onto part of it.
+    """
+    x, y, w, h = bbox
+    height, width = frame_shape[:2]
+    if crop is not None and (x <= 0 or y <= 0 or x + w >= width or y + h >= height):
+        return None
+    cx, cy, cw, ch = crop if crop is not None else (0.0, 0.0, 1.0, 1.0)
+    x0, y0 = max(0, x - w * padding), max(0, y - h * padding)
+    x1, y1 = min(width, x + w * (1 + padding)), min(height, y + h * (1 + padding))
+    # Two decimals: small jitter of the bbox does not warrant a new message
+    return [round(cx + x0 / width * cw, 2), round(cy + y0 / height * ch, 2),
+            round((x1 - x0) / width * cw, 2), round((y1 - y0) / height * ch, 2)]
+
+
+class FlowController:
+    """
+    Targets sent to one client in "flow_control" messages: frame rate, frame size, JPEG quality and
+    the region of its full camera frame to crop to (normalized, None for the whole frame).
+
+    The frame rate is the session's share of the worker budget; when that share falls below
+    FLOW_MIN_FPS the client steps down RESOLUTION_LADDER, whose smaller frames cost less. A session
+    that keeps dropping frames is also slowed down, since it is sending faster than it is served.
+    """
+
+    def __init__(self, admission: AdmissionController = None, roi_padding: float = FLOW_ROI_PADDING):
+        self.admission = admission if admission is not None else get_admission_controller()
+        self.roi_padding = roi_padding
+        self.last_sent = None
+        self.last_update = 0.0
+        self.last_dropped = 0
+
+    def target(self, sessions: int, dropped: int, bbox=None, frame_shape=None, crop=None) -> dict:
+        share = self.admission.share(sessions)
+        level = "normal"
+        width, height, quality = RESOLUTION_LADDER[0]
+        if share is None:
+            fps = INITIAL_FPS
+        else:
+            for width, height, quality in RESOLUTION_LADDER:
+                fps = share / cost_ratio(width * height)
+                if fps >= FLOW_MIN_FPS:
+                    break
+            else:
+                level = "overloaded"
+            if (width, height) != RESOLUTION_LADDER[0][:2] and level == "normal":
+                level = "degraded"
+        if dropped > self.last_dropped and self.last_sent is not None:
+            fps = min(fps, self.last_sent["fps"] * 0.8)
+        self.last_dropped = dropped
+        fps = round(min(max(fps, FLOW_MIN_FPS), FLOW_MAX_FPS), 1)
+        roi = _padded_roi(bbox, frame_shape, self.roi_padding, crop) if bbox is not None and frame_shape is not None else None
+        return {"status": "flow_control", "level": level, "fps": fps, "max_width": width, "max_height": height,
+                "jpeg_quality": quality, "roi": roi}
+
+    def update(self, sessions: int, dropped: int, bbox=None, frame_shape=None, crop=None, force: bool = False) -> Optional[dict]:
+        """
+        The message to send, at most every FLOW_UPDATE_INTERVAL seconds and only when something changed.
+        """
+        now = time.monotonic()
+        if not force and now - self.last_update < FLOW_UPDATE_INTERVAL:
+            return None
+        self.last_update = now
+        message = self.target(sessions, dropped, bbox, frame_shape, crop)
+        if message == self.last_sent:
+            return None
+        self.last_sent = message
+        return message
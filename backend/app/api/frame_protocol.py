@@ -0,0 +1,125 @@
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Binary frame layout (little-endian, 32 byte header followed by the payload):
+#   magic     4s  b'RBXF'
+#   version   B   protocol version
+#   encoding  B   ENCODING_* value
+#   flags     H   FLAG_* bits
+#   frame_id  I   client frame counter
+#   timestamp d   client capture time in milliseconds
+#   bbox      4H  x, y, w, h crop in payload pixels (valid when FLAG_HAS_BBOX is set), or the
+#                 region of its full camera frame the client cut the payload from, in 1/CROP_UNITS
+#                 of that frame (when FLAG_CLIENT_CROP is set instead)
+#   width     H   payload width (required for raw encodings)
+#   height    H   payload height (required for raw encodings)
+FRAME_MAGIC = b'RBXF'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sBBHId4HHH')
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+
+ENCODING_JPEG = 0
+ENCODING_BGR = 1
+ENCODING_YUV420 = 2  # planar I420
+
+ENCODINGS = {
+    'jpeg': ENCODING_JPEG,
+    'bgr': ENCODING_BGR,
+    'yuv420': ENCODING_YUV420,
+}
+ENCODINGS_BY_ID = {value: name for name, value in ENCODINGS.items()}
+
+FLAG_HAS_BBOX = 0x1
+FLAG_CLIENT_CROP = 0x2
+CROP_UNITS = 10000
+
+
+@dataclass
+class BinaryFrame:
+    frame_id: int
+    timestamp: float
+    encoding: int
+    bbox: Optional[Tuple[int, int, int, int]]
+    crop: Optional[Tuple[float, float, float, float]]  # Client-side crop, normalized to its full frame
+    width: int
+    height: int
+    payload: np.ndarray  # uint8 view over the received buffer, no copy
+
+
+def negotiate(requested):
+    """
+    Pick the encodings both sides support from a client "hello" message.
+    Returns the accepted encoding names, JPEG first when offered.
+    """
+    if not requested:
+        return ['jpeg']
+    return [name for name in ENCODINGS if name in requested]
+
+
+def parse_frame(buffer) -> BinaryFrame:
+    """
+    Parse a binary frame header and expose the payload as a zero-copy uint8 view.
+    Raises ValueError for malformed frames.
+    """
+    if len(buffer) < FRAME_HEADER_SIZE:
+        raise ValueError(f"Binary frame too short: {len(buffer)} bytes")
+    magic, version, encoding, flags, frame_id, timestamp, x, y, w, h, width, height = FRAME_HEADER.unpack_from(buffer)
+    if magic != FRAME_MAGIC:
+        raise ValueError("Invalid binary frame magic")
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported binary frame version {version}")
+    if encoding not in ENCODINGS_BY_ID:
+        raise ValueError(f"Unsupported frame encoding {encoding}")
+    if flags & FLAG_HAS_BBOX and flags & FLAG_CLIENT_CROP:
+        raise ValueError("A binary frame carries either a bbox or a client crop, not both")
+    payload = np.frombuffer(buffer, np.uint8, offset=FRAME_HEADER_SIZE)
+    bbox = (x, y, w, h) if flags & FLAG_HAS_BBOX else None
+    crop = tuple(v / CROP_UNITS for v in (x, y, w, h)) if flags & FLAG_CLIENT_CROP else None
+    return BinaryFrame(frame_id, timestamp, encoding, bbox, crop, width, height, payload)
+
+
+def decode_frame(frame: BinaryFrame):
+    """
+    Decode the payload of a binary frame into a BGR image.
+    Raw encodings are reshaped in place; only JPEG goes through cv2.imdecode.
+    Returns None when the payload cannot be decoded.
+    """
+    if frame.encoding == ENCODING_JPEG:
+        return cv2.imdecode(frame.payload, cv2.IMREAD_COLOR)
+    if frame.width == 0 or frame.height == 0:
+        return None
+    if frame.encoding == ENCODING_BGR:
+        expected = frame.width * frame.height * 3
+        if frame.payload.size != expected:
+            return None
+        return frame.payload.reshape(frame.height, frame.width, 3)
+    if frame.encoding == ENCODING_YUV420:
+        expected = frame.width * frame.height * 3 // 2
+        if frame.payload.size != expected:
+            return None
+        yuv = frame.payload.reshape(frame.height * 3 // 2, frame.width)
+        return cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)
+    return None
+
+
+def encode_frame(payload: bytes, frame_id: int = 0, timestamp: float = 0.0, encoding: int = ENCODING_JPEG,
+                 bbox=None, width: int = 0, height: int = 0, crop=None) -> bytes:
+    """
+    Build a binary frame. Used by tooling that talks to /ws like the browser client.
+    crop is the normalized region of the full frame the payload was cut from.
+    """
+    if bbox and crop:
+        raise ValueError("A binary frame carries either a bbox or a client crop, not both")
+    flags = FLAG_HAS_BBOX if bbox else (FLAG_CLIENT_CROP if crop else 0)
+    if bbox:
+        x, y, w, h = (int(v) for v in bbox)
+    elif crop:
+        x, y, w, h = (min(CROP_UNITS, max(0, round(v * CROP_UNITS))) for v in crop)
+    else:
+        x, y, w, h = 0, 0, 0, 0
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, encoding, flags, frame_id, timestamp, x, y, w, h, width, height)
+    return header + payload
@@ -0,0 +1,144 @@
+import mmap
+import struct
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional, Union
+
+# Session recording layout (little-endian): a 16 byte file header followed by one record per
+# /ws message, in the order the session saw them.
+#   file header   magic 4s b'RBXR', version B, reserved 3x, started d (wall clock seconds)
+#   record header length I (payload bytes), offset d (seconds since started),
+#                 direction B (DIRECTION_*), kind B (KIND_*), reserved 2x
+# Records are length-prefixed so a reader can skip payloads it does not need, and a recording
+# cut short by a crash is readable up to its last complete record.
+RECORDING_MAGIC = b'RBXR'
+RECORDING_VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3xd')
+RECORD_HEADER = struct.Struct('<IdBB2x')
+
+DIRECTION_IN = 0   # Client to server
+DIRECTION_OUT = 1  # Server to client
+
+KIND_TEXT = 0
+KIND_BINARY = 1
+
+
+@dataclass
+class RecordedMessage:
+    offset: float  # Seconds since the recording started
+    direction: int
+    data: Union[str, memoryview]  # Text messages are decoded; binary ones are views into the mapping
+
+    @property
+    def binary(self) -> bool:
+        return not isinstance(self.data, str)
+
+
+class RecordingWriter:
+    """
+    Append the messages of one /ws session to a recording file. Writes are buffered; the file is
+    complete once closed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self.messages = 0
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, self.started))
+
+    def write(self, direction: int, data: Union[str, bytes], offset: Optional[float] = None):
+        """
+        Append one message; offset (seconds since the start) defaults to the time elapsed since then.
+        """
+        if offset is None:
+            offset = time.perf_counter() - self._clock
+        if isinstance(data, str):
+            kind, data = KIND_TEXT, data.encode()
+        else:
+            kind = KIND_BINARY
+        self._file.write(RECORD_HEADER.pack(len(data), offset, direction, kind))
+        self._file.write(data)
+        self.messages += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """
+    A session recording memory-mapped for replay. Iterating yields RecordedMessage objects whose
+    binary payloads are zero-copy views into the mapping, valid until the recording is closed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < FILE_HEADER.size:
+            raise ValueError(f"{path} is too short for a session recording")
+        magic, version, self.started = FILE_HEADER.unpack_from(self._map)
+        if magic != RECORDING_MAGIC:
+            raise ValueError(f"{path} is not a session recording")
+        if version != RECORDING_VERSION:
+            raise ValueError(f"Unsupported session recording version {version}")
+        self._view = memoryview(self._map)
+        self._index = None
+
+    def _records(self) -> list:
+        # File offset of every complete record, found on first use
+        if self._index is None:
+            index = []
+            pos = FILE_HEADER.size
+            end = len(self._map)
+            while pos + RECORD_HEADER.size <= end:
+                length = RECORD_HEADER.unpack_from(self._map, pos)[0]
+                if pos + RECORD_HEADER.size + length > end:
+                    break  # Truncated last record
+                index.append(pos)
+                pos += RECORD_HEADER.size + length
+            self._index = index
+        return self._index
+
+    def _read(self, pos: int) -> RecordedMessage:
+        length, offset, direction, kind = RECORD_HEADER.unpack_from(self._map, pos)
+        start = pos + RECORD_HEADER.size
+        data = self._view[start:start + length]
+        return RecordedMessage(offset, direction, bytes(data).decode() if kind == KIND_TEXT else data)
+
+    def __len__(self) -> int:
+        return len(self._records())
+
+    def __getitem__(self, idx: int) -> RecordedMessage:
+        return self._read(self._records()[idx])
+
+    def __iter__(self) -> Iterator[RecordedMessage]:
+        for pos in self._records():
+            yield self._read(pos)
+
+    def messages(self, direction: Optional[int] = DIRECTION_IN) -> list:
+        """
+        Recorded messages in one direction (all of them when direction is None).
+        """
+        return [message for message in self if direction is None or message.direction == direction]
+
+    @property
+    def duration(self) -> float:
+        return self[-1].offset if len(self) else 0.0
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
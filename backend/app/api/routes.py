@@ -1,13 +1,22 @@
-import base64
-import cv2
-import numpy as np
-import logging
+import json
+import os
 import time
-from collections import deque
-from fastapi import APIRouter, WebSocket
-from ..services.cube_detector import CubeDetector
-from ..services.solver import Solver
-from ..services.move_analyzer import MoveAnalyzer
+from fastapi import APIRouter, Request, WebSocket
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from .flow_control import get_admission_controller
+from .session import ScanSession, active_sessions
+from ..services.anytime_solver import AnytimeSolve
+from ..services.calibration_store import get_calibration_profiles
+from ..services.classify_batcher import get_classify_batcher
+from ..services.shallow_index import get_shallow_index
+from ..services.solution_cache import get_solution_cache
+from ..services.scan_pool import iter_units, scan_stream
+from ..services.solver_pool import parse_batch_item, solve_stream
+from ..core.config import SCAN_BATCH_ROOT, SOLVER_BUDGET_MS, SOLVER_TARGET_LENGTH
+from ..core.executor import executor_backlog
+from ..core.metrics import REGISTRY
+from ..core.profiling import ProfileCapture, arm, disarm
+from ..core.startup import startup_report
 from ..core.logging_config import logger, set_log_level
 
 router = APIRouter()
@@ -16,244 +25,162 @@ router = APIRouter()
 async def health_check():
     return {"status": "ok", "message": "Backend is healthy"}
 
-@router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    detector = CubeDetector()
-    solver_service = Solver()
-    analyzer = MoveAnalyzer()
-
-    faces = ['front', 'right', 'back', 'left', 'top', 'bottom']
-    faces_states = [None] * 6
-    current_face = 0
-    cube_present = False
-    calibration_mode = False
-    calibration_colors = ['Y', 'W', 'R', 'G', 'B', 'O']  # Order for calibration
-    current_calibration_color = 0
-    last_calibration_img = None
-
-    # Performance monitoring
-    processing_times = deque(maxlen=10)
-    detection_success_count = 0
-    detection_failure_count = 0
-    frame_count = 0
-
+@router.get("/startup")
+async def startup_stats():
+    return startup_report()
+
+@router.get("/sessions")
+async def sessions_stats():
+    return {"active_sessions": len(active_sessions), "executor_backlog": executor_backlog(),
+            "admission": get_admission_controller().stats(), "classify_batching": get_classify_batcher().stats(),
+            "sessions": [session.stats() for session in active_sessions.values()]}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format; each server worker process reports its own registry
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@router.post("/profile")
+async def profile(mode: str = "sampling", frames: int = None, seconds: float = None, session_id: int = None, format: str = "json"):
+    """
+    Profile the next `frames` frames or `seconds` seconds of this worker, or of one session.
+    Returns stage timings plus collapsed stacks (sampling) or the top functions (cprofile);
+    format=collapsed returns only the stacks, ready for flamegraph.pl or speedscope.
+    """
+    if session_id is not None and session_id not in active_sessions:
+        return {"status": "error", "message": f"No active session {session_id}"}
     try:
-        while True:
-            data = await websocket.receive_json()
-            logger.debug(f"Received data: {data['type']}")
-
-            # Validate cubeBbox coordinates if present
-            cube_bbox = data.get("cubeBbox")
-            if cube_bbox and (not isinstance(cube_bbox, list) or len(cube_bbox) != 4):
-                await websocket.send_json({"status": "error", "message": "Invalid cubeBbox format. Expected list of 4 numbers."})
-                logger.warning("Invalid cubeBbox format received")
-                continue
-
-            if data["type"] == "start_calibration":
-                calibration_mode = True
-                current_calibration_color = 0
-                await websocket.send_json({"status": "calibration_started", "message": f"Calibration started. Show the {calibration_colors[current_calibration_color]} face."})
-                logger.info("Calibration started")
-
-            elif data["type"] == "calibrate_specific_color":
-                color = data.get("color")
-                if color in calibration_colors:
-                    calibration_mode = True
-                    current_calibration_color = calibration_colors.index(color)
-                    await websocket.send_json({"status": "calibration_specific", "message": f"Calibrating {color}. Show the {color} face."})
-                    logger.info(f"Calibrating specific color: {color}")
-                else:
-                    await websocket.send_json({"status": "error", "message": "Invalid color for calibration."})
-                    logger.warning(f"Invalid color for calibration: {color}")
-
-            elif data["type"] == "reset_calibration":
-                detector.reset_calibration()
-                await websocket.send_json({"status": "calibration_reset", "message": "Calibration reset to default."})
-                logger.info("Calibration reset to default")
-
-            elif data["type"] == "frame":
-                frame_receive_time = time.time()
-                frame_count += 1
-                logger.debug(f"Received frame {frame_count} from frontend, data length: {len(data['data'])}")
-                try:
-                    image_data = base64.b64decode(data["data"])
-                    logger.debug(f"Base64 decoded, length: {len(image_data)}")
-                    np_img = np.frombuffer(image_data, np.uint8)
-                    img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
-                    if img is None:
-                        logger.error("Failed to decode image with OpenCV")
-                        await websocket.send_json({"status": "detection_error", "message": "Failed to decode image"})
-                        continue
-                    logger.debug(f"Image decoded successfully, shape: {img.shape}")
-
-                    # Frame preprocessing
-                    # Brightness/contrast normalization
-                    img = cv2.convertScaleAbs(img, alpha=1.2, beta=10)  # Increase contrast and brightness
-                    # Gaussian blur for noise reduction
-                    img = cv2.GaussianBlur(img, (3, 3), 0)
-                    # Resize optimization for faster processing (max 640x480)
-                    height, width = img.shape[:2]
-                    if width > 640 or height > 480:
-                        aspect_ratio = width / height
-                        if width > height:
-                            new_width = 640
-                            new_height = int(640 / aspect_ratio)
-                        else:
-                            new_height = 480
-                            new_width = int(480 * aspect_ratio)
-                        img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-                        logger.debug(f"Resized image to {new_width}x{new_height}")
-
-                    # Check for cubeBbox in data and crop image accordingly
-                    bbox = data.get("cubeBbox")
-                    if bbox and isinstance(bbox, list) and len(bbox) == 4:
-                        x, y, w, h = bbox
-                        # Validate bbox coordinates
-                        x = max(0, int(x))
-                        y = max(0, int(y))
-                        w = max(1, int(w))
-                        h = max(1, int(h))
-                        if x + w > img.shape[1]:
-                            w = img.shape[1] - x
-                        if y + h > img.shape[0]:
-                            h = img.shape[0] - y
-                        img = img[y:y+h, x:x+w]
-                        logger.debug(f"Cropped image to bbox: x={x}, y={y}, w={w}, h={h}")
-
-                except Exception as e:
-                    logger.error(f"Error processing frame: {str(e)}")
-                    await websocket.send_json({"status": "detection_error", "message": f"Error processing frame: {str(e)}"})
-                    continue
-
-            elif calibration_mode:
-                # In calibration mode, detect the face and calibrate the color
-                processing_start = time.time()
-                status, face_colors, bbox = detector.detect_face(img, None)  # No expected center for calibration
-                processing_time = time.time() - processing_start
-                processing_times.append(processing_time)
-                avg_processing_time = sum(processing_times) / len(processing_times)
-                logger.debug(f"Calibration detection took {processing_time:.4f}s, avg: {avg_processing_time:.4f}s")
-                if processing_time > 0.25:
-                    logger.warning(f"Calibration detection exceeded 250ms: {processing_time:.4f}s")
-                    await websocket.send_json({"status": "detection_warning", "message": f"Detection slow: {processing_time:.2f}s"})
-
-                if status == "face_detected":
-                    detection_success_count += 1
-                    detected_color = face_colors[4]  # Center color
-                    expected_color = calibration_colors[current_calibration_color]
-                    last_calibration_img = img  # Store for calibration
-                    await websocket.send_json({"status": "calibration_face_detected", "message": f"Detected {detected_color}. Expected {expected_color}. Confirm or select correct color.", "detected_color": detected_color, "expected_color": expected_color})
-                    await websocket.send_json({"status": "debug_info", "bbox": bbox, "face_colors": face_colors, "processing_time": processing_time})
-                    logger.info(f"Calibration face detected: {detected_color}, expected: {expected_color}")
-                else:
-                    detection_failure_count += 1
-                    await websocket.send_json({"status": "calibration_face_not_detected", "message": f"Face not detected. Show the {calibration_colors[current_calibration_color]} face clearly."})
-                    await websocket.send_json({"status": "debug_info", "processing_time": processing_time, "failure_reason": "face_not_detected"})
-                    logger.warning(f"Calibration face not detected for color {calibration_colors[current_calibration_color]}")
-            elif not cube_present:
-                status = detector.detect_presence(img)
-                if status == "cube_present":
-                    cube_present = True
-                    message = "Cube detected. Starting cube scan..."
-                    await websocket.send_json({"status": "cube_detected", "message": message})
-                    logger.info("Cube detected, starting scan")
-                else:
-                    await websocket.send_json({"status": "no_cube", "message": "No cube detected. Please place the Rubik's Cube in front of the camera."})
-                    logger.info("No cube detected")
-            else:
-                # In scanning phase, detect faces sequentially
-                processing_start = time.time()
-                # Set expected center color for top and bottom faces
-                expected_center = None
-                if current_face == 4:  # top face
-                    expected_center = 'Y'
-                elif current_face == 5:  # bottom face
-                    expected_center = 'W'
-                status, face_colors, bbox = detector.detect_face(img, expected_center)
-                processing_time = time.time() - processing_start
-                processing_times.append(processing_time)
-                avg_processing_time = sum(processing_times) / len(processing_times)
-                logger.debug(f"Detection took {processing_time:.4f}s, avg: {avg_processing_time:.4f}s")
-                if processing_time > 0.25:
-                    logger.warning(f"Detection exceeded 250ms: {processing_time:.4f}s")
-                    await websocket.send_json({"status": "detection_warning", "message": f"Detection slow: {processing_time:.2f}s"})
-
-                if status == "face_detected":
-                    detection_success_count += 1
-                    faces_states[current_face] = face_colors
-                    message = f"✓ {faces[current_face].capitalize()} face scanned successfully"
-                    await websocket.send_json({"status": "face_detected", "message": message, "face": faces[current_face], "colors": face_colors, "bbox": bbox})
-                    await websocket.send_json({"status": "debug_info", "bbox": bbox, "face_colors": face_colors, "processing_time": processing_time})
-                    logger.debug(f"Face detected: {faces[current_face]}")
-
-                    # Automatically advance to next face
-                    current_face += 1
-                    if current_face < 6:
-                        logger.info(f"Advancing to next face: {faces[current_face]}")
-                    else:
-                        # All faces captured
-                        full_state = ''.join(faces_states)
-                        await websocket.send_json({"status": "scan_complete", "message": "All faces scanned. Generating solution..."})
-                        logger.info("All faces scanned, generating solution")
-                        algorithm = solver_service.solve(full_state)
-                        logger.info(f"Algorithm generated with {len(algorithm)} moves")
-                        message = "Solution found!" if algorithm else "Unable to solve cube. Please check scanned faces and try rescanning."
-                        await websocket.send_json({"status": "solution_ready", "message": message, "moves": algorithm})
-                        # Reset
-                        faces_states = [None] * 6
-                        current_face = 0
-                        cube_present = False
-                        logger.info("Resetting state after solving")
-                else:
-                    detection_failure_count += 1
-                    await websocket.send_json({"status": "face_not_detected", "message": f"Face detection failed. Please ensure the {faces[current_face]} face is clearly visible and well-lit."})
-                    await websocket.send_json({"status": "debug_info", "processing_time": processing_time, "failure_reason": "face_not_detected"})
-                    logger.debug(f"Face not detected: {faces[current_face]}")
+        capture = arm(ProfileCapture(mode, frames, seconds, session_id))
+    except (RuntimeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    logger.info(f"Profile capture armed: mode={mode}, frames={frames}, seconds={capture.seconds}, session={session_id}")
+    try:
+        result = await capture.wait()
+    finally:
+        disarm(capture)
+    if format == "collapsed" and mode == "sampling":
+        return PlainTextResponse(result["collapsed"])
+    return {"status": "success", **result}
+
+@router.get("/calibration/profiles")
+async def calibration_profiles():
+    profiles = get_calibration_profiles()
+    return {"profiles": profiles.list(), **profiles.stats()}
+
+@router.get("/calibration/profiles/{profile_id}")
+async def calibration_profile(profile_id: str):
+    try:
+        profile = get_calibration_profiles().load(profile_id)
+    except ValueError as ve:
+        return {"status": "error", "message": str(ve)}
+    if profile is None:
+        return {"status": "error", "message": f"No calibration profile {profile_id}"}
+    return {**profile.summary(), "color_ranges": profile.color_ranges}
 
-                # Periodic status update every 10 frames
-                if frame_count % 10 == 0:
-                    total_time = time.time() - frame_receive_time
-                    fps = frame_count / total_time if total_time > 0 else 0
-                    success_rate = detection_success_count / (detection_success_count + detection_failure_count) if (detection_success_count + detection_failure_count) > 0 else 0
-                    await websocket.send_json({"status": "processing_stats", "avg_processing_time": avg_processing_time, "fps": fps, "success_rate": success_rate})
-                    logger.info(f"Frame {frame_count}: avg_time={avg_processing_time:.4f}s, fps={fps:.2f}, success_rate={success_rate:.2f}")
+@router.delete("/calibration/profiles/{profile_id}")
+async def delete_calibration_profile(profile_id: str):
+    try:
+        deleted = get_calibration_profiles().delete(profile_id)
+    except ValueError as ve:
+        return {"status": "error", "message": str(ve)}
+    return {"status": "success" if deleted else "error", "message": f"Calibration profile {profile_id} {'deleted' if deleted else 'not found'}"}
+
+@router.get("/solver/cache")
+async def solver_cache_stats():
+    stats = get_solution_cache().stats()
+    shallow_index = get_shallow_index()
+    stats["shallow_index"] = shallow_index.stats() if shallow_index is not None else None
+    return stats
+
+async def _batch_items(items: list):
+    for index, item in enumerate(items):
+        yield parse_batch_item(item, index)
+
+@router.post("/solve/batch")
+async def solve_batch(request: Request):
+    """
+    Solve many states on the solver process pool. Accepts a JSON array or an NDJSON body of
+    states and streams NDJSON results back in completion order.
+    """
+    # The body is read before streaming starts: a streaming response listens for disconnects
+    # on the same receive channel, so reading the body from inside it can deadlock. It is also
+    # parsed first, so a malformed body gets an error response rather than a broken stream.
+    body = await request.body()
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = [line for line in body.splitlines() if line.strip()]
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid JSON body: {ve}"}
+        if not isinstance(items, list):
+            return {"status": "error", "message": "Expected a JSON array of states"}
+
+    async def results():
+        async for result in solve_stream(_batch_items(items)):
+            yield json.dumps(result) + "\n"
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.post("/scan/batch")
+async def scan_batch(request: Request):
+    """
+    Scan image folders and video files below SCAN_BATCH_ROOT on the scanner process pool. The body
+    is {"paths": [...], "mode": "net" | "face", "solve", "every", "calibration_profile"}, paths
+    relative to the root; results stream back as NDJSON in completion order.
+    """
+    if SCAN_BATCH_ROOT is None:
+        return {"status": "error", "message": "Batch scanning is disabled, set SCAN_BATCH_ROOT to enable it"}
+    options = await request.json()
+    root = os.path.realpath(SCAN_BATCH_ROOT)
+    paths = []
+    for relative in options.get("paths") or ["."]:
+        path = os.path.realpath(os.path.join(root, str(relative)))
+        if os.path.commonpath([root, path]) != root or not os.path.exists(path):
+            return {"status": "error", "message": f"No such path below the scan root: {relative}"}
+        paths.append(path)
+    units = iter_units(paths, int(options.get("every", 1)))
+    results = scan_stream(units, str(options.get("mode", "net")), bool(options.get("solve", False)), options.get("calibration_profile"))
+    try:
+        first = await anext(results)  # Surfaces option errors as a response rather than a broken stream
+    except StopAsyncIteration:
+        first = None
+    except ValueError as ve:
+        return {"status": "error", "message": str(ve)}
 
-            if data["type"] == "confirm_calibration":
-                selected_color = data.get("selected_color")
-                if selected_color and selected_color in calibration_colors:
-                    color_to_calibrate = selected_color
-                else:
-                    color_to_calibrate = calibration_colors[current_calibration_color]
-                if last_calibration_img is not None:
-                    detector.calibrate_color(color_to_calibrate, last_calibration_img)
-                current_calibration_color += 1
-                if current_calibration_color < len(calibration_colors):
-                    await websocket.send_json({"status": "calibration_next", "message": f"Color {color_to_calibrate} calibrated. Now show the {calibration_colors[current_calibration_color]} face."})
-                    logger.info(f"Color {color_to_calibrate} calibrated, moving to next color")
-                else:
-                    calibration_mode = False
-                    await websocket.send_json({"status": "calibration_complete", "message": "Calibration complete."})
-                    logger.info("Calibration complete")
+    async def lines():
+        if first is not None:
+            yield json.dumps(first) + "\n"
+        async for result in results:
+            yield json.dumps(result) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/solve")
+async def solve(request: Request, budget_ms: int = SOLVER_BUDGET_MS, target_length: int = SOLVER_TARGET_LENGTH):
+    """
+    Anytime solve of one state (the body: a bare state or {"state": ...}). Each shorter solution is
+    streamed as an NDJSON line as soon as it is found, then a final line with how the search ended.
+    Disconnecting stops the search.
+    """
+    _, state = parse_batch_item(await request.body(), 0)
+    anytime = AnytimeSolve(state, budget_ms / 1000, target_length)
+
+    async def results():
+        start = time.perf_counter()
+        try:
+            async for moves in anytime:
+                yield json.dumps({"moves": moves, "length": len(moves), "elapsed_ms": (time.perf_counter() - start) * 1000}) + "\n"
+            error = None
+        except ValueError as ve:
+            error = str(ve)
+        yield json.dumps({"done": True, "outcome": anytime.outcome, "moves": anytime.best, "error": error,
+                          "elapsed_ms": (time.perf_counter() - start) * 1000}) + "\n"
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
-            elif data["type"] == "select_calibration_color":
-                selected_color = data.get("color")
-                if selected_color in calibration_colors:
-                    # Override the detected color
-                    color = calibration_colors[current_calibration_color]
-                    # Since no img, just proceed, assuming calibration is not updated, or perhaps reset to default for that color.
-                    # For simplicity, just proceed.
-                    current_calibration_color += 1
-                    if current_calibration_color < len(calibration_colors):
-                        await websocket.send_json({"status": "calibration_next", "message": f"Color set to {selected_color}. Now show the {calibration_colors[current_calibration_color]} face."})
-                        logger.info(f"Calibration color set to {selected_color}, moving to next color")
-                    else:
-                        calibration_mode = False
-                        await websocket.send_json({"status": "calibration_complete", "message": "Calibration complete."})
-                        logger.info("Calibration complete")
-                else:
-                    await websocket.send_json({"status": "error", "message": "Invalid color."})
-                    logger.warning(f"Invalid color selected for calibration: {selected_color}")
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        await ScanSession(websocket).run()
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
 
@@ -0,0 +1,766 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import numpy as np
+import time
+from collections import deque
+from fastapi import WebSocket
+from . import frame_protocol
+from .recording import DIRECTION_IN, DIRECTION_OUT, RecordingWriter
+from ..services.cube_detector import CubeDetector
+from ..services.solver import get_solver
+from ..services.anytime_solver import AnytimeSolve
+from ..services.classify_batcher import detect_face_batched
+from ..services.move_analyzer import MOVE_ANALYZER, SolveTracker
+from ..services.cube_state import FACES, SCAN_ORDER, from_scan_faces
+from ..services.cube_validator import repair_state, validation_error
+from ..services.face_consensus import FaceConsensus
+from ..services.preprocess import Preprocessor
+from ..services.presence_gate import ESCALATED, PresenceGate
+from ..services.calibration_store import get_calibration_profiles
+from .flow_control import FlowController, get_admission_controller
+from ..core.config import (FRAME_QUEUE_DEPTH, SCAN_REPAIR_CANDIDATES, SCAN_REPAIR_MAX_CHANGES, SESSION_RECORDING_DIR,
+                           PRESENCE_GATE, SOLVER_BUDGET_MS)
+from ..core.metrics import (ACTIVE_SESSIONS, CALIBRATIONS, DETECTIONS, FLOW_LEVELS, FRAMES_PROCESSED, MESSAGES_SENT,
+                            SESSIONS_REJECTED, observe_stage)
+from ..core.serialization import dumps
+from ..core.profiling import CURRENT_SESSION, active_capture
+from ..core.executor import LatestFrameQueue, executor_backlog, run_in_frame_executor
+from ..core.logging_config import logger
+
+_session_ids = itertools.count(1)
+
+# Sessions currently served by this worker, by session id
+active_sessions = {}
+ACTIVE_SESSIONS.set_function(lambda: len(active_sessions))
+
+# Id of the frame being processed by a session's processing task, echoed in the messages it sends
+# when the client asked for it ("frame_ids": true in the hello)
+CURRENT_FRAME_ID = contextvars.ContextVar("current_frame_id", default=None)
+# Messages answering the frame being processed, sent together once it is done, for clients that
+# asked for it ("batch": true in the hello); None sends each message on its own
+CURRENT_OUTBOX = contextvars.ContextVar("current_outbox", default=None)
+
+# Diagnostics only sent to clients that opt in with "debug": true in their hello
+DEBUG_STATUSES = frozenset({"debug_info", "processing_stats"})
+
+
+def _valid_crop(crop) -> bool:
+    # Normalized x, y, w, h of a non-empty region of the client's frame
+    if not isinstance(crop, (list, tuple)) or len(crop) != 4 or not all(isinstance(v, (int, float)) for v in crop):
+        return False
+    x, y, w, h = crop
+    return 0 <= x < 1 and 0 <= y < 1 and 0 < w <= 1 and 0 < h <= 1
+
+
+def decode_frame(data, binary_frame, preprocessor: Preprocessor):
+    """
+    Decode and preprocess an incoming frame. Runs on the frame executor.
+    Returns the BGR image, or None when it cannot be decoded.
+    """
+    img = preprocessor.process(data, binary_frame)
+    if img is not None:
+        logger.debug(f"Frame decoded and preprocessed, shape: {img.shape}")
+    return img
+
+
+class ScanSession:
+    """
+    State of one /ws connection.
+
+    Messages are read by a receiver task: control messages are handled immediately while frames go
+    into a latest-frame-wins queue. A separate processing task drains the queue and runs the CV
+    pipeline on the shared frame executor, so a slow frame never blocks the event loop or other sessions.
+    """
+
+    faces = ['front', 'right', 'back', 'left', 'top', 'bottom']
+    calibration_colors = ['Y', 'W', 'R', 'G', 'B', 'O']  # Order for calibration
+
+    def __init__(self, websocket: WebSocket, queue_depth: int = FRAME_QUEUE_DEPTH):
+        self.id = next(_session_ids)
+        self.websocket = websocket
+        # Per-session state is the detector's calibration overlay, ROI tracking and frame buffers;
+        # the detector core, solver and move analyzer are shared by the worker's sessions
+        self.detector = CubeDetector()
+        self.solver = get_solver()
+        self.analyzer = MOVE_ANALYZER
+
+        self.faces_states = [None] * 6
+        self.faces_confidence = [None] * 6  # Per-sticker consensus support of each committed face
+        self.current_face = 0
+        self.cube_present = False
+        self.calibration_mode = False
+        self.current_calibration_color = 0
+        self.last_calibration_img = None
+        self.calibration_profile = None  # Profile id the calibration is loaded from and saved to
+        self.consensus = FaceConsensus()  # Sticker votes for the face being scanned
+        self.tracker = None  # Set while guiding the user through a solution
+        self.solving = None  # AnytimeSolve in progress, cancelled by a rescan
+        self.scan_generation = 0  # Bumped by every rescan, so a completed scan can tell it was superseded
+        self.solve_budget_ms = SOLVER_BUDGET_MS
+
+        # Performance monitoring
+        self.processing_times = deque(maxlen=10)
+        self.detection_success_count = 0
+        self.detection_failure_count = 0
+        self.frame_count = 0
+        self.processed_count = 0
+        self.processed_times = deque(maxlen=30)  # When recent frames finished decoding, for the FPS figure
+
+        # Frame transport, upgraded to binary frames by a "hello" message
+        self.binary_mode = False
+        self.binary_encodings = []
+        # Server-driven frame rate, size and crop, for clients that ask for it in their hello
+        self.flow = None
+        # The cube in the frame being processed: its bbox (None when no face was found) and the frame
+        # shape, and the region of its full frame the client cut that frame from (None for all of it)
+        self.roi_bbox = None
+        self.roi_shape = None
+        self.frame_crop = None
+        self.echo_frame_ids = False
+        # Outbound messages: one per processed frame, binary WebSocket messages, diagnostics
+        self.batch_responses = False
+        self.binary_responses = False
+        self.debug = False
+        self.messages_sent = 0
+        self.recorder = None
+
+        self.frames = LatestFrameQueue(queue_depth)
+        self.preprocessor = Preprocessor(buffers=self.detector.buffers)  # Reuses its buffers across this session's frames
+        # First stages of the presence check, on thumbnails, while waiting for a cube
+        self.presence_gate = PresenceGate(self.preprocessor) if PRESENCE_GATE else None
+
+    async def run(self):
+        if not get_admission_controller().admit(len(active_sessions)):
+            SESSIONS_REJECTED.inc()
+            await self.send({"status": "server_busy", "message": "The server is busy, retrying shortly.", "retry_after": 5})
+            await self.websocket.close(code=1013)  # Try Again Later
+            logger.warning(f"Session {self.id} rejected: {len(active_sessions)} sessions active, {get_admission_controller().stats()}")
+            return
+        active_sessions[self.id] = self
+        if SESSION_RECORDING_DIR:
+            os.makedirs(SESSION_RECORDING_DIR, exist_ok=True)
+            path = os.path.join(SESSION_RECORDING_DIR, f"session-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.id}.rbxr")
+            self.recorder = RecordingWriter(path)
+        processor = asyncio.create_task(self._process_frames())
+        try:
+            await self._receive_messages()
+        finally:
+            processor.cancel()  # Also kills an anytime solve in progress
+            try:
+                await processor
+            except asyncio.CancelledError:
+                pass
+            del active_sessions[self.id]
+            if self.recorder is not None:
+                self.recorder.close()
+                logger.info(f"Session {self.id} recorded to {self.recorder.path} ({self.recorder.messages} messages)")
+            logger.info(f"Session {self.id} closed: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "session_id": self.id,
+            "frames_received": self.frames.received,
+            "frames_processed": self.processed_count,
+            "dropped_frames": self.frames.dropped,
+            "messages_sent": self.messages_sent,
+            "queue_depth": self.frames.depth,
+            "fps": round(self.fps(), 2),
+            "detection_successes": self.detection_success_count,
+            "detection_failures": self.detection_failure_count,
+            "calibration_profile": self.calibration_profile,
+            "flow_control": self.flow.last_sent if self.flow is not None else None,
+            "roi_tracker": self.detector.roi_tracker.stats(),
+            "buffer_bytes": self.detector.buffers.nbytes,
+            "presence_gate": self.presence_gate.stats() if self.presence_gate is not None else None,
+        }
+
+    def fps(self) -> float:
+        """
+        Processed frames per second over the last few frames.
+        """
+        if len(self.processed_times) < 2:
+            return 0.0
+        elapsed = self.processed_times[-1] - self.processed_times[0]
+        return (len(self.processed_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    async def send(self, message: dict):
+        if message["status"] in DEBUG_STATUSES and not self.debug:
+            return
+        outbox = CURRENT_OUTBOX.get()
+        if outbox is not None:
+            outbox.append(message)  # Sent by flush() with the rest of the frame's answer
+            return
+        await self._send_message(message, "single")
+
+    async def flush(self):
+        """
+        Send the messages answering the current frame as one {"status": "frame_result", "messages": [...]}.
+        """
+        outbox = CURRENT_OUTBOX.get()
+        if not outbox:
+            return
+        message = {"status": "frame_result", "messages": list(outbox)}
+        outbox.clear()
+        await self._send_message(message, "batch")
+
+    async def _send_message(self, message: dict, kind: str):
+        frame_id = CURRENT_FRAME_ID.get()
+        if frame_id is not None:
+            message["frame_id"] = frame_id
+        payload = dumps(message)
+        if self.binary_responses:
+            await self.websocket.send_bytes(payload)
+        else:
+            payload = payload.decode()
+            await self.websocket.send_text(payload)
+        self.messages_sent += 1
+        MESSAGES_SENT.inc(kind)
+        if self.recorder is not None:
+            self.recorder.write(DIRECTION_OUT, payload)
+
+    async def _receive_messages(self):
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                logger.info("WebSocket disconnected")
+                return
+            if self.recorder is not None:
+                self.recorder.write(DIRECTION_IN, message["bytes"] if message.get("bytes") is not None else message["text"])
+
+            binary_frame = None
+            if message.get("bytes") is not None:
+                if not self.binary_mode:
+                    await self.send({"status": "error", "message": "Binary frames require a hello message first."})
+                    logger.warning("Binary frame received before protocol negotiation")
+                    continue
+                try:
+                    binary_frame = frame_protocol.parse_frame(message["bytes"])
+                except ValueError as ve:
+                    await self.send({"status": "detection_error", "message": str(ve)})
+                    logger.warning(f"Rejected binary frame: {ve}")
+                    continue
+                if frame_protocol.ENCODINGS_BY_ID[binary_frame.encoding] not in self.binary_encodings:
+                    await self.send({"status": "detection_error", "message": "Frame encoding was not negotiated"})
+                    continue
+                data = {"type": "frame"}
+                if binary_frame.bbox:
+                    data["cubeBbox"] = list(binary_frame.bbox)
+                if binary_frame.crop:
+                    data["crop"] = list(binary_frame.crop)
+            else:
+                data = json.loads(message["text"])
+            logger.debug(f"Received data: {data['type']}")
+
+            # Validate cubeBbox coordinates if present
+            cube_bbox = data.get("cubeBbox")
+            if cube_bbox and (not isinstance(cube_bbox, list) or len(cube_bbox) != 4):
+                await self.send({"status": "error", "message": "Invalid cubeBbox format. Expected list of 4 numbers."})
+                logger.warning("Invalid cubeBbox format received")
+                continue
+            crop = data.get("crop")
+            if crop is not None and not _valid_crop(crop):
+                await self.send({"status": "error", "message": "Invalid crop format. Expected [x, y, w, h] within 0-1."})
+                logger.warning("Invalid crop format received")
+                continue
+
+            if data["type"] == "frame":
+                self.frame_count += 1
+                self.frames.put((time.time(), data, binary_frame))
+            else:
+                await self.handle_control(data)
+
+    async def handle_control(self, data: dict):
+        if data["type"] == "hello":
+            self.binary_encodings = frame_protocol.negotiate(data.get("encodings"))
+            self.binary_mode = bool(data.get("binary")) and bool(self.binary_encodings)
+            self.flow = FlowController() if data.get("flow_control") else None
+            self.echo_frame_ids = bool(data.get("frame_ids"))
+            self.batch_responses = bool(data.get("batch"))
+            self.binary_responses = bool(data.get("binary_responses"))
+            self.debug = bool(data.get("debug"))
+            profile = None
+            if data.get("calibration_profile"):
+                profile = await self._use_calibration_profile(data["calibration_profile"])
+            await self.send({
+                "status": "protocol",
+                "mode": "binary" if self.binary_mode else "json",
+                "encodings": self.binary_encodings if self.binary_mode else [],
+                "version": frame_protocol.FRAME_VERSION,
+                "header_size": frame_protocol.FRAME_HEADER_SIZE,
+                "session_id": self.id,
+                "calibration_profile": profile,
+                "batch": self.batch_responses,
+                "responses": "binary" if self.binary_responses else "json",
+                "debug": self.debug,
+            })
+            logger.info(f"Frame protocol negotiated: {'binary ' + ','.join(self.binary_encodings) if self.binary_mode else 'json'}")
+            if self.flow is not None:
+                await self._send_flow_control(force=True)
+
+        elif data["type"] == "use_calibration_profile":
+            profile = await self._use_calibration_profile(data.get("profile_id"))
+            if profile is not None:
+                await self.send({"status": "calibration_profile", "calibration_profile": profile,
+                                 "message": "Calibration loaded." if profile["loaded"] else "No saved calibration for this camera yet."})
+
+        elif data["type"] == "start_calibration":
+            self.calibration_mode = True
+            self.current_calibration_color = 0
+            await self.send({"status": "calibration_started", "message": f"Calibration started. Show the {self.calibration_colors[self.current_calibration_color]} face."})
+            logger.info("Calibration started")
+
+        elif data["type"] == "calibrate_specific_color":
+            color = data.get("color")
+            if color in self.calibration_colors:
+                self.calibration_mode = True
+                self.current_calibration_color = self.calibration_colors.index(color)
+                await self.send({"status": "calibration_specific", "message": f"Calibrating {color}. Show the {color} face."})
+                logger.info(f"Calibrating specific color: {color}")
+            else:
+                await self.send({"status": "error", "message": "Invalid color for calibration."})
+                logger.warning(f"Invalid color for calibration: {color}")
+
+        elif data["type"] == "reset_calibration":
+            self.detector.reset_calibration()
+            CALIBRATIONS.inc("reset")
+            if self.calibration_profile is not None:
+                await run_in_frame_executor(get_calibration_profiles().delete, self.calibration_profile)
+            await self.send({"status": "calibration_reset", "message": "Calibration reset to default."})
+            logger.info("Calibration reset to default")
+
+        elif data["type"] == "confirm_calibration":
+            selected_color = data.get("selected_color")
+            if selected_color and selected_color in self.calibration_colors:
+                color_to_calibrate = selected_color
+            else:
+                color_to_calibrate = self.calibration_colors[self.current_calibration_color]
+            if self.last_calibration_img is not None:
+                if await run_in_frame_executor(self.detector.calibrate_color, color_to_calibrate, self.last_calibration_img):
+                    CALIBRATIONS.inc(color_to_calibrate)
+            self.current_calibration_color += 1
+            if self.current_calibration_color < len(self.calibration_colors):
+                await self.send({"status": "calibration_next", "message": f"Color {color_to_calibrate} calibrated. Now show the {self.calibration_colors[self.current_calibration_color]} face."})
+                logger.info(f"Color {color_to_calibrate} calibrated, moving to next color")
+            else:
+                self.calibration_mode = False
+                await self._reset_roi()
+                await self._save_calibration_profile()
+                await self.send({"status": "calibration_complete", "message": "Calibration complete.", "calibration_profile": self.calibration_profile})
+                logger.info("Calibration complete")
+
+        elif data["type"] == "confirm_move":
+            # Moves that do not change the watched face can only be confirmed by the user
+            if self.tracker is not None:
+                move = self.tracker.next_move
+                self.tracker.advance()
+                await self._send_tracking_update({"result": "solved" if self.tracker.done else "correct", "move": move})
+
+        elif data["type"] == "rescan":
+            # Drop one scanned face (or the whole scan) and scan it again; a solve in progress is abandoned
+            face = data.get("face")
+            if face is not None and face not in self.faces:
+                await self.send({"status": "error", "message": "Invalid face to rescan."})
+                return
+            self.scan_generation += 1
+            if self.solving is not None:
+                self.solving.cancel()
+            self.tracker = None
+            self.consensus.reset()
+            if face is None:
+                self.faces_states = [None] * 6
+                self.faces_confidence = [None] * 6
+                self.current_face = 0
+            else:
+                self.current_face = self.faces.index(face)
+                self.faces_states[self.current_face] = None
+                self.faces_confidence[self.current_face] = None
+            self.cube_present = True
+            await self.send({"status": "scan_restarted", "message": f"Show the {self.faces[self.current_face]} face.", "face": self.faces[self.current_face]})
+            logger.info(f"Rescanning from the {self.faces[self.current_face]} face")
+
+        elif data["type"] == "stop_tracking":
+            if self.tracker is not None:
+                self.tracker = None
+                self.cube_present = False
+                await self.send({"status": "tracking_stopped", "message": "Guided solve stopped."})
+                logger.info("Guided solve stopped")
+
+        elif data["type"] == "select_calibration_color":
+            selected_color = data.get("color")
+            if selected_color in self.calibration_colors:
+                # Since no img, just proceed, assuming calibration is not updated.
+                self.current_calibration_color += 1
+                if self.current_calibration_color < len(self.calibration_colors):
+                    await self.send({"status": "calibration_next", "message": f"Color set to {selected_color}. Now show the {self.calibration_colors[self.current_calibration_color]} face."})
+                    logger.info(f"Calibration color set to {selected_color}, moving to next color")
+                else:
+                    self.calibration_mode = False
+                    await self._reset_roi()
+                    await self._save_calibration_profile()
+                    await self.send({"status": "calibration_complete", "message": "Calibration complete.", "calibration_profile": self.calibration_profile})
+                    logger.info("Calibration complete")
+            else:
+                await self.send({"status": "error", "message": "Invalid color."})
+                logger.warning(f"Invalid color selected for calibration: {selected_color}")
+
+    async def _use_calibration_profile(self, profile_id):
+        """
+        Select the profile this session's calibration is saved to, and load it when it exists.
+        Returns a summary for the client, or None after reporting an invalid id.
+        """
+        try:
+            profile = await run_in_frame_executor(get_calibration_profiles().load, profile_id)
+        except ValueError as ve:
+            await self.send({"status": "error", "message": str(ve)})
+            logger.warning(f"Invalid calibration profile {profile_id!r}: {ve}")
+            return None
+        self.calibration_profile = profile_id
+        if profile is None:
+            # A calibration loaded earlier belongs to another profile and must not be saved over this one
+            self.detector.reset_calibration()
+            logger.info(f"Calibration profile {profile_id} not found, will be created on calibration")
+            return {"id": profile_id, "loaded": False, "calibrated_colors": []}
+        self.detector.apply_profile(profile)
+        logger.info(f"Calibration profile {profile_id} loaded: {profile.calibrated_colors}")
+        return {"id": profile_id, "loaded": True, "calibrated_colors": profile.calibrated_colors}
+
+    async def _save_calibration_profile(self):
+        if self.calibration_profile is None:
+            return
+        await run_in_frame_executor(get_calibration_profiles().save, self.calibration_profile, self.detector.color_ranges,
+                                    self.detector.calibrated_colors, self.detector.classifier)
+        logger.info(f"Calibration profile {self.calibration_profile} saved")
+
+    async def _process_frames(self):
+        CURRENT_SESSION.set(self.id)  # Lets a profile capture select this session's frames
+        while True:
+            frame = await self.frames.get()
+            _, data, binary_frame = frame
+            if self.echo_frame_ids:
+                CURRENT_FRAME_ID.set(binary_frame.frame_id if binary_frame is not None else data.get("frame_id"))
+            CURRENT_OUTBOX.set([] if self.batch_responses else None)
+            try:
+                await self.process_frame(*frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing frame: {str(e)}")
+                await self.send({"status": "detection_error", "message": f"Error processing frame: {str(e)}"})
+            await self.flush()
+
+    async def process_frame(self, frame_receive_time: float, data: dict, binary_frame):
+        start = time.perf_counter()
+        if binary_frame is not None:
+            logger.debug(f"Processing binary frame {binary_frame.frame_id}, payload length: {binary_frame.payload.size}")
+        self.frame_crop = data.get("crop")
+        self.roi_bbox = None
+        waiting_for_cube = not self.calibration_mode and self.tracker is None and not self.cube_present
+        if waiting_for_cube and self.presence_gate is not None:
+            gate = await run_in_frame_executor(self.presence_gate.check, data, binary_frame)
+            if gate != ESCALATED:
+                # No cube on the thumbnail: answered without decoding the frame, and kept out of the
+                # admission cost estimate, which is for full frames
+                self._count_processed()
+                await self._send_no_cube()
+                await self._frame_done(frame_receive_time)
+                return
+        img = await run_in_frame_executor(decode_frame, data, binary_frame, self.preprocessor)
+        if img is None:
+            logger.error("Failed to decode image with OpenCV")
+            await self.send({"status": "detection_error", "message": "Failed to decode image"})
+            await self._frame_done(frame_receive_time)  # Still counts towards a profile capture and flow control
+            return
+        self._count_processed()
+
+        if self.calibration_mode:
+            await self._process_calibration_frame(img)
+        elif self.tracker is not None:
+            await self._process_tracking_frame(img)
+        elif waiting_for_cube:
+            await self._process_presence_frame(img)
+        else:
+            await self._process_scan_frame(img)
+        get_admission_controller().observe(time.perf_counter() - start, img.shape[0] * img.shape[1])
+        await self._frame_done(frame_receive_time)
+
+    def _count_processed(self):
+        self.processed_count += 1
+        self.processed_times.append(time.time())
+        FRAMES_PROCESSED.inc()
+
+    async def _frame_done(self, frame_receive_time: float):
+        # Receive to answer, including the time the frame waited in the queue
+        observe_stage("frame", time.time() - frame_receive_time)
+        if self.flow is not None:
+            await self._send_flow_control()
+
+        capture = active_capture()
+        if capture is not None and capture.matches():
+            capture.frame_done()
+
+    async def _send_flow_control(self, force: bool = False):
+        # The ROI follows the cube found on the last frame and is dropped (whole frame) as soon as
+        # no face is found, or while waiting for a cube, which may appear anywhere
+        bbox = self.roi_bbox if self.cube_present or self.calibration_mode else None
+        message = self.flow.update(len(active_sessions), self.frames.dropped, bbox, self.roi_shape, self.frame_crop, force)
+        if message is not None:
+            FLOW_LEVELS.inc(message["level"])
+            await self.send(message)
+            logger.debug(f"Flow control update: {message}")
+
+    async def _reset_roi(self):
+        """
+        Forget where the cube was, e.g. once a face is committed and the cube is turned to the next
+        one: the ROI goes back to the whole frame and the next frame is searched in full.
+        """
+        self.roi_bbox = None
+        self.detector.roi_tracker.reset()
+        if self.flow is not None:
+            await self._send_flow_control(force=True)
+
+    async def _process_calibration_frame(self, img):
+        # In calibration mode, detect the face and calibrate the color
+        processing_start = time.time()
+        status, face_colors, bbox = await detect_face_batched(self.detector, img, None)  # No expected center for calibration
+        processing_time = time.time() - processing_start
+        self.processing_times.append(processing_time)
+        avg_processing_time = sum(self.processing_times) / len(self.processing_times)
+        logger.debug(f"Calibration detection took {processing_time:.4f}s, avg: {avg_processing_time:.4f}s")
+        if processing_time > 0.25:
+            logger.warning(f"Calibration detection exceeded 250ms: {processing_time:.4f}s")
+            await self.send({"status": "detection_warning", "message": f"Detection slow: {processing_time:.2f}s"})
+
+        if status == "face_detected":
+            self.detection_success_count += 1
+            DETECTIONS.inc("success")
+            self.roi_bbox, self.roi_shape = bbox, img.shape
+            detected_color = face_colors[4]  # Center color
+            expected_color = self.calibration_colors[self.current_calibration_color]
+            self.last_calibration_img = img.copy()  # Stored for calibration; img is reused by the next frame
+            await self.send({"status": "calibration_face_detected", "message": f"Detected {detected_color}. Expected {expected_color}. Confirm or select correct color.", "detected_color": detected_color, "expected_color": expected_color})
+            await self.send({"status": "debug_info", "bbox": bbox, "face_colors": face_colors, "processing_time": processing_time})
+            logger.info(f"Calibration face detected: {detected_color}, expected: {expected_color}")
+        else:
+            self.detection_failure_count += 1
+            DETECTIONS.inc("failure")
+            await self.send({"status": "calibration_face_not_detected", "message": f"Face not detected. Show the {self.calibration_colors[self.current_calibration_color]} face clearly."})
+            await self.send({"status": "debug_info", "processing_time": processing_time, "failure_reason": "face_not_detected"})
+            logger.warning(f"Calibration face not detected for color {self.calibration_colors[self.current_calibration_color]}")
+
+    async def _process_presence_frame(self, img):
+        status = await run_in_frame_executor(self.detector.detect_presence, img)
+        if status == "cube_present":
+            self.cube_present = True
+            if self.presence_gate is not None:
+                self.presence_gate.reset()
+            message = "Cube detected. Starting cube scan..."
+            await self.send({"status": "cube_detected", "message": message})
+            logger.info("Cube detected, starting scan")
+        else:
+            if self.presence_gate is not None:
+                self.presence_gate.absent()
+            await self._send_no_cube()
+            logger.info("No cube detected")
+
+    async def _send_no_cube(self):
+        await self.send({"status": "no_cube", "message": "No cube detected. Please place the Rubik's Cube in front of the camera."})
+
+    async def _process_scan_frame(self, img):
+        # In scanning phase, detect faces sequentially
+        processing_start = time.time()
+        # Set expected center color for top and bottom faces
+        expected_center = None
+        if self.current_face == 4:  # top face
+            expected_center = 'Y'
+        elif self.current_face == 5:  # bottom face
+            expected_center = 'W'
+        status, face_colors, bbox, confidence = await detect_face_batched(self.detector, img, expected_center, True)
+        processing_time = time.time() - processing_start
+        self.processing_times.append(processing_time)
+        avg_processing_time = sum(self.processing_times) / len(self.processing_times)
+        logger.debug(f"Detection took {processing_time:.4f}s, avg: {avg_processing_time:.4f}s")
+        if processing_time > 0.25:
+            logger.warning(f"Detection exceeded 250ms: {processing_time:.4f}s")
+            await self.send({"status": "detection_warning", "message": f"Detection slow: {processing_time:.2f}s"})
+
+        if status == "face_detected":
+            self.detection_success_count += 1
+            DETECTIONS.inc("success")
+            self.roi_bbox, self.roi_shape = bbox, img.shape
+            # A face is only committed once the last few frames agree on every sticker
+            committed = self.consensus.add(face_colors, confidence)
+            # Every face has its own center color: a face whose center was already scanned is most
+            # likely the same face still held up (the votes outlive a commit), not the next one
+            repeated = next((idx for idx, state in enumerate(self.faces_states)
+                             if state is not None and state[4] == committed[4]), None) if committed is not None else None
+            if committed is None:
+                _, agreement, _ = self.consensus.vote()
+                await self.send({"status": "face_pending", "message": f"Hold the {self.faces[self.current_face]} face steady...", "face": self.faces[self.current_face],
+                                 "colors": face_colors, "bbox": bbox, "agreement": float(agreement.min())})
+                await self.send({"status": "debug_info", "bbox": bbox, "face_colors": face_colors, "processing_time": processing_time})
+            elif repeated is not None:
+                message = f"That is the {self.faces[repeated]} face again. Turn the cube to show the {self.faces[self.current_face]} face."
+                await self.send({"status": "face_already_scanned", "message": message, "face": self.faces[self.current_face],
+                                 "scanned_face": self.faces[repeated], "colors": committed, "bbox": bbox})
+                await self.send({"status": "debug_info", "bbox": bbox, "face_colors": face_colors, "processing_time": processing_time})
+            else:
+                face_colors = committed
+                self.faces_states[self.current_face] = face_colors
+                self.faces_confidence[self.current_face] = self.consensus.vote()[2]
+                self.consensus.reset()
+                await self._reset_roi()
+                message = f"✓ {self.faces[self.current_face].capitalize()} face scanned successfully"
+                await self.send({"status": "face_detected", "message": message, "face": self.faces[self.current_face], "colors": face_colors, "bbox": bbox})
+                await self.send({"status": "debug_info", "bbox": bbox, "face_colors": face_colors, "processing_time": processing_time})
+                logger.debug(f"Face detected: {self.faces[self.current_face]}")
+
+                # Automatically advance to the next face not scanned yet (rescans can leave gaps)
+                self.current_face = next((idx for idx, state in enumerate(self.faces_states) if state is None), 6)
+                if self.current_face < 6:
+                    logger.info(f"Advancing to next face: {self.faces[self.current_face]}")
+                else:
+                    # All faces captured. A rescan can arrive at every await from here on: it has
+                    # already reset the scan, so the result of this one must be dropped
+                    generation = self.scan_generation
+                    full_state = from_scan_faces(*self.faces_states)
+                    await self.send({"status": "scan_complete", "message": "All faces scanned. Generating solution..."})
+                    logger.info("All faces scanned, generating solution")
+                    full_state, error = await self._validate_scan(full_state)
+                    if self.scan_generation != generation:
+                        return  # Rescan requested while validating
+                    algorithm = await self._solve(full_state) if error is None else []
+                    if algorithm is None or self.scan_generation != generation:
+                        return  # Rescan requested while solving
+                    logger.info(f"Algorithm generated with {len(algorithm)} moves")
+                    if algorithm:
+                        message = "Solution found!"
+                    elif error:
+                        message = f"Scanned cube is not valid ({error}). Please rescan."
+                    else:
+                        message = "Unable to solve cube. Please check scanned faces and try rescanning."
+                    await self.send({"status": "solution_ready", "message": message, "moves": algorithm})
+                    if self.scan_generation != generation:
+                        return  # Rescan requested while sending the solution
+                    # Reset
+                    self.faces_states = [None] * 6
+                    self.faces_confidence = [None] * 6
+                    self.current_face = 0
+                    self.cube_present = False
+                    logger.info("Resetting state after solving")
+                    if algorithm:
+                        await self._start_tracking(full_state, algorithm, generation)
+        else:
+            self.detection_failure_count += 1
+            DETECTIONS.inc("failure")
+            self.consensus.add_miss()
+            await self.send({"status": "face_not_detected", "message": f"Face detection failed. Please ensure the {self.faces[self.current_face]} face is clearly visible and well-lit."})
+            await self.send({"status": "debug_info", "processing_time": processing_time, "failure_reason": "face_not_detected"})
+            logger.debug(f"Face not detected: {self.faces[self.current_face]}")
+
+        # Periodic status update every 10 frames
+        if self.processed_count % 10 == 0:
+            fps = self.fps()
+            success_rate = self.detection_success_count / (self.detection_success_count + self.detection_failure_count) if (self.detection_success_count + self.detection_failure_count) > 0 else 0
+            await self.send({"status": "processing_stats", "avg_processing_time": avg_processing_time, "fps": fps, "success_rate": success_rate,
+                             "queue_depth": self.frames.depth, "dropped_frames": self.frames.dropped, "executor_backlog": executor_backlog(),
+                             "roi_tracker_hit_rate": self.detector.roi_tracker.stats()["hit_rate"]})
+            logger.info(f"Frame {self.frame_count}: avg_time={avg_processing_time:.4f}s, fps={fps:.2f}, success_rate={success_rate:.2f}, queue_depth={self.frames.depth}, dropped={self.frames.dropped}")
+
+    async def _validate_scan(self, full_state: str):
+        """
+        Check a completed scan and relabel its least confident stickers if that makes it solvable.
+        Returns (state, None) with the state to solve, or (state, error) when it cannot be repaired.
+        """
+        error = validation_error(full_state)
+        if error is None:
+            return full_state, None
+        logger.info(f"Scanned state is invalid: {error}")
+        confidence = np.concatenate([self.faces_confidence[SCAN_ORDER.index(face)] for face in FACES])
+        generation = self.scan_generation
+        repair = await run_in_frame_executor(repair_state, full_state, confidence, SCAN_REPAIR_MAX_CHANGES, SCAN_REPAIR_CANDIDATES)
+        if repair is None or self.scan_generation != generation:
+            return full_state, error  # Not repaired, or a rescan superseded the scan meanwhile
+        repaired, changed = repair
+        stickers = [{"face": self.faces[SCAN_ORDER.index(FACES[idx // 9])], "index": idx % 9,
+                     "from": full_state[idx], "to": repaired[idx]} for idx in changed]
+        await self.send({"status": "scan_repaired", "message": f"Corrected {len(changed)} misread sticker(s).", "stickers": stickers})
+        logger.info(f"Repaired scan by relabeling {stickers}")
+        return repaired, None
+
+    async def _solve(self, full_state: str):
+        """
+        Solve a scanned cube. With a solve budget (SOLVER_BUDGET_MS), shorter solutions are looked for during that
+        budget and each one is reported as it is found.
+        Returns the moves ([] when unsolvable), or None when a rescan cancelled the solve.
+        """
+        if self.solve_budget_ms <= 0:
+            return await run_in_frame_executor(self.solver.solve, full_state)
+        await self.flush()  # The scan's result is not held back for the budget
+        solve = self.solving = AnytimeSolve(full_state, self.solve_budget_ms / 1000)
+        try:
+            async for moves in solve:
+                await self.send({"status": "solution_improved", "message": f"Found a {len(moves)} move solution, looking for a shorter one...",
+                                 "moves": moves, "length": len(moves)})
+                await self.flush()
+        except ValueError as ve:
+            logger.warning(f"Solver error: {ve}")
+            return []
+        finally:
+            self.solving = None
+        if solve.cancelled:
+            return None
+        logger.info(f"Anytime solve ended ({solve.outcome}) with {len(solve.best or [])} moves")
+        return solve.best or []
+
+    async def _start_tracking(self, full_state: str, algorithm: list, generation: int):
+        # Expected states along the solution are precomputed once, frames only do face lookups
+        tracker = await run_in_frame_executor(SolveTracker, full_state, algorithm)
+        if self.scan_generation != generation:
+            return  # Rescan requested meanwhile
+        self.tracker = tracker
+        self.cube_present = True
+        await self.send({"status": "tracking_started", "message": f"Keep the front face towards the camera and perform {self.tracker.next_move}.",
+                         "moves": self.tracker.moves, "move_index": 0, "next_move": self.tracker.next_move,
+                         "needs_confirmation": not self.tracker.step_visible()})
+        logger.info(f"Guided solve started with {len(algorithm)} moves")
+
+    async def _process_tracking_frame(self, img):
+        # The watched face keeps its center, so it doubles as the expected center color
+        expected_center = self.tracker.expected_face()[4]
+        status, face_colors, bbox = await detect_face_batched(self.detector, img, expected_center)
+        if status != "face_detected":
+            await self.send({"status": "face_not_detected", "message": "Keep the front face of the cube visible to follow the solution."})
+            return
+        self.roi_bbox, self.roi_shape = bbox, img.shape
+        await self._send_tracking_update(self.tracker.observe(face_colors))
+
+    async def _send_tracking_update(self, observation: dict):
+        result = observation["result"]
+        tracker = self.tracker
+        if result == "solved":
+            self.tracker = None
+            self.cube_present = False
+            await self.send({"status": "tracking_complete", "message": "Cube solved!", "move_index": len(tracker.moves)})
+            logger.info("Guided solve complete")
+            return
+        next_move = tracker.next_move
+        needs_confirmation = not tracker.step_visible()
+        hint = " It is not visible from the front, confirm once done." if needs_confirmation else ""
+        if result == "correct":
+            message = f"✓ {observation['move']} done. Next: {next_move}.{hint}"
+            await self.send({"status": "move_correct", "message": message, "move_index": tracker.position,
+                             "next_move": next_move, "needs_confirmation": needs_confirmation})
+        elif result == "wrong":
+            message = f"You did {observation['performed']} instead of {observation['move']}. Undo it with {next_move}."
+            await self.send({"status": "move_wrong", "message": message, "performed": observation["performed"],
+                             "moves": tracker.moves, "move_index": 0, "next_move": next_move, "needs_confirmation": needs_confirmation})
+            logger.info(f"Wrong move: performed {observation['performed']} instead of {observation['move']}")
+        elif result == "waiting":
+            await self.send({"status": "move_pending", "message": f"Perform {next_move}.{hint}", "move_index": tracker.position,
+                             "next_move": next_move, "needs_confirmation": needs_confirmation})
+        else:
+            await self.send({"status": "move_unrecognized", "message": f"Could not match the cube to the solution. Perform {next_move} or undo your last turn.",
+                             "move_index": tracker.position, "next_move": next_move})
@@ -0,0 +1,108 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# Frame processing
+# Number of threads running the OpenCV pipeline off the event loop (OpenCV releases the GIL)
+FRAME_EXECUTOR_WORKERS = _env_int("FRAME_EXECUTOR_WORKERS", min(32, (os.cpu_count() or 1) + 4))
+# Frames buffered per session; older frames are dropped so only the newest are processed
+FRAME_QUEUE_DEPTH = _env_int("FRAME_QUEUE_DEPTH", 1)
+# Incoming frame preprocessing, applied after the cubeBbox crop: per-pixel stages in order
+# (resize, contrast, blur), the largest frame kept, contrast gain and brightness offset, and the
+# Gaussian blur kernel size (odd, 0 disables)
+PREPROCESS_STAGES = os.getenv("PREPROCESS_STAGES", "resize,contrast,blur")
+PREPROCESS_MAX_WIDTH = _env_int("PREPROCESS_MAX_WIDTH", 640)
+PREPROCESS_MAX_HEIGHT = _env_int("PREPROCESS_MAX_HEIGHT", 480)
+PREPROCESS_CONTRAST = _env_float("PREPROCESS_CONTRAST", 1.2)
+PREPROCESS_BRIGHTNESS = _env_float("PREPROCESS_BRIGHTNESS", 10)
+PREPROCESS_BLUR_KSIZE = _env_int("PREPROCESS_BLUR_KSIZE", 3)
+# Decode JPEGs at 1/2, 1/4 or 1/8 size when the frame would be downscaled anyway
+PREPROCESS_REDUCED_DECODE = _env_int("PREPROCESS_REDUCED_DECODE", 1) != 0
+# Sticker classification batched across the sessions of a worker: the longest a located face waits
+# for others to join its batch (milliseconds, 0 classifies each face on its own) and the most faces
+# per batch
+CLASSIFY_BATCH_WAIT_MS = _env_float("CLASSIFY_BATCH_WAIT_MS", 2.0)
+CLASSIFY_BATCH_MAX = _env_int("CLASSIFY_BATCH_MAX", 64)
+# Cascaded presence check while waiting for a cube: frames are first checked on a thumbnail (longest
+# side in pixels) and only decoded in full when it may show a cube. A thumbnail whose mean absolute
+# gray level difference from the last cube-less one is below the motion threshold is rejected
+# without further checks, and the thumbnail color statistics use the full check's thresholds scaled
+# by the margin. PRESENCE_GATE=0 checks every frame in full.
+PRESENCE_GATE = _env_int("PRESENCE_GATE", 1) != 0
+PRESENCE_THUMBNAIL_SIZE = _env_int("PRESENCE_THUMBNAIL_SIZE", 64)
+PRESENCE_MOTION_THRESHOLD = _env_float("PRESENCE_MOTION_THRESHOLD", 3.0)
+PRESENCE_GATE_MARGIN = _env_float("PRESENCE_GATE_MARGIN", 0.5)
+
+# Flow control (/ws clients that send "flow_control": true in their hello): frame rate bounds, the
+# share of the frame executor the worker aims to keep busy, the least interval between updates
+# (seconds), and the padding around the cube of the ROI clients are asked to crop to
+FLOW_MAX_FPS = _env_float("FLOW_MAX_FPS", 10.0)
+FLOW_MIN_FPS = _env_float("FLOW_MIN_FPS", 1.0)
+FLOW_TARGET_UTILIZATION = _env_float("FLOW_TARGET_UTILIZATION", 0.7)
+FLOW_UPDATE_INTERVAL = _env_float("FLOW_UPDATE_INTERVAL", 1.0)
+FLOW_ROI_PADDING = _env_float("FLOW_ROI_PADDING", 0.25)
+# Sessions admitted per worker (0 for no fixed limit; the measured frame budget still applies)
+ADMISSION_MAX_SESSIONS = _env_int("ADMISSION_MAX_SESSIONS", 0)
+
+# Directory to record every /ws session to (app.api.recording format, replayed by app.tools.loadgen);
+# unset disables recording
+SESSION_RECORDING_DIR = os.getenv("SESSION_RECORDING_DIR") or None
+
+# Profiling (POST /profile)
+# Interval between stack samples of the sampling profiler, and the longest capture allowed
+PROFILE_SAMPLE_INTERVAL_MS = _env_float("PROFILE_SAMPLE_INTERVAL_MS", 5.0)
+PROFILE_MAX_SECONDS = _env_float("PROFILE_MAX_SECONDS", 60.0)
+
+# Detection
+# Cube localization backend: "opencv" (contours) or "yolo" (imports ultralytics only when selected)
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "opencv")
+# Weights for the yolo backend and the minimum detection confidence
+YOLO_MODEL_PATH = os.getenv("YOLO_MODEL_PATH") or None
+YOLO_CONFIDENCE = _env_float("YOLO_CONFIDENCE", 0.5)
+# Cube ROI tracking: window padding around the previous bbox (fraction of its size, 0 disables)
+ROI_TRACKER_PADDING = _env_float("ROI_TRACKER_PADDING", 0.25)
+# Minimum overlap with the previous bbox for a window result to be trusted
+ROI_TRACKER_MIN_IOU = _env_float("ROI_TRACKER_MIN_IOU", 0.5)
+# Calibration profiles referenced from the /ws hello: store backend ("sqlite", "file" or "memory")
+# and its location (SQLite file or profile directory)
+CALIBRATION_STORE = os.getenv("CALIBRATION_STORE", "sqlite")
+CALIBRATION_STORE_PATH = os.getenv("CALIBRATION_STORE_PATH") or None
+# Face scanning: frames in the sticker voting window, and the fraction of them that must agree on
+# every sticker before a face is committed
+SCAN_CONSENSUS_WINDOW = _env_int("SCAN_CONSENSUS_WINDOW", 5)
+SCAN_CONSENSUS_THRESHOLD = _env_float("SCAN_CONSENSUS_THRESHOLD", 0.6)
+# Invalid scans: how many of the least confident stickers may be relabeled, and at most how many at once
+SCAN_REPAIR_CANDIDATES = _env_int("SCAN_REPAIR_CANDIDATES", 8)
+SCAN_REPAIR_MAX_CHANGES = _env_int("SCAN_REPAIR_MAX_CHANGES", 3)
+# Batch scanning of image folders and video files (POST /scan/batch and app.tools.scan_batch):
+# worker processes, images per task, video frames per task (each task seeks to its segment once),
+# and the only directory POST /scan/batch may read from (unset disables the endpoint)
+SCAN_POOL_WORKERS = _env_int("SCAN_POOL_WORKERS", os.cpu_count() or 1)
+SCAN_POOL_CHUNK_SIZE = _env_int("SCAN_POOL_CHUNK_SIZE", 8)
+SCAN_VIDEO_SEGMENT_FRAMES = _env_int("SCAN_VIDEO_SEGMENT_FRAMES", 240)
+SCAN_BATCH_ROOT = os.getenv("SCAN_BATCH_ROOT") or None
+
+# Solver
+# Entries kept in the in-memory LRU solution cache
+SOLVER_CACHE_SIZE = _env_int("SOLVER_CACHE_SIZE", 4096)
+# Optional SQLite file backing the solution cache across restarts and workers
+SOLVER_CACHE_PATH = os.getenv("SOLVER_CACHE_PATH") or None
+# Worker processes for batch solving (POST /solve/batch and app.tools.solve_batch)
+SOLVER_POOL_WORKERS = _env_int("SOLVER_POOL_WORKERS", os.cpu_count() or 1)
+# States sent to a pool worker per task; larger chunks amortize inter-process overhead
+SOLVER_POOL_CHUNK_SIZE = _env_int("SOLVER_POOL_CHUNK_SIZE", 16)
+# Anytime solving of scanned cubes: time budget for looking for shorter solutions (0 solves once,
+# taking the first solution) and the length at which a solution is good enough to stop early
+SOLVER_BUDGET_MS = _env_int("SOLVER_BUDGET_MS", 1000)
+SOLVER_TARGET_LENGTH = _env_int("SOLVER_TARGET_LENGTH", 20)
+# Optional shallow solution index built with app.tools.build_shallow_index; checked before the search
+SOLVER_SHALLOW_INDEX_PATH = os.getenv("SOLVER_SHALLOW_INDEX_PATH") or None
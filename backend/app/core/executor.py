@@ -0,0 +1,76 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .config import FRAME_EXECUTOR_WORKERS
+from .metrics import EXECUTOR_BACKLOG, FRAMES_DROPPED, FRAMES_RECEIVED
+from .profiling import active_capture
+
+_frame_executor = None
+
+
+def get_frame_executor() -> ThreadPoolExecutor:
+    """
+    Process-wide executor for the CV pipeline, shared by every WebSocket session of this worker.
+    """
+    global _frame_executor
+    if _frame_executor is None:
+        _frame_executor = ThreadPoolExecutor(max_workers=FRAME_EXECUTOR_WORKERS, thread_name_prefix="frame")
+    return _frame_executor
+
+
+def executor_backlog() -> int:
+    """
+    Number of CV jobs submitted to the frame executor that have not started yet.
+    """
+    if _frame_executor is None:
+        return 0
+    return _frame_executor._work_queue.qsize()
+
+
+EXECUTOR_BACKLOG.set_function(executor_backlog)
+
+
+async def run_in_frame_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    capture = active_capture()
+    if capture is not None and capture.matches():
+        # Keep the session context on the worker thread so stage timings can be attributed
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(get_frame_executor(), context.run, capture.run_job, partial(func, *args, **kwargs))
+    return await loop.run_in_executor(get_frame_executor(), partial(func, *args, **kwargs))
+
+
+class LatestFrameQueue:
+    """
+    Bounded per-session frame queue with latest-frame-wins semantics.
+    put() never blocks: when the queue is full the oldest frame is dropped.
+    """
+
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = max(1, maxsize)
+        self._frames = []
+        self._ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        self.received += 1
+        FRAMES_RECEIVED.inc()
+        if len(self._frames) >= self.maxsize:
+            self._frames.pop(0)
+            self.dropped += 1
+            FRAMES_DROPPED.inc()
+        self._frames.append(frame)
+        self._ready.set()
+
+    async def get(self):
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.pop(0)
+
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
@@ -0,0 +1,208 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, fine enough below 50 ms for per-stage percentiles of the frame pipeline
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {} if labelnames else {(): 0.0}
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """
+    Gauge set explicitly, or read from a callback at scrape time (set_function).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._value = 0.0
+        self._function = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def value(self) -> float:
+        return self._function() if self._function is not None else self._value
+
+    def _samples(self) -> list:
+        return [f"{self.name} {_format_value(self.value())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts (last one is +Inf), sum]
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def _samples(self) -> list:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics rendered in the Prometheus text format by GET /metrics.
+
+    Metrics are updated from the event loop and the frame executor threads, so every update takes
+    the metric's lock. Each server worker process keeps its own registry.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Per-stage latency of the frame pipeline and the solver: decode, preprocess, isolate, classify, solve
+STAGE_SECONDS = REGISTRY.histogram("rubix_stage_seconds", "Latency of one pipeline stage in seconds.", ("stage",))
+ACTIVE_SESSIONS = REGISTRY.gauge("rubix_active_sessions", "WebSocket sessions served by this worker.")
+EXECUTOR_BACKLOG = REGISTRY.gauge("rubix_executor_backlog", "Frame executor jobs waiting to start.")
+FRAMES_RECEIVED = REGISTRY.counter("rubix_frames_received_total", "Frames received over WebSocket.")
+FRAMES_PROCESSED = REGISTRY.counter("rubix_frames_processed_total", "Frames decoded and run through the pipeline.")
+FRAMES_DROPPED = REGISTRY.counter("rubix_frames_dropped_total", "Frames replaced in a session queue before being processed.")
+DETECTIONS = REGISTRY.counter("rubix_detections_total", "Face detections by result.", ("result",))
+SOLVER_LOOKUPS = REGISTRY.counter("rubix_solver_lookups_total",
+                                  "Solves by where the answer came from: shallow_index, cache, search or invalid.", ("source",))
+SOLVER_ANYTIME = REGISTRY.counter("rubix_solver_anytime_total",
+                                  "Anytime solves by how they ended: target, exhausted, budget, cancelled or invalid.", ("outcome",))
+CALIBRATIONS = REGISTRY.counter("rubix_calibrations_total", "Color calibrations applied, by color (reset for resets).", ("color",))
+SESSIONS_REJECTED = REGISTRY.counter("rubix_sessions_rejected_total", "WebSocket sessions refused by admission control.")
+FLOW_LEVELS = REGISTRY.counter("rubix_flow_control_updates_total",
+                               "Flow control updates sent to clients, by level: normal, degraded or overloaded.", ("level",))
+CLASSIFY_BATCH_SIZE = REGISTRY.histogram("rubix_classify_batch_size", "Faces classified together in one cross-session batch.",
+                                         buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+CLASSIFY_BATCH_WAIT = REGISTRY.histogram("rubix_classify_batch_wait_seconds",
+                                         "Time a located face waited for its classification batch to start.")
+MESSAGES_SENT = REGISTRY.counter("rubix_ws_messages_sent_total",
+                                 "WebSocket messages sent to clients, by kind: single, or batch (one per processed frame).", ("kind",))
+PRESENCE_GATE_RESULTS = REGISTRY.counter("rubix_presence_gate_total",
+                                         "Frames checked by the presence gate while waiting for a cube, by result: "
+                                         "static, rejected or escalated (decoded for the full check).", ("result",))
+
+# Extra receiver of every stage timing, set by app.core.profiling only while a capture is armed
+stage_hook = None
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+    if stage_hook is not None:
+        stage_hook(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
@@ -0,0 +1,227 @@
+import asyncio
+import contextvars
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+import numpy as np
+
+from . import metrics
+from .config import PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL_MS
+
+PROFILE_MODES = ("sampling", "cprofile")
+
+# Session whose frame is being processed, propagated to executor threads while a capture is armed
+CURRENT_SESSION = contextvars.ContextVar("current_session", default=None)
+
+_capture = None  # The armed ProfileCapture, if any
+
+
+def active_capture():
+    return _capture
+
+
+def _frame_name(frame) -> str:
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+def _collapse(frame, root: str) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.append(root)
+    return ";".join(reversed(names))
+
+
+class ProfileCapture:
+    """
+    One profiling capture of a worker, or of a single session, for the next `frames` frames or
+    `seconds` seconds, whichever comes first.
+
+    "sampling" mode samples the Python stacks of the threads running frame jobs (and, for worker-wide
+    captures, the event loop) every PROFILE_SAMPLE_INTERVAL_MS and returns them in the collapsed
+    format read by flamegraph.pl and speedscope. "cprofile" mode runs each frame job under cProfile
+    and returns the most expensive functions. Both modes also report the pipeline stage timings seen
+    during the capture.
+    """
+
+    def __init__(self, mode: str = "sampling", frames: Optional[int] = None, seconds: Optional[float] = None,
+                 session_id: Optional[int] = None, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {', '.join(PROFILE_MODES)}")
+        if frames is not None and frames < 1:
+            raise ValueError("frames must be at least 1")
+        self.mode = mode
+        self.frames = frames
+        self.seconds = min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        self.session_id = session_id
+        self.interval = interval_ms / 1000
+        self.frames_seen = 0
+        self.samples = Counter()
+        self.stages = defaultdict(list)
+        self.skipped_jobs = 0  # cProfile jobs that overlapped another profiled job (Python 3.12+)
+        self._stats = None
+        self._threads = {}  # thread ident -> number of frame jobs it is running
+        self._lock = threading.Lock()
+        self._done = asyncio.Event()
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._loop_thread = None
+        self.started = None
+        self.duration = None
+
+    def matches(self) -> bool:
+        return self.session_id is None or CURRENT_SESSION.get() == self.session_id
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.mode == "sampling":
+            if self.session_id is None:
+                self._loop_thread = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+            self._stopped.set()
+            if self._sampler is not None:
+                self._sampler.join()
+        self._done.set()
+
+    async def wait(self) -> dict:
+        try:
+            await asyncio.wait_for(self._done.wait(), self.seconds)
+        except asyncio.TimeoutError:
+            pass
+        self.stop()
+        return self.result()
+
+    def frame_done(self):
+        # Called on the event loop after each processed frame of a matching session
+        self.frames_seen += 1
+        if self.frames is not None and self.frames_seen >= self.frames:
+            self.stop()
+
+    def record_stage(self, stage: str, seconds: float):
+        if self.matches():
+            with self._lock:
+                self.stages[stage].append(seconds)
+
+    def run_job(self, func):
+        """
+        Run one frame executor job of a matching session, tracking its thread for the sampler
+        or profiling it with cProfile.
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+        try:
+            if self.mode != "cprofile":
+                return func()
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # Another job holds the interpreter-wide profiler
+                self.skipped_jobs += 1
+                return func()
+            try:
+                return func()
+            finally:
+                profiler.disable()
+                with self._lock:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profiler)
+                    else:
+                        self._stats.add(profiler)
+        finally:
+            with self._lock:
+                self._threads[ident] -= 1
+                if not self._threads[ident]:
+                    del self._threads[ident]
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                targets = [(ident, "frame_executor") for ident in self._threads]
+            if self._loop_thread is not None:
+                targets.append((self._loop_thread, "event_loop"))
+            for ident, root in targets:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                if root == "event_loop" and frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+                    continue  # Idle event loop
+                self.samples[_collapse(frame, root)] += 1
+
+    def _stage_summary(self) -> dict:
+        summary = {}
+        with self._lock:
+            stages = {stage: np.asarray(values) * 1000 for stage, values in self.stages.items()}
+        for stage, values in sorted(stages.items()):
+            summary[stage] = {
+                "count": int(values.size),
+                "total_ms": round(float(values.sum()), 3),
+                "mean_ms": round(float(values.mean()), 3),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p95_ms": round(float(np.percentile(values, 95)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return summary
+
+    def _top_functions(self, limit: int = 40) -> list:
+        if self._stats is None:
+            return []
+        rows = sorted(self._stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls,
+                 "tottime_ms": round(tottime * 1000, 3), "cumtime_ms": round(cumtime * 1000, 3)}
+                for (filename, line, name), (_, calls, tottime, cumtime, _) in rows]
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def result(self) -> dict:
+        result = {
+            "mode": self.mode,
+            "session_id": self.session_id,
+            "duration_s": round(self.duration, 3),
+            "frames": self.frames_seen,
+            "stages": self._stage_summary(),
+        }
+        if self.mode == "sampling":
+            result["interval_ms"] = self.interval * 1000
+            result["samples"] = sum(self.samples.values())
+            result["collapsed"] = self.collapsed()
+        else:
+            result["skipped_jobs"] = self.skipped_jobs
+            result["functions"] = self._top_functions()
+        return result
+
+
+def arm(capture: ProfileCapture) -> ProfileCapture:
+    """
+    Arm a capture; only one may be armed per worker at a time. Until it stops, stage timings and
+    frame executor jobs pass through it; the rest of the time the hooks cost one global check.
+    """
+    global _capture
+    if _capture is not None:
+        raise RuntimeError("A profile capture is already running")
+    _capture = capture
+    metrics.stage_hook = capture.record_stage
+    capture.start()
+    return capture
+
+
+def disarm(capture: ProfileCapture):
+    global _capture
+    capture.stop()
+    if _capture is capture:
+        _capture = None
+        metrics.stage_hook = None
@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+
+def _default(value):
+    # numpy scalars and arrays that reach a message, e.g. bbox coordinates
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(message) -> bytes:
+        """
+        Compact UTF-8 JSON of an outbound message.
+        """
+        return orjson.dumps(message, default=_default, option=_ORJSON_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default)
+
+    def dumps(message) -> bytes:
+        """
+        Compact UTF-8 JSON of an outbound message.
+        """
+        return _encoder.encode(message).encode()
+
+
+ENCODER = "orjson" if orjson is not None else "json"
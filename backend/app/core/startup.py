@@ -0,0 +1,35 @@
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Imported first by app.main, so this approximates when the application started importing
+IMPORT_STARTED = time.perf_counter()
+
+# Optional heavy dependencies whose presence in sys.modules is reported by GET /startup
+HEAVY_MODULES = ("torch", "ultralytics", "kociemba", "cv2")
+
+_timings = {}
+
+
+def record_timing(name: str, seconds: float):
+    _timings[name] = round(seconds * 1000, 2)
+
+
+def startup_report() -> dict:
+    """
+    Import and startup timings in milliseconds, peak RSS and which heavy modules were loaded.
+    """
+    max_rss_mb = None
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss_mb = round(max_rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    return {
+        "timings_ms": dict(_timings),
+        "max_rss_mb": max_rss_mb,
+        "modules_loaded": {name: name in sys.modules for name in HEAVY_MODULES},
+    }
@@ -1,8 +1,29 @@
+import time
+from contextlib import asynccontextmanager
+from .core.startup import IMPORT_STARTED, record_timing
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api.routes import router
+from .core.config import SOLVER_BUDGET_MS
+from .services.anytime_solver import start_search_server
+from .services.detector_backends import get_detector_backend
 
-app = FastAPI(title="Rubik's Cube Solver", version="1.0.0")
+record_timing("import", time.perf_counter() - IMPORT_STARTED)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the configured backend (and any model weights) before the first session connects
+    start = time.perf_counter()
+    get_detector_backend()
+    if SOLVER_BUDGET_MS > 0:
+        start_search_server()
+    record_timing("startup", time.perf_counter() - start)
+    record_timing("ready", time.perf_counter() - IMPORT_STARTED)
+    yield
+
+
+app = FastAPI(title="Rubik's Cube Solver", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,4 +33,5 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(router)
\ No newline at end of file
+app.include_router(router)
+
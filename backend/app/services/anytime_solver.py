@@ -0,0 +1,191 @@
+import asyncio
+import multiprocessing
+import multiprocessing.forkserver
+import time
+from typing import AsyncIterator, Optional
+
+import kociemba
+from ..core.config import SOLVER_BUDGET_MS, SOLVER_TARGET_LENGTH
+from ..core.executor import run_in_frame_executor
+from ..core.metrics import SOLVER_ANYTIME, SOLVER_LOOKUPS, observe_stage
+from .cube_state import canonicalize, remap_moves
+from .cube_validator import validation_error
+from .shallow_index import get_shallow_index
+from .solution_cache import get_solution_cache
+
+# The two-phase search cannot be interrupted once started, so each anytime solve runs in its own
+# process that is killed on cancellation or when the budget runs out. Processes are forked from a
+# server with kociemba preloaded: a few ms to start, and safe with the API process's threads.
+_context = multiprocessing.get_context("forkserver")
+_context.set_forkserver_preload([__name__])
+
+MAX_SOLUTION_LENGTH = 24  # kociemba's default search depth
+PROCESS_EXIT_TIMEOUT = 5.0  # Longest a background thread waits for a killed search process to exit
+
+
+def start_search_server():
+    """
+    Start the fork server now rather than on the first solve, which would wait for it.
+    """
+    multiprocessing.forkserver.ensure_running()
+
+
+def _search(state: str, max_length: int, target_length: int, conn):
+    """
+    Child process: send successively shorter solutions, each found with a depth limit one below the
+    previous one, until one is at most target_length moves or none shorter exists.
+    """
+    try:
+        while max_length > 0:
+            try:
+                moves = kociemba.solve(state, max_depth=max_length).split()
+            except ValueError:
+                break  # Nothing within max_length
+            conn.send(moves)
+            if len(moves) <= target_length:
+                break
+            max_length = len(moves) - 1
+    finally:
+        conn.send(None)
+        conn.close()
+
+
+class AnytimeSolve:
+    """
+    Solve one cube within a time budget, aiming for at most target_length moves.
+
+    Iterating yields improving solutions (each shorter than the last, in the caller's facelet
+    labels) as the search finds them. It stops when a solution reaches target_length, when no shorter
+    one exists, when budget seconds have passed since the first solution was asked for (a first
+    solution is always waited for), or on cancel(), which may be called from any task on the loop.
+    The shortest solution found is added to the solution cache.
+    """
+
+    def __init__(self, state: str, budget: float = SOLVER_BUDGET_MS / 1000, target_length: int = SOLVER_TARGET_LENGTH,
+                 cache=None, shallow_index=None):
+        self.state = state
+        self.budget = budget
+        self.target_length = target_length
+        self.cache = cache if cache is not None else get_solution_cache()
+        self.shallow_index = shallow_index if shallow_index is not None else get_shallow_index()
+        self.best = None  # Shortest solution so far, in the caller's labels
+        self.outcome = None  # target, exhausted, budget, cancelled or invalid once finished
+        self._process = None
+        self._wake = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.outcome == "cancelled"
+
+    def cancel(self):
+        if self.outcome is None:
+            self.outcome = "cancelled"
+            self._stop_process()
+            self._wake.set()
+
+    def _stop_process(self):
+        if self._process is not None and self._process.is_alive():
+            self._process.kill()
+
+    def _reap_process(self):
+        # Collect the exit status of the (killed or finished) search process without blocking the
+        # event loop: this also runs when the consumer is cancelled, and an exit can take a moment
+        process = self._process
+        process.join(0)
+        if process.exitcode is None:
+            asyncio.get_running_loop().run_in_executor(None, process.join, PROCESS_EXIT_TIMEOUT)
+
+    def __aiter__(self) -> AsyncIterator[list]:
+        return self.solutions()
+
+    async def solutions(self) -> AsyncIterator[list]:
+        """
+        Improving solutions as they are found. Raises ValueError for states that cannot be solved.
+        """
+        start = time.perf_counter()
+        try:
+            try:
+                canonical, face_map = canonicalize(self.state)
+                error = validation_error(canonical)
+            except ValueError as e:
+                error = str(e)
+            if error:
+                SOLVER_LOOKUPS.inc("invalid")
+                self.outcome = "invalid"
+                raise ValueError(error)
+            moves = self.shallow_index.lookup(canonical) if self.shallow_index is not None else None
+            if moves is not None:  # Optimal already
+                SOLVER_LOOKUPS.inc("shallow_index")
+                self.best, self.outcome = remap_moves(moves, face_map), "exhausted"
+                yield self.best
+                return
+            cached = self.cache.get(canonical)
+            if cached is not None:
+                self.best = remap_moves(cached, face_map)
+                yield self.best
+                if len(cached) <= self.target_length:
+                    SOLVER_LOOKUPS.inc("cache")
+                    self.outcome = "target"
+                    return
+            SOLVER_LOOKUPS.inc("search")
+            async for moves in self._search(canonical, start):
+                self.cache.put(canonical, moves)
+                self.best = remap_moves(moves, face_map)
+                yield self.best
+            if self.best is None and self.outcome != "cancelled":
+                # The search process died before its first solution: solve once here instead
+                moves = (await run_in_frame_executor(kociemba.solve, canonical)).split()
+                self.cache.put(canonical, moves)
+                self.best = remap_moves(moves, face_map)
+                yield self.best
+        finally:
+            self._stop_process()
+            if self.outcome is None:
+                self.outcome = "cancelled"  # The consumer stopped iterating
+            SOLVER_ANYTIME.inc(self.outcome)
+            observe_stage("solve", time.perf_counter() - start)
+
+    async def _search(self, canonical: str, start: float):
+        loop = asyncio.get_running_loop()
+        receiver, sender = _context.Pipe(duplex=False)
+        max_length = len(self.best) - 1 if self.best is not None else MAX_SOLUTION_LENGTH
+        self._process = _context.Process(target=_search, args=(canonical, max_length, self.target_length, sender), daemon=True)
+        self._process.start()
+        sender.close()
+        loop.add_reader(receiver.fileno(), self._wake.set)
+        try:
+            while self.outcome is None:
+                timeout = None if self.best is None else max(0.0, start + self.budget - time.perf_counter())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    self.outcome = "budget"
+                    break
+                self._wake.clear()
+                while self.outcome is None and receiver.poll():
+                    try:
+                        moves = receiver.recv()
+                    except EOFError:
+                        moves = None
+                    if moves is None:
+                        self.outcome = "target" if self.best is not None and len(self.best) <= self.target_length else "exhausted"
+                        break
+                    yield moves
+        finally:
+            loop.remove_reader(receiver.fileno())
+            receiver.close()
+            self._stop_process()
+            self._reap_process()
+
+
+async def solve_anytime(state: str, budget: float = SOLVER_BUDGET_MS / 1000, target_length: int = SOLVER_TARGET_LENGTH) -> Optional[list]:
+    """
+    Shortest solution found within the budget, or None for states that cannot be solved.
+    """
+    solve = AnytimeSolve(state, budget, target_length)
+    try:
+        async for _ in solve:
+            pass
+    except ValueError:
+        return None
+    return solve.best
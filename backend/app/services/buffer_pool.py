@@ -0,0 +1,30 @@
+import numpy as np
+
+
+class BufferPool:
+    """
+    Named scratch arrays reused from frame to frame, passed as dst to OpenCV calls.
+
+    Each name owns one flat allocation that only grows: get() returns a view of its first
+    prod(shape) elements, so a frame (or ROI window) of a different size reuses the memory instead
+    of reallocating it. A buffer is overwritten by the next get() of the same name, so a pool must
+    only serve one frame at a time, as within a session.
+    """
+
+    __slots__ = ("_buffers",)
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name: str, shape, dtype=np.uint8) -> np.ndarray:
+        size = 1
+        for dim in shape:
+            size *= dim
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(size, dtype)
+        return buffer[:size].reshape(shape)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
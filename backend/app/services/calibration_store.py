@@ -0,0 +1,237 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ..core.config import CALIBRATION_STORE, CALIBRATION_STORE_PATH
+from .color_classifier import ColorClassifier
+
+# Profile ids are chosen by clients (a camera device id, a user name...) and used in URLs and file names
+PROFILE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.:=+-]{1,128}$')
+
+CALIBRATION_STORES = {}
+
+
+def register_store(name: str):
+    """
+    Register a calibration store class under a name selectable through CALIBRATION_STORE.
+    Stores are constructed with the CALIBRATION_STORE_PATH setting (a path, URL or None) and
+    implement get, put, delete and list on plain JSON-serializable profile records.
+    """
+    def decorator(cls):
+        cls.name = name
+        CALIBRATION_STORES[name] = cls
+        return cls
+    return decorator
+
+
+def validate_profile_id(profile_id) -> str:
+    if not isinstance(profile_id, str) or not PROFILE_ID_PATTERN.match(profile_id):
+        raise ValueError("Calibration profile ids are 1-128 letters, digits or _.:=+- characters")
+    return profile_id
+
+
+def _record(color_ranges: dict, calibrated_colors) -> dict:
+    # Ranges hold numpy integers after calibrate_color; store plain ints
+    return {
+        "color_ranges": {color: [[int(v) for v in lower], [int(v) for v in upper]] for color, (lower, upper) in color_ranges.items()},
+        "calibrated_colors": sorted(calibrated_colors),
+        "updated": time.time(),
+    }
+
+
+@register_store("memory")
+class MemoryCalibrationStore:
+    """
+    Profiles kept in this worker only; for tests and single-process development.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._records.get(profile_id)
+
+    def put(self, profile_id: str, record: dict):
+        with self._lock:
+            self._records[profile_id] = record
+
+    def delete(self, profile_id: str) -> bool:
+        with self._lock:
+            return self._records.pop(profile_id, None) is not None
+
+    def list(self) -> list:
+        with self._lock:
+            return sorted(self._records)
+
+
+@register_store("file")
+class FileCalibrationStore:
+    """
+    One JSON file per profile in a directory; writes go through a temporary file and a rename so
+    readers in other workers never see a partial profile.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.directory = path or "calibration_profiles"
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(profile_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, profile_id: str, record: dict):
+        path = self._path(profile_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def delete(self, profile_id: str) -> bool:
+        try:
+            os.remove(self._path(profile_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list(self) -> list:
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+
+@register_store("sqlite")
+class SqliteCalibrationStore:
+    """
+    Profiles in an SQLite file shared by every worker pointed at it (WAL mode, like the solution cache).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or "calibration_profiles.db"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS calibration_profiles (id TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self._db.commit()
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT record FROM calibration_profiles WHERE id = ?", (profile_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, profile_id: str, record: dict):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO calibration_profiles (id, record) VALUES (?, ?)", (profile_id, json.dumps(record)))
+            self._db.commit()
+
+    def delete(self, profile_id: str) -> bool:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM calibration_profiles WHERE id = ?", (profile_id,)).rowcount
+            self._db.commit()
+        return deleted > 0
+
+    def list(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM calibration_profiles ORDER BY id")]
+
+
+@dataclass
+class CalibrationProfile:
+    id: str
+    color_ranges: dict
+    calibrated_colors: list
+    updated: float
+    classifier: ColorClassifier = field(repr=False)
+
+    def summary(self) -> dict:
+        return {"id": self.id, "calibrated_colors": self.calibrated_colors, "updated": self.updated}
+
+
+class CalibrationProfiles:
+    """
+    Worker-wide cache of calibration profiles over a store, with their compiled classifiers.
+
+    A profile is compiled once per worker and shared by every session using it (ColorClassifier is
+    immutable). Each load re-reads the small store record and recompiles only when another session
+    or worker saved a newer version, so profiles stay consistent across workers.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.compiles = 0
+
+    def load(self, profile_id: str) -> Optional[CalibrationProfile]:
+        validate_profile_id(profile_id)
+        record = self.store.get(profile_id)
+        if record is None:
+            with self._lock:
+                self._profiles.pop(profile_id, None)
+            return None
+        with self._lock:
+            profile = self._profiles.get(profile_id)
+            if profile is not None and profile.updated == record["updated"]:
+                self.hits += 1
+                return profile
+        return self._remember(profile_id, record)
+
+    def save(self, profile_id: str, color_ranges: dict, calibrated_colors, classifier: ColorClassifier = None) -> CalibrationProfile:
+        """
+        Store a detector's calibration under profile_id; classifier is reused when already compiled.
+        """
+        validate_profile_id(profile_id)
+        record = _record(color_ranges, calibrated_colors)
+        self.store.put(profile_id, record)
+        return self._remember(profile_id, record, classifier)
+
+    def delete(self, profile_id: str) -> bool:
+        validate_profile_id(profile_id)
+        with self._lock:
+            self._profiles.pop(profile_id, None)
+        return self.store.delete(profile_id)
+
+    def list(self) -> list:
+        return self.store.list()
+
+    def _remember(self, profile_id: str, record: dict, classifier: ColorClassifier = None) -> CalibrationProfile:
+        color_ranges = {color: (lower, upper) for color, (lower, upper) in record["color_ranges"].items()}
+        if classifier is None:
+            classifier = ColorClassifier(color_ranges)
+            self.compiles += 1
+        profile = CalibrationProfile(profile_id, color_ranges, record["calibrated_colors"], record["updated"], classifier)
+        with self._lock:
+            self._profiles[profile_id] = profile
+        return profile
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"store": self.store.name, "cached": len(self._profiles), "hits": self.hits, "compiles": self.compiles}
+
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+
+def get_calibration_profiles() -> CalibrationProfiles:
+    """
+    Per-process profile cache over the CALIBRATION_STORE backend.
+    """
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            if CALIBRATION_STORE not in CALIBRATION_STORES:
+                raise ValueError(f"Unknown CALIBRATION_STORE {CALIBRATION_STORE!r}, expected one of {', '.join(sorted(CALIBRATION_STORES))}")
+            _profiles = CalibrationProfiles(CALIBRATION_STORES[CALIBRATION_STORE](CALIBRATION_STORE_PATH))
+        return _profiles
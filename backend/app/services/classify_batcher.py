@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+from ..core.config import CLASSIFY_BATCH_MAX, CLASSIFY_BATCH_WAIT_MS
+from ..core.executor import run_in_frame_executor
+from ..core.metrics import CLASSIFY_BATCH_SIZE, CLASSIFY_BATCH_WAIT, stage_timer
+from .color_classifier import classify_batch
+
+
+def _classify_batch(requests: list) -> list:
+    with stage_timer("classify_batch"):
+        return classify_batch(requests)
+
+
+class ClassifyBatcher:
+    """
+    Worker-wide scheduler that classifies the located faces of all sessions in shared batches.
+
+    A session announces a face with expect() before locating the cube on the frame executor, then
+    hands its sticker regions to classify(). A batch is started as soon as no announced face is
+    still being located, when it reaches max_batch faces, or wait seconds after its first face
+    arrived, whichever comes first, so a lone session is never held back. Faces arriving while a
+    batch runs on the frame executor join the next one. Runs on the event loop.
+    """
+
+    def __init__(self, wait: float = CLASSIFY_BATCH_WAIT_MS / 1000, max_batch: int = CLASSIFY_BATCH_MAX):
+        self.wait = wait
+        self.max_batch = max(1, max_batch)
+        self.expected = 0  # Announced faces not handed over yet
+        self._pending = []  # (classifier, rois, arrival time, future)
+        self._timer = None
+        self.batches = 0
+        self.faces = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.wait > 0
+
+    def expect(self):
+        self.expected += 1
+
+    def forget(self):
+        """
+        Withdraw an announced face that will not be classified (locating it failed).
+        """
+        self.expected -= 1
+        if self._pending and self.expected <= 0:
+            self._start_batch()
+
+    async def classify(self, classifier, rois):
+        """
+        (labels, confidence) of the stickers of one announced face, as ColorClassifier.classify_labels.
+        """
+        self.expected -= 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((classifier, rois, time.perf_counter(), future))
+        if len(self._pending) >= self.max_batch or self.expected <= 0:
+            self._start_batch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.wait, self._start_batch)
+        return await future
+
+    def _start_batch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:  # More than one full batch was waiting
+            self._timer = asyncio.get_running_loop().call_soon(self._start_batch)
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: list):
+        started = time.perf_counter()
+        for _, _, arrived, _ in batch:
+            CLASSIFY_BATCH_WAIT.observe(started - arrived)
+        CLASSIFY_BATCH_SIZE.observe(len(batch))
+        self.batches += 1
+        self.faces += len(batch)
+        try:
+            results = await run_in_frame_executor(_classify_batch, [(classifier, rois) for classifier, rois, _, _ in batch])
+        except Exception as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, _, future), result in zip(batch, results):
+            if not future.done():  # The session may have been cancelled meanwhile
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "wait_ms": self.wait * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "faces": self.faces,
+            "mean_batch_size": round(self.faces / self.batches, 2) if self.batches else None,
+        }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_classify_batcher() -> ClassifyBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = ClassifyBatcher()
+        return _batcher
+
+
+async def detect_face_batched(detector, img, expected_center_color=None, return_confidence=False):
+    """
+    CubeDetector.detect_face with the classification step batched across sessions; must be called
+    on the event loop. Falls back to detect_face on the frame executor when batching is disabled.
+    """
+    batcher = get_classify_batcher()
+    if not batcher.enabled:
+        return await run_in_frame_executor(detector.detect_face, img, expected_center_color, return_confidence)
+    batcher.expect()
+    try:
+        rois, bbox = await run_in_frame_executor(detector.locate_face, img)
+    except BaseException:
+        batcher.forget()
+        raise
+    labels, confidence = await batcher.classify(detector.classifier, rois)
+    return detector.face_result(labels, confidence, bbox, expected_center_color, return_confidence)
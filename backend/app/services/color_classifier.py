@@ -0,0 +1,162 @@
+import cv2
+import numpy as np
+
+HUE_BINS = 180
+WHITE_MAX_SATURATION = 40  # white: average saturation below this...
+WHITE_MIN_VALUE = 200      # ...and average value above this
+UNKNOWN = 'U'
+
+
+class ColorClassifier:
+    """
+    HSV range classifier compiled into lookup tables.
+
+    Every rule of the classifier (the white rule, then one rule per color range in dict order) owns
+    one bit. hue_lut, sat_lut and val_lut map each channel value to the bitmask of rules that value
+    satisfies, so ANDing the three lookups yields the rules satisfied by an HSV triple, and
+    first_match maps that mask to the label of the first rule that fired. This is the dense
+    180x256x256 HSV->label table factored per channel, which keeps it a few KB instead of ~12 MB.
+
+    Instances are immutable; CubeDetector compiles a new one whenever its color ranges change.
+    """
+
+    def __init__(self, color_ranges: dict):
+        # Rule 0 is the white shortcut, then one rule per range; 'R2' style keys label as their first letter
+        self.rule_labels = ['W'] + [color[0] for color in color_ranges]
+        self.labels = np.array([UNKNOWN] + sorted(set(self.rule_labels)))
+        label_index = {label: idx for idx, label in enumerate(self.labels)}
+
+        n_rules = len(self.rule_labels)
+        dtype = np.uint32 if n_rules > 16 else (np.uint16 if n_rules > 8 else np.uint8)
+        self.hue_lut = np.zeros(HUE_BINS, dtype)
+        self.sat_lut = np.zeros(256, dtype)
+        self.val_lut = np.zeros(256, dtype)
+
+        values = np.arange(256)
+        hues = np.arange(HUE_BINS)
+        self.hue_lut |= dtype(1)
+        self.sat_lut[values < WHITE_MAX_SATURATION] |= dtype(1)
+        self.val_lut[values > WHITE_MIN_VALUE] |= dtype(1)
+
+        for rule, (lower, upper) in enumerate(color_ranges.values(), start=1):
+            bit = dtype(1 << rule)
+            h_low, h_high = int(lower[0]), int(upper[0])
+            if h_low <= h_high:
+                in_range = (hues >= h_low) & (hues <= h_high)
+            else:
+                # Range wraps around the hue circle (e.g. red 170..10)
+                in_range = (hues >= h_low) | (hues <= h_high)
+            self.hue_lut[in_range] |= bit
+            self.sat_lut[values >= lower[1]] |= bit
+            self.val_lut[values >= lower[2]] |= bit
+
+        # Label of the lowest set bit for every possible mask
+        self.first_match = np.zeros(1 << n_rules, np.uint8)
+        masks = np.arange(1, 1 << n_rules)
+        lowest_bit = np.log2(masks & -masks).astype(np.intp)
+        rule_label_index = np.array([label_index[label] for label in self.rule_labels], np.uint8)
+        self.first_match[1:] = rule_label_index[lowest_bit]
+
+        # With up to 8 rules the masks fit in uint8 and per-pixel lookups can use cv2.LUT
+        self._pixel_lut = None
+        if dtype is np.uint8:
+            hue_lut = np.zeros(256, np.uint8)
+            hue_lut[:HUE_BINS] = self.hue_lut
+            self._pixel_lut = np.dstack([hue_lut, self.sat_lut, self.val_lut]).reshape(256, 1, 3)
+
+    def lookup(self, h, s, v) -> np.ndarray:
+        """
+        Label indices (into self.labels) for integer H, S, V arrays of any matching shape.
+        """
+        return self.first_match[self.hue_lut[h] & self.sat_lut[s] & self.val_lut[v]]
+
+    def label_pixels(self, hsv: np.ndarray) -> np.ndarray:
+        """
+        Label index of every pixel of a 3-channel HSV array, shape (rows, cols, 3) -> (rows, cols).
+        """
+        if self._pixel_lut is None:
+            return self.lookup(hsv[..., 0], hsv[..., 1], hsv[..., 2])
+        h_mask, s_mask, v_mask = cv2.split(cv2.LUT(hsv, self._pixel_lut))
+        masks = cv2.bitwise_and(cv2.bitwise_and(h_mask, s_mask), v_mask)
+        return cv2.LUT(masks, self.first_match).reshape(hsv.shape[:2])
+
+    def classify(self, rois: np.ndarray, features=None):
+        """
+        Classify a batch of HSV sticker regions in one vectorized pass.
+
+        rois: uint8 array of shape (n, pixels, 3); features: their sticker_features() when already computed.
+        Returns (label_indices, confidence), both of shape (n,). A sticker is labelled from its
+        dominant hue and mean saturation/value; its confidence is the fraction of its pixels that
+        individually classify to the same label (0 for unknown stickers).
+        """
+        pixels = rois.shape[1]
+        dominant_hue, avg_saturation, avg_value = features if features is not None else sticker_features(rois)
+        label_indices = self.lookup(dominant_hue, avg_saturation, avg_value)
+
+        pixel_labels = self.label_pixels(rois)
+        confidence = np.count_nonzero(pixel_labels == label_indices[:, None], axis=1) / np.float32(pixels)
+        confidence = confidence.astype(np.float32)
+        confidence[label_indices == 0] = 0.0
+        return label_indices, confidence
+
+    def classify_labels(self, rois: np.ndarray):
+        """
+        Same as classify() but returns the labels as a string, one character per sticker.
+        """
+        label_indices, confidence = self.classify(rois)
+        return ''.join(self.labels[label_indices]), confidence
+
+
+def sticker_features(rois: np.ndarray):
+    """
+    Dominant hue, mean saturation and mean value of each of n HSV sticker regions (n, pixels, 3),
+    the part of classification that does not depend on the color ranges.
+    """
+    n, pixels = rois.shape[:2]
+    # Per-sticker hue histograms via one bincount over offset hue values
+    offsets = (np.arange(n, dtype=np.intp) * HUE_BINS)[:, None]
+    hist = np.bincount((rois[:, :, 0] + offsets).ravel(), minlength=n * HUE_BINS).reshape(n, HUE_BINS)
+    dominant_hue = hist.argmax(axis=1)
+    averages = cv2.reduce(rois, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).reshape(n, 3) // pixels
+    return dominant_hue, averages[:, 1].astype(np.intp), averages[:, 2].astype(np.intp)
+
+
+def classify_batch(requests: list) -> list:
+    """
+    Classify the stickers of several faces, each with its own classifier, in as few passes as possible.
+
+    requests: (classifier, rois) pairs, rois as for ColorClassifier.classify with the same pixel
+    count throughout. Sticker features are computed once for the whole batch, then the stickers of
+    all requests sharing a classifier are labelled together.
+    Returns one (labels, confidence) pair per request, as ColorClassifier.classify_labels.
+    """
+    rois = np.concatenate([request_rois for _, request_rois in requests]) if len(requests) > 1 else requests[0][1]
+    features = sticker_features(rois)
+    bounds = np.cumsum([0] + [len(request_rois) for _, request_rois in requests])
+
+    groups = {}  # id(classifier) -> (classifier, request indices)
+    for idx, (classifier, _) in enumerate(requests):
+        groups.setdefault(id(classifier), (classifier, []))[1].append(idx)
+
+    results = [None] * len(requests)
+    for classifier, indices in groups.values():
+        if len(indices) == len(requests):
+            stickers = slice(None)
+        else:
+            stickers = np.concatenate([np.arange(bounds[idx], bounds[idx + 1]) for idx in indices])
+        label_indices, confidence = classifier.classify(rois[stickers], tuple(feature[stickers] for feature in features))
+        start = 0
+        for idx in indices:
+            end = start + bounds[idx + 1] - bounds[idx]
+            results[idx] = (''.join(classifier.labels[label_indices[start:end]]), confidence[start:end])
+            start = end
+    return results
+
+
+def grid_rois(hsv: np.ndarray, rows: int, cols: int, tile: int) -> np.ndarray:
+    """
+    Split the top-left rows x cols grid of tile x tile cells of an HSV image into an
+    (rows * cols, tile * tile, 3) array, ordered row-major.
+    """
+    grid = hsv[:rows * tile, :cols * tile]
+    return grid.reshape(rows, tile, cols, tile, 3).swapaxes(1, 2).reshape(rows * cols, tile * tile, 3)
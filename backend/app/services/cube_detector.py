@@ -1,47 +1,142 @@
 import cv2
 import numpy as np
-import kociemba
-import random
-import time
 import logging
-from functools import wraps
-from ultralytics import YOLO
+import threading
+from functools import partial
+from types import MappingProxyType
+from ..core.metrics import stage_timer
+from .buffer_pool import BufferPool
+from .color_classifier import ColorClassifier, grid_rois
+from .detector_backends import CUBE_CROP_SIZE, crop_cube, get_detector_backend
+from .roi_tracker import RoiTracker
 
 logger = logging.getLogger(__name__)
 
-def timeit(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        logger.debug(f"{func.__name__} took {end_time - start_time:.4f} seconds")
-        return result
-    return wrapper
+# Define default HSV color ranges for Rubik's cube colors
+# Adjusted HSV ranges to better match manual RGB validation
+# Manual RGB validation:
+# Y: [180, 173, 42],    // Yellow
+# W: [130, 125, 130],  // White
+# R: [170, 18, 33],      // Red
+# G: [4, 97, 21],      // Green
+# B: [0, 33, 84],      // Blue
+# O: [234, 53, 25]     // Orange
+DEFAULT_COLOR_RANGES = MappingProxyType({
+    'R': ((0, 120, 70), (10, 255, 255)),  # Red lower range
+    'R2': ((170, 120, 70), (180, 255, 255)),  # Red upper range
+    'O': ((11, 100, 100), (25, 255, 255)),  # Orange
+    'Y': ((26, 50, 50), (34, 255, 255)),  # Yellow
+    'G': ((35, 50, 50), (85, 255, 255)),  # Green
+    'B': ((90, 50, 50), (130, 255, 255)),  # Blue
+    'W': ((0, 0, 200), (180, 30, 255)),  # White
+})
+
+# detect_presence: a cube shows several colors (hue or saturation spread) and enough colored pixels
+PRESENCE_MIN_HUE_STD = 15
+PRESENCE_MIN_SAT_STD = 20
+PRESENCE_COLOR_SATURATION = 50  # Pixels more saturated than this count as colored
+PRESENCE_MIN_COLOR_RATIO = 0.1  # At least 10% colored pixels
+
+
+def presence_status(hsv: np.ndarray, margin: float = 1.0) -> str:
+    """
+    "cube_present" or "cube_absent" from the color statistics of an HSV image. The thresholds are
+    scaled by margin, so a margin below 1 gives a looser check that lets borderline frames through.
+    """
+    # One pass for the standard deviations of all three channels
+    _, std = cv2.meanStdDev(hsv)
+    has_color_variation = std[0, 0] > PRESENCE_MIN_HUE_STD * margin or std[1, 0] > PRESENCE_MIN_SAT_STD * margin
+    if not has_color_variation:
+        return "cube_absent"
+    color_ratio = np.count_nonzero(hsv[:, :, 1] > PRESENCE_COLOR_SATURATION) / (hsv.shape[0] * hsv.shape[1])
+    return "cube_present" if color_ratio > PRESENCE_MIN_COLOR_RATIO * margin else "cube_absent"
+
+
+def _range_key(ranges):
+    # Comparable form of a (lower, upper) range whatever its containers and integer types
+    return None if ranges is None else tuple(tuple(int(v) for v in bound) for bound in ranges)
+
+
+class DetectorCore:
+    """
+    The read-only part of face detection shared by every session of a worker: the localization
+    backend, the default color ranges and their compiled classifier.
+    """
+
+    def __init__(self, backend=None, color_ranges=DEFAULT_COLOR_RANGES):
+        self.backend = backend if backend is not None else get_detector_backend()
+        self.color_ranges = MappingProxyType(dict(color_ranges))
+        self.classifier = ColorClassifier(self.color_ranges)
+
+
+_core = None
+_core_lock = threading.Lock()
+
+
+def get_detector_core() -> DetectorCore:
+    global _core
+    with _core_lock:
+        if _core is None:
+            _core = DetectorCore()
+        return _core
+
+
+class CalibrationOverlay:
+    """
+    A session's calibration on top of the shared core: the color ranges it changed, the colors it
+    calibrated and the classifier compiled for them. An empty overlay uses the core as is.
+    """
+
+    __slots__ = ("color_ranges", "calibrated_colors", "classifier")
+
+    def __init__(self, color_ranges=None, calibrated_colors=(), classifier=None):
+        self.color_ranges = color_ranges  # Overridden ranges only, None when there are none
+        self.calibrated_colors = frozenset(calibrated_colors)
+        self.classifier = classifier  # None: the core's
+
 
 class CubeDetector:
-    def __init__(self):
-        # Define default HSV color ranges for Rubik's cube colors
-        self.default_color_ranges = {
-            # Adjusted HSV ranges to better match manual RGB validation
-            # Manual RGB validation:
-            # Y: [180, 173, 42],    // Yellow
-            # W: [130, 125, 130],  // White
-            # R: [170, 18, 33],      // Red
-            # G: [4, 97, 21],      // Green
-            # B: [0, 33, 84],      // Blue
-            # O: [234, 53, 25]     // Orange
-            'R': ([0, 120, 70], [10, 255, 255]),  # Red lower range
-            'R2': ([170, 120, 70], [180, 255, 255]),  # Red upper range
-            'O': ([11, 100, 100], [25, 255, 255]),  # Orange
-            'Y': ([26, 50, 50], [34, 255, 255]),  # Yellow
-            'G': ([35, 50, 50], [85, 255, 255]),  # Green
-            'B': ([90, 50, 50], [130, 255, 255]),  # Blue
-            'W': ([0, 0, 200], [180, 30, 255]),  # White
-        }
-
-        self.color_ranges = self.default_color_ranges.copy()
-        self.calibrated_colors = set()  # Track which colors have been calibrated
+    """
+    Face detection for one session: the shared DetectorCore, this session's calibration overlay,
+    cube bbox tracking and scratch buffers for its frames.
+    """
+
+    __slots__ = ("core", "backend", "calibration", "roi_tracker", "buffers", "_locate")
+
+    def __init__(self, backend=None, core: DetectorCore = None):
+        self.core = core if core is not None else get_detector_core()
+        # Cube localization backend (see detector_backends); defaults to the DETECTOR_BACKEND setting
+        self.backend = backend if backend is not None else self.core.backend
+        self.calibration = CalibrationOverlay()
+        self.roi_tracker = RoiTracker()  # Reuses the previous cube bbox between frames
+        self.buffers = BufferPool()  # One frame at a time per session, so the buffers can be reused
+        self._locate = partial(self.backend.locate, buffers=self.buffers)
+
+    @property
+    def default_color_ranges(self):
+        return self.core.color_ranges
+
+    @property
+    def color_ranges(self) -> dict:
+        overrides = self.calibration.color_ranges
+        return {**self.core.color_ranges, **overrides} if overrides else dict(self.core.color_ranges)
+
+    @property
+    def calibrated_colors(self) -> frozenset:
+        return self.calibration.calibrated_colors
+
+    @property
+    def classifier(self) -> ColorClassifier:
+        classifier = self.calibration.classifier
+        return classifier if classifier is not None else self.core.classifier
+
+    def _calibrate(self, color_ranges: dict, calibrated_colors, classifier: ColorClassifier = None):
+        # New overlay for the full color_ranges, keeping only what differs from the core
+        overrides = {color: ranges for color, ranges in color_ranges.items()
+                     if _range_key(ranges) != _range_key(self.core.color_ranges.get(color))}
+        if overrides and classifier is None:
+            classifier = ColorClassifier(color_ranges)
+        self.calibration = CalibrationOverlay(overrides or None, calibrated_colors, classifier if overrides else None)
 
     def detect_presence(self, img, roi=None):
         # If ROI is specified, crop the image
@@ -58,28 +153,11 @@ class CubeDetector:
             img = img[y:y+h, x:x+w]
 
         # Convert to HSV and analyze color distribution
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-        # Check for sufficient color variation (cube should have multiple colors)
-        std_hue = np.std(hsv[:, :, 0])
-        std_sat = np.std(hsv[:, :, 1])
-        std_val = np.std(hsv[:, :, 2])
-
-        # Look for cube-like color patterns (high saturation areas for colored stickers)
-        sat_mask = hsv[:, :, 1] > 50
-        color_pixels = np.sum(sat_mask)
-
-        # Cube should occupy reasonable portion of image and have color variation
-        total_pixels = img.shape[0] * img.shape[1]
-        color_ratio = color_pixels / total_pixels
-
-        # Improved detection: check for cube-like characteristics
-        has_color_variation = std_hue > 15 or std_sat > 20
-        has_sufficient_colors = color_ratio > 0.1  # At least 10% colored pixels
-
-        return "cube_present" if has_color_variation and has_sufficient_colors else "cube_absent"
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV, self.buffers.get("presence_hsv", img.shape))
+        return presence_status(hsv)
 
     def calibrate_color(self, color, img):
+        color_ranges = self.color_ranges
         # Calibrate a specific color by analyzing the provided image
         hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
         # Flatten the image to get all pixels
@@ -112,8 +190,8 @@ class CubeDetector:
             s_max = 255
             v_min = max(0, np.min(v_vals) - 20)
             v_max = 255
-            self.color_ranges['R'] = ([h_min, s_min, v_min], [h_max, s_max, v_max])
-            self.color_ranges['R2'] = ([h_min, s_min, v_min], [h_max, s_max, v_max])  # Same for now
+            color_ranges['R'] = ([h_min, s_min, v_min], [h_max, s_max, v_max])
+            color_ranges['R2'] = ([h_min, s_min, v_min], [h_max, s_max, v_max])  # Same for now
         else:
             h_min = max(0, np.min(h_vals) - 10)
             h_max = min(180, np.max(h_vals) + 10)
@@ -121,16 +199,19 @@ class CubeDetector:
             s_max = 255
             v_min = max(0, np.min(v_vals) - 20)
             v_max = 255
-            self.color_ranges[color] = ([h_min, s_min, v_min], [h_max, s_max, v_max])
+            color_ranges[color] = ([h_min, s_min, v_min], [h_max, s_max, v_max])
 
-        self.calibrated_colors.add(color)
+        self._calibrate(color_ranges, self.calibrated_colors | {color})
         return True
 
     def reset_calibration(self):
-        self.color_ranges = self.default_color_ranges.copy()
-        self.calibrated_colors.clear()
+        self.calibration = CalibrationOverlay()  # Back to the shared core
         return True
 
+    def apply_profile(self, profile):
+        # Share the profile's compiled classifier; calibrate_color compiles a new one for this detector
+        self._calibrate(profile.color_ranges, profile.calibrated_colors, profile.classifier)
+
     def is_color_calibrated(self, color):
         return color in self.calibrated_colors
 
@@ -138,113 +219,77 @@ class CubeDetector:
         # Validate that face string is exactly 9 characters for 3x3 face
         return len(face_str) == 9 and all(c in 'ROYGBW' for c in face_str)
 
-    @timeit
     def isolate_cube(self, img):
-        # Isolate the cube from the background using thresholding and contour detection
-        # Enforce 3x3 cube support: resize cropped area to fixed 90x90 for consistent 3x3 grid
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if contours:
-            # Find the largest contour assuming it's the cube
-            largest_contour = max(contours, key=cv2.contourArea)
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            logger.debug(f"isolate_cube: bbox coordinates x={x}, y={y}, w={w}, h={h}")
-            # Check if bbox is square-ish for cube
-            aspect_ratio = w / h if h > 0 else 0
-            if not 0.8 <= aspect_ratio <= 1.2:
-                logger.warning(f"isolate_cube: bbox aspect ratio {aspect_ratio:.2f} not square-ish, may not be cube")
-            # Crop to the cube area
-            cube_img = img[y:y+h, x:x+w]
-            # Resize to fixed 90x90 to enforce 3x3 grid (30x30 per sticker)
-            cube_img = cv2.resize(cube_img, (90, 90), interpolation=cv2.INTER_LINEAR)
-            return cube_img, (x, y, w, h)
-        logger.warning("isolate_cube: no contours found, using fallback")
-        return cv2.resize(img, (90, 90), interpolation=cv2.INTER_LINEAR), (0, 0, img.shape[1], img.shape[0])  # Fallback, resized
-
-    @timeit
-    def detect_face(self, img, expected_center_color=None):
-        # First, isolate the cube
+        # Isolate the cube from the background; returns a fixed 90x90 crop (3x3 grid of 30x30 stickers) and its bbox.
+        # The crop is a reused buffer, valid until the next frame.
+        with stage_timer("isolate"):
+            bbox = self.roi_tracker.locate(img, self._locate)
+            if bbox is None:
+                logger.warning("isolate_cube: no contours found, using fallback")
+                bbox = (0, 0, img.shape[1], img.shape[0])
+            return crop_cube(img, bbox, self.buffers.get("cube", (CUBE_CROP_SIZE, CUBE_CROP_SIZE, 3))), bbox
+
+    def detect_face(self, img, expected_center_color=None, return_confidence=False):
+        rois, bbox = self.locate_face(img)
+        # Classify all 9 stickers of the 3x3 grid in one pass, row-major so index 4 is the middle piece
+        with stage_timer("classify"):
+            face_colors_str, confidence = self.classifier.classify_labels(rois)
+        return self.face_result(face_colors_str, confidence, bbox, expected_center_color, return_confidence)
+
+    def locate_face(self, img):
+        # Isolate the cube and cut its face into the 9 HSV sticker regions to classify, with the bbox
         cube_img, bbox = self.isolate_cube(img)
-        hsv = cv2.cvtColor(cube_img, cv2.COLOR_BGR2HSV)
+        hsv = cv2.cvtColor(cube_img, cv2.COLOR_BGR2HSV, self.buffers.get("cube_hsv", cube_img.shape))
         height, width = hsv.shape[:2]
         face_size = min(height, width) // 3
         logger.debug(f"detect_face: processing image of size {height}x{width}, face_size={face_size}")
+        return grid_rois(hsv, 3, 3, face_size), bbox
 
-        # Define the center square coordinates (middle piece) within isolated cube
-        center_y = height // 2
-        center_x = width // 2
-
-        # Calculate the size of each square
-        square_size = face_size
-
-        # Extract the middle piece color
-        middle_roi = hsv[center_y - square_size//2:center_y + square_size//2, center_x - square_size//2:center_x + square_size//2]
-        middle_color = self.get_dominant_color(middle_roi)
+    def face_result(self, face_colors_str, confidence, bbox, expected_center_color=None, return_confidence=False):
+        # detect_face's result for classified stickers: checks the center and that every sticker has a cube color
+        middle_color = face_colors_str[4]
         logger.debug(f"detect_face: middle color detected as {middle_color}")
 
         # Validate center color if expected
         if expected_center_color and middle_color != expected_center_color:
             logger.warning(f"detect_face: Center color {middle_color} does not match expected {expected_center_color}")
-            return "face_not_detected", 'UUUUUUUUU', bbox
-
-        # Initialize face color matrix with middle piece fixed
-        face_colors = ['U'] * 9
-        face_colors[4] = middle_color  # middle piece fixed
-
-        # Coordinates offsets for surrounding 8 pieces relative to center
-        offsets = [(-1, -1), (-1, 0), (-1, 1),
-                   (0, -1),           (0, 1),
-                   (1, -1),  (1, 0),  (1, 1)]
-
-        for idx, (dy, dx) in enumerate(offsets):
-            y = center_y + dy * square_size
-            x = center_x + dx * square_size
-            roi = hsv[y - square_size//2:y + square_size//2, x - square_size//2:x + square_size//2]
-            if roi.size == 0:
-                color = 'U'
-                logger.warning(f"detect_face: ROI at offset ({dy}, {dx}) is empty")
-            else:
-                color = self.get_dominant_color(roi)
-            # Map to face_colors index (skip middle 4)
-            if idx < 4:
-                face_colors[idx] = color
-            else:
-                face_colors[idx + 1] = color
+            return self._face_result("face_not_detected", 'UUUUUUUUU', bbox, None, return_confidence)
 
         # Return face detected with color matrix string and bbox for overlay
-        face_colors_str = ''.join(face_colors)
         logger.debug(f"detect_face: detected colors {face_colors_str}")
         # Enforce 3x3: validate exactly 9 colors
         if len(face_colors_str) != 9:
             logger.warning(f"detect_face: Detected face has {len(face_colors_str)} colors, expected 9. Rejecting as invalid for 3x3 cube.")
-            return "face_not_detected", 'UUUUUUUUU', bbox
+            return self._face_result("face_not_detected", 'UUUUUUUUU', bbox, None, return_confidence)
         # Validate that it's a valid 3x3 color pattern (all colors are valid cube colors)
         if not all(c in 'ROYGBW' for c in face_colors_str):
             logger.warning(f"detect_face: Invalid colors in face: {face_colors_str}")
-            return "face_not_detected", 'UUUUUUUUU', bbox
-        return "face_detected", face_colors_str, bbox
-
-
-
-    def extract_colors(self, hsv):
-        # Extract colors for all 6 faces with dominant color detection
+            return self._face_result("face_not_detected", 'UUUUUUUUU', bbox, confidence, return_confidence)
+        return self._face_result("face_detected", face_colors_str, bbox, confidence, return_confidence)
+
+    @staticmethod
+    def _face_result(status, face_colors, bbox, confidence, return_confidence):
+        if not return_confidence:
+            return status, face_colors, bbox
+        if confidence is None:
+            confidence = np.zeros(9, np.float32)
+        return status, face_colors, bbox, confidence
+
+    def extract_colors(self, hsv, return_confidence=False):
+        # Extract colors for all 6 faces from a net laid out as 2 rows x 3 columns of faces
         height, width = hsv.shape[:2]
-        face_size = min(height, width) // 3
+        sticker_size = min(height // 6, width // 9)
 
+        # Label all 54 stickers (6 rows x 9 columns) in one pass, then regroup them per face
+        with stage_timer("classify"):
+            labels, confidence = self.classifier.classify_labels(grid_rois(hsv, 6, 9, sticker_size))
         faces = []
+        face_confidence = []
         for face_row in range(2):
             for face_col in range(3):
-                face_colors = []
-                for i in range(3):
-                    for j in range(3):
-                        y = face_row * 3 * face_size + i * face_size
-                        x = face_col * 3 * face_size + j * face_size
-                        roi = hsv[y:y+face_size, x:x+face_size]
-                        color = self.get_dominant_color(roi)
-                        face_colors.append(color)
-                faces.append(face_colors)
+                indices = [(face_row * 3 + i) * 9 + face_col * 3 + j for i in range(3) for j in range(3)]
+                faces.append([labels[idx] for idx in indices])
+                face_confidence.append(confidence[indices])
 
         middle_colors = [face[4] for face in faces]
 
@@ -283,47 +328,27 @@ class CubeDetector:
         full_state = ''.join([''.join(face) for face in faces])
         # Enforce 3x3: validate exactly 54 colors (6 faces x 9 stickers)
         if len(full_state) != 54:
-            print(f"Warning: Detected full cube has {len(full_state)} colors, expected 54. Rejecting as invalid for 3x3 cube.")
-            return 'U' * 54
+            logger.warning("Detected full cube has %d colors, expected 54. Rejecting as invalid for 3x3 cube.", len(full_state))
+            full_state = 'U' * 54
+        if return_confidence:
+            return full_state, np.concatenate(face_confidence)
         return full_state
 
 
 
-    @timeit
     def get_dominant_color(self, roi):
-        # Calculate dominant color in HSV region
-        hist = cv2.calcHist([roi], [0], None, [180], [0, 180])
-        dominant_hue = int(np.argmax(hist))
-        avg_saturation = np.mean(roi[:, :, 1])
-        avg_value = np.mean(roi[:, :, 2])
-        logger.debug(f"get_dominant_color: dominant_hue={dominant_hue}, avg_sat={avg_saturation:.2f}, avg_val={avg_value:.2f}")
-
-        # Refine white detection: white has low saturation but high value
-        if avg_saturation < 40 and avg_value > 200:
-            logger.debug("get_dominant_color: detected white")
-            return 'W'
-
-        for color, (lower, upper) in self.color_ranges.items():
-            # Adjust hue range check to handle wrap-around for red
-            if color == 'R' or color == 'R2':
-                if (dominant_hue >= lower[0] or dominant_hue <= upper[0]) and avg_saturation >= lower[1] and avg_value >= lower[2]:
-                    logger.debug(f"get_dominant_color: detected red using range {color}")
-                    return 'R'
-            else:
-                if lower[0] <= dominant_hue <= upper[0] and avg_saturation >= lower[1] and avg_value >= lower[2]:
-                    logger.debug(f"get_dominant_color: detected {color}")
-                    return color
-        logger.debug("get_dominant_color: no match, returning unknown")
-        return 'U'
-
-
+        # Classify a single HSV region; detect_face and extract_colors classify whole grids at once
+        if roi.size == 0:
+            return 'U'
+        labels, _ = self.classifier.classify_labels(roi.reshape(1, -1, 3))
+        return labels
 
     def optimize(self):
         # Placeholder for any optimization steps
         pass
 
     def __str__(self):
-        return f"CubeDetector with calibrated={self.calibrated}"
+        return f"CubeDetector with backend={self.backend.name}, calibrated={sorted(self.calibrated_colors)}"
 
     def __repr__(self):
         return self.__str__()
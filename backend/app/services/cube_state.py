@@ -0,0 +1,238 @@
+import numpy as np
+
+# Facelet layout follows kociemba: faces in URFDLB order, 9 facelets each, row-major as seen from
+# outside the cube (U with B on top, R/F/L/B with U on top, D with F on top).
+FACES = 'URFDLB'
+FACE_CENTERS = (4, 13, 22, 31, 40, 49)
+SOLVED = ''.join(face * 9 for face in FACES)
+
+# Per face: outward normal, image "right" and image "down" directions (x = R, y = U, z = F)
+_FACE_FRAMES = {
+    'U': ((0, 1, 0), (1, 0, 0), (0, 0, 1)),
+    'R': ((1, 0, 0), (0, 0, -1), (0, -1, 0)),
+    'F': ((0, 0, 1), (1, 0, 0), (0, -1, 0)),
+    'D': ((0, -1, 0), (1, 0, 0), (0, 0, -1)),
+    'L': ((-1, 0, 0), (0, 0, 1), (0, -1, 0)),
+    'B': ((0, 0, -1), (-1, 0, 0), (0, -1, 0)),
+}
+
+
+def _facelet_geometry():
+    positions = []
+    normals = []
+    for face in FACES:
+        normal, right, down = (np.array(v) for v in _FACE_FRAMES[face])
+        for row in range(3):
+            for col in range(3):
+                positions.append(normal + (col - 1) * right + (row - 1) * down)
+                normals.append(normal)
+    return np.array(positions), np.array(normals)
+
+
+_POSITIONS, _NORMALS = _facelet_geometry()
+_FACELET_INDEX = {(tuple(p), tuple(n)): idx for idx, (p, n) in enumerate(zip(_POSITIONS, _NORMALS))}
+
+
+def _quarter_turn(axis) -> np.ndarray:
+    # Clockwise quarter turn seen from the +axis side, i.e. -90 degrees about the axis
+    x, y, z = axis
+    cross = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    return np.outer(axis, axis) - cross
+
+
+def facelet_permutation(axis, layers=(-1, 0, 1)) -> np.ndarray:
+    """
+    Facelet permutation of a clockwise quarter turn about axis of the given layers.
+    Convention: new_state = state[perm].
+    """
+    axis = np.array(axis)
+    inverse = _quarter_turn(axis).T
+    perm = np.arange(54, dtype=np.intp)
+    for idx, (position, normal) in enumerate(zip(_POSITIONS, _NORMALS)):
+        if position @ axis in layers:
+            perm[idx] = _FACELET_INDEX[(tuple(inverse @ position), tuple(inverse @ normal))]
+    return perm
+
+
+def compose(*perms) -> np.ndarray:
+    """
+    Single permutation equivalent to applying perms left to right.
+    """
+    result = np.arange(54, dtype=np.intp)
+    for perm in perms:
+        result = result[perm]
+    return result
+
+
+def _whole_cube_rotations() -> np.ndarray:
+    # Closure of the x, y, z whole-cube turns: the 24 orientations of the cube
+    generators = [facelet_permutation(axis) for axis in ((1, 0, 0), (0, 1, 0), (0, 0, 1))]
+    seen = {np.arange(54, dtype=np.intp).tobytes(): np.arange(54, dtype=np.intp)}
+    frontier = list(seen.values())
+    while frontier:
+        next_frontier = []
+        for rotation in frontier:
+            for generator in generators:
+                candidate = rotation[generator]
+                key = candidate.tobytes()
+                if key not in seen:
+                    seen[key] = candidate
+                    next_frontier.append(candidate)
+        frontier = next_frontier
+    return np.array(list(seen.values()))
+
+
+ROTATIONS = _whole_cube_rotations()  # (24, 54)
+
+_FACE_AXES = {
+    'U': (0, 1, 0),
+    'R': (1, 0, 0),
+    'F': (0, 0, 1),
+    'D': (0, -1, 0),
+    'L': (-1, 0, 0),
+    'B': (0, 0, -1),
+}
+
+
+def _face_turns() -> dict:
+    moves = {}
+    for face in FACES:
+        quarter = facelet_permutation(_FACE_AXES[face], layers=(1,))
+        moves[face] = quarter
+        moves[face + '2'] = compose(quarter, quarter)
+        moves[face + "'"] = compose(quarter, quarter, quarter)
+    return moves
+
+
+# The 18 face turns in face-major order (U, U2, U', R, ...) and their facelet permutations
+MOVES = _face_turns()
+MOVE_NAMES = list(MOVES)
+MOVE_TABLE = np.array([MOVES[name] for name in MOVE_NAMES])  # (18, 54)
+_IDENTITY = np.arange(54, dtype=np.intp)
+_CENTERS = np.array(FACE_CENTERS)
+_FACE_CODES = np.frombuffer(FACES.encode('ascii'), np.uint8)
+
+
+def canonicalize(state: str):
+    """
+    Canonical form of a 54-facelet state under color relabeling and whole-cube rotation.
+
+    Every rotation of the cube is relabeled so that each face takes the URFDLB letter of the
+    position its center sits in, and the lexicographically smallest result is the canonical state.
+    Returns (canonical_state, face_map) where face_map maps a face letter of the canonical
+    state to the face of the input it corresponds to, see remap_moves().
+    Raises ValueError when the state is not 54 facelets with 6 distinct centers.
+    """
+    if len(state) != 54:
+        raise ValueError(f"Cube state must have 54 facelets, got {len(state)}")
+    facelets = np.frombuffer(state.encode('ascii'), np.uint8)
+    centers = facelets[_CENTERS]
+    if len(set(centers.tolist())) != 6:
+        raise ValueError("Cube state must have 6 distinct center colors")
+
+    rotated = facelets[ROTATIONS]  # (24, 54)
+    relabel = np.zeros((len(ROTATIONS), 256), np.uint8)
+    relabel[np.arange(len(ROTATIONS))[:, None], rotated[:, _CENTERS]] = _FACE_CODES
+    candidates = relabel[np.arange(len(ROTATIONS))[:, None], rotated]
+    best = min(range(len(ROTATIONS)), key=lambda idx: candidates[idx].tobytes())
+
+    face_map = {face: FACES[ROTATIONS[best][center] // 9] for face, center in zip(FACES, FACE_CENTERS)}
+    return candidates[best].tobytes().decode('ascii'), face_map
+
+
+def remap_moves(moves, face_map) -> list:
+    """
+    Translate moves expressed on a canonical state back to the faces of the original state.
+    """
+    return [face_map[move[0]] + move[1:] for move in moves]
+
+
+# Face letters in the /ws scan order, see from_scan_faces()
+SCAN_ORDER = 'FRBLUD'
+
+
+def from_scan_faces(front: str, right: str, back: str, left: str, top: str, bottom: str) -> str:
+    """
+    Assemble a facelet state from faces scanned in the /ws order (front, right, back, left with
+    the top face up, then top with the back face up and bottom with the front face up).
+    """
+    return top + right + front + bottom + left + back
+
+
+def face_slice(face: str) -> slice:
+    start = FACES.index(face) * 9
+    return slice(start, start + 9)
+
+
+def to_array(state: str) -> np.ndarray:
+    """
+    Facelet state as a uint8 array of label codes (the ASCII letters, so any labeling round-trips).
+    """
+    if len(state) != 54:
+        raise ValueError(f"Cube state must have 54 facelets, got {len(state)}")
+    return np.frombuffer(state.encode('ascii'), np.uint8)
+
+
+def to_string(facelets: np.ndarray) -> str:
+    return facelets.tobytes().decode('ascii')
+
+
+def parse_moves(moves) -> list:
+    """
+    Accept a move string ("R U2 F'") or a list of moves and validate every move name.
+    """
+    if isinstance(moves, str):
+        moves = moves.split()
+    for move in moves:
+        if move not in MOVES:
+            raise ValueError(f"Unknown move: {move}")
+    return list(moves)
+
+
+def sequence_permutation(moves) -> np.ndarray:
+    """
+    Compose a move sequence into a single facelet permutation.
+    """
+    perm = _IDENTITY
+    for move in parse_moves(moves):
+        perm = perm[MOVES[move]]
+    return perm
+
+
+def invert_moves(moves) -> list:
+    inverted = []
+    for move in reversed(parse_moves(moves)):
+        if move.endswith('2'):
+            inverted.append(move)
+        elif move.endswith("'"):
+            inverted.append(move[0])
+        else:
+            inverted.append(move + "'")
+    return inverted
+
+
+def apply_moves(state, moves):
+    """
+    Apply a move sequence to a state given as a string or uint8 array; returns the same type.
+    """
+    perm = sequence_permutation(moves)
+    if isinstance(state, str):
+        return to_string(to_array(state)[perm])
+    return state[..., perm]
+
+
+def apply_batch(states: np.ndarray, sequences) -> np.ndarray:
+    """
+    Apply every sequence to every state.
+
+    states: (n, 54) uint8 array, sequences: iterable of m move sequences.
+    Returns an (n, m, 54) array where [i, j] is states[i] after sequences[j].
+    """
+    perms = np.array([sequence_permutation(sequence) for sequence in sequences])
+    return np.asarray(states)[:, perms]
+
+
+def is_solved(state) -> bool:
+    facelets = to_array(state) if isinstance(state, str) else state
+    faces = facelets.reshape(6, 9)
+    return bool((faces == faces[:, 4:5]).all())
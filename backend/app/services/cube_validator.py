@@ -0,0 +1,138 @@
+import itertools
+from typing import Optional
+
+import numpy as np
+
+from .cube_state import FACE_CENTERS, FACES
+
+# Facelets of every corner and edge position, U/D (or F/B for middle-layer edges) facelet first and
+# corners listed clockwise; same tables as the kociemba reference implementation.
+CORNER_FACELETS = (
+    (8, 9, 20), (6, 18, 38), (0, 36, 47), (2, 45, 11),      # URF UFL ULB UBR
+    (29, 26, 15), (27, 44, 24), (33, 53, 42), (35, 17, 51),  # DFR DLF DBL DRB
+)
+EDGE_FACELETS = (
+    (5, 10), (7, 19), (3, 37), (1, 46),      # UR UF UL UB
+    (32, 16), (28, 25), (30, 43), (34, 52),  # DR DF DL DB
+    (23, 12), (21, 41), (50, 39), (48, 14),  # FR FL BL BR
+)
+CORNER_COLORS = ('URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB')
+EDGE_COLORS = ('UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR')
+
+# Facelet colors read at a position -> (cubie, orientation). The orientation is the twist
+# (corners) or flip (edges) needed to bring the cubie's reference facelet to the reference slot.
+_CORNER_LOOKUP = {
+    colors[-twist:] + colors[:-twist] if twist else colors: (cubie, twist)
+    for cubie, colors in enumerate(CORNER_COLORS) for twist in range(3)
+}
+_EDGE_LOOKUP = {colors[::-1] if flip else colors: (cubie, flip) for cubie, colors in enumerate(EDGE_COLORS) for flip in range(2)}
+
+
+def _odd_permutation(perm) -> bool:
+    inversions = sum(1 for a, b in itertools.combinations(perm, 2) if a > b)
+    return inversions % 2 == 1
+
+
+def _face_labels(state: str) -> str:
+    # Relabel facelets by the face their color's center sits on, so any 6 colors are accepted
+    centers = [state[center] for center in FACE_CENTERS]
+    if len(set(centers)) != 6:
+        raise ValueError("Cube state must have 6 distinct center colors")
+    return state.translate(str.maketrans(''.join(centers), FACES))
+
+
+def validation_error(state: str) -> Optional[str]:
+    """
+    Why a 54-facelet state cannot be a reachable cube, or None when it is solvable.
+
+    Checks color counts, that every corner and edge is a real cubie appearing exactly once,
+    corner twist and edge flip sums, and that corner and edge permutation parities match.
+    """
+    if len(state) != 54:
+        return f"Cube state must have 54 facelets, got {len(state)}"
+    try:
+        faces = _face_labels(state)
+    except ValueError as ve:
+        return str(ve)
+    for face in FACES:
+        if faces.count(face) != 9:
+            return f"Color {state[FACE_CENTERS[FACES.index(face)]]} appears {faces.count(face)} times instead of 9"
+
+    corners = []
+    twist = 0
+    for position, facelets in enumerate(CORNER_FACELETS):
+        cubie = _CORNER_LOOKUP.get(''.join(faces[f] for f in facelets))
+        if cubie is None:
+            return f"Corner {CORNER_COLORS[position]} has an impossible color combination"
+        corners.append(cubie[0])
+        twist += cubie[1]
+    if len(set(corners)) != 8:
+        return "A corner appears more than once"
+
+    edges = []
+    flip = 0
+    for position, facelets in enumerate(EDGE_FACELETS):
+        cubie = _EDGE_LOOKUP.get(''.join(faces[f] for f in facelets))
+        if cubie is None:
+            return f"Edge {EDGE_COLORS[position]} has an impossible color combination"
+        edges.append(cubie[0])
+        flip += cubie[1]
+    if len(set(edges)) != 12:
+        return "An edge appears more than once"
+
+    if twist % 3:
+        return "A corner is twisted"
+    if flip % 2:
+        return "An edge is flipped"
+    if _odd_permutation(corners) != _odd_permutation(edges):
+        return "Two pieces are swapped"
+    return None
+
+
+def is_valid_state(state: str) -> bool:
+    return validation_error(state) is None
+
+
+def repair_state(state: str, confidence, max_changes: int = 3, candidates: int = 8):
+    """
+    Cheapest relabeling of low-confidence stickers that makes an invalid state solvable.
+
+    Single relabelings are tried on every non-center sticker; combinations of up to max_changes
+    stickers only among the `candidates` least confident ones. A sticker may take any center color
+    and a relabeling costs the summed confidence of the stickers it changes. Color counts prune the
+    search before the full validity check.
+    Returns (repaired_state, changed_facelet_indices), or None when no repair within max_changes exists.
+    """
+    confidence = np.asarray(confidence, np.float32)
+    colors = [state[center] for center in FACE_CENTERS]
+    ranked = [int(idx) for idx in np.argsort(confidence, kind='stable') if idx not in FACE_CENTERS]
+    counts = {color: state.count(color) for color in colors}
+    if sum(counts.values()) != 54:
+        return None  # Labels outside the center colors are not repaired
+    excess = {color: count - 9 for color, count in counts.items()}
+
+    best = None
+    for size in range(1, max_changes + 1):
+        for positions in itertools.combinations(ranked if size == 1 else ranked[:candidates], size):
+            cost = float(confidence[list(positions)].sum())
+            if best is not None and cost >= best[0]:
+                continue
+            for labels in itertools.product(colors, repeat=size):
+                if any(label == state[pos] for pos, label in zip(positions, labels)):
+                    continue
+                balance = dict(excess)
+                for pos, label in zip(positions, labels):
+                    balance[state[pos]] -= 1
+                    balance[label] += 1
+                if any(balance.values()):
+                    continue
+                facelets = list(state)
+                for pos, label in zip(positions, labels):
+                    facelets[pos] = label
+                candidate = ''.join(facelets)
+                if is_valid_state(candidate):
+                    best = (cost, candidate, sorted(positions))
+                    break
+    if best is None:
+        return None
+    return best[1], best[2]
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+
+import cv2
+
+from ..core.startup import record_timing
+
+logger = logging.getLogger(__name__)
+
+# Side of the square cube crop; detect_face splits it into a 3x3 grid of stickers
+CUBE_CROP_SIZE = 90
+
+DETECTOR_BACKENDS = {}
+
+
+def register_backend(name: str):
+    """
+    Register a detector backend class under a name selectable through DETECTOR_BACKEND.
+    Backends implement locate(img, buffers=None) returning the cube bbox (x, y, w, h) or None;
+    buffers is the calling session's BufferPool for scratch images.
+    """
+    def decorator(cls):
+        cls.name = name
+        DETECTOR_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def crop_cube(img, bbox, dst=None):
+    """
+    Fixed size square crop of bbox (3x3 grid of 30x30 stickers), written to dst when given.
+    """
+    x, y, w, h = bbox
+    return cv2.resize(img[y:y+h, x:x+w], (CUBE_CROP_SIZE, CUBE_CROP_SIZE), dst, interpolation=cv2.INTER_LINEAR)
+
+
+@register_backend("opencv")
+class OpenCVBackend:
+    """
+    Classic contour detector: the largest external contour of the adaptive threshold is the cube.
+    """
+
+    def locate(self, img, buffers=None):
+        """
+        Cube bbox (x, y, w, h) in img coordinates, or None when nothing was found.
+        """
+        shape = img.shape[:2]
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, buffers and buffers.get("locate_gray", shape))
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0, buffers and buffers.get("locate_blur", shape))
+        thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2,
+                                       buffers and buffers.get("locate_thresh", shape))
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        # Find the largest contour assuming it's the cube
+        largest_contour = max(contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(largest_contour)
+        logger.debug(f"isolate_cube: bbox coordinates x={x}, y={y}, w={w}, h={h}")
+        # Check if bbox is square-ish for cube
+        aspect_ratio = w / h if h > 0 else 0
+        if not 0.8 <= aspect_ratio <= 1.2:
+            logger.warning(f"isolate_cube: bbox aspect ratio {aspect_ratio:.2f} not square-ish, may not be cube")
+        return x, y, w, h
+
+
+@register_backend("yolo")
+class YoloBackend:
+    """
+    Ultralytics YOLO detector. ultralytics (and torch) are imported and the weights loaded only when
+    this backend is selected; frames without a detection fall back to the contour detector.
+    """
+
+    def __init__(self):
+        from ..core.config import YOLO_CONFIDENCE, YOLO_MODEL_PATH
+        if not YOLO_MODEL_PATH:
+            raise RuntimeError("DETECTOR_BACKEND=yolo requires YOLO_MODEL_PATH")
+        start = time.perf_counter()
+        from ultralytics import YOLO
+        record_timing("ultralytics_import", time.perf_counter() - start)
+        self.model = YOLO(YOLO_MODEL_PATH)
+        self.confidence = YOLO_CONFIDENCE
+        self.fallback = OpenCVBackend()
+
+    def locate(self, img, buffers=None):
+        boxes = self.model.predict(img, conf=self.confidence, verbose=False)[0].boxes
+        if len(boxes) == 0:
+            return self.fallback.locate(img, buffers)
+        best = int(boxes.conf.argmax())
+        x1, y1, x2, y2 = (int(v) for v in boxes.xyxy[best].tolist())
+        x1, y1 = max(0, x1), max(0, y1)
+        return x1, y1, max(1, min(img.shape[1], x2) - x1), max(1, min(img.shape[0], y2) - y1)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_detector_backend(name: str = None):
+    """
+    Shared backend instance for this process, created on first use; defaults to DETECTOR_BACKEND.
+    Backends are stateless per frame, so one instance (and one copy of any model weights) serves
+    every session of a worker.
+    """
+    if name is None:
+        from ..core.config import DETECTOR_BACKEND
+        name = DETECTOR_BACKEND
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend: {name} (available: {', '.join(DETECTOR_BACKENDS)})")
+    with _backends_lock:
+        if name not in _backends:
+            start = time.perf_counter()
+            _backends[name] = DETECTOR_BACKENDS[name]()
+            record_timing(f"detector_backend_{name}", time.perf_counter() - start)
+        return _backends[name]
@@ -0,0 +1,67 @@
+import numpy as np
+
+from ..core.config import SCAN_CONSENSUS_THRESHOLD, SCAN_CONSENSUS_WINDOW
+
+CUBE_COLORS = 'ROYGBW'
+_COLOR_CODES = np.frombuffer(CUBE_COLORS.encode('ascii'), np.uint8)
+_NO_LABEL = ord('U')
+
+
+class FaceConsensus:
+    """
+    Sliding-window vote over the per-sticker readings of one face.
+
+    The last `window` frames are kept in fixed-size ring arrays of labels and confidences; frames
+    where the face was not detected occupy a slot with no votes, so stale readings age out. Each
+    sticker takes the label with the highest summed confidence, and the face is committed once every
+    sticker's label was read in at least `threshold` of the window's slots. With the defaults a
+    steady face commits on its third frame.
+    """
+
+    def __init__(self, window: int = SCAN_CONSENSUS_WINDOW, threshold: float = SCAN_CONSENSUS_THRESHOLD):
+        if window < 1 or not 0 < threshold <= 1:
+            raise ValueError("Consensus needs window >= 1 and 0 < threshold <= 1")
+        self.window = window
+        self.threshold = threshold
+        self.labels = np.full((window, 9), _NO_LABEL, np.uint8)
+        self.confidence = np.zeros((window, 9), np.float32)
+        self.position = 0
+        self.frames = 0
+
+    def reset(self):
+        self.labels.fill(_NO_LABEL)
+        self.confidence.fill(0)
+        self.position = 0
+        self.frames = 0
+
+    def _push(self, labels: np.ndarray, confidence):
+        self.labels[self.position] = labels
+        self.confidence[self.position] = confidence
+        self.position = (self.position + 1) % self.window
+        self.frames += 1
+
+    def add(self, face_colors: str, confidence: np.ndarray):
+        """
+        Record one detected face; returns the agreed face string once committed, otherwise None.
+        """
+        self._push(np.frombuffer(face_colors.encode('ascii'), np.uint8), confidence)
+        face, agreement, _ = self.vote()
+        return face if agreement.min() >= self.threshold else None
+
+    def add_miss(self):
+        self._push(_NO_LABEL, 0)
+
+    def vote(self):
+        """
+        Current per-sticker winners as a face string, the fraction of slots agreeing with each, and
+        each winner's summed confidence per slot (its support, used to rank stickers for repair).
+        """
+        matches = self.labels[None, :, :] == _COLOR_CODES[:, None, None]  # (colors, window, 9)
+        weights = np.where(matches, self.confidence[None], 0).sum(axis=1)
+        # Each agreeing reading counts, even one with zero pixel confidence
+        counts = matches.sum(axis=1)
+        winners = np.lexsort((counts, weights), axis=0)[-1]
+        stickers = np.arange(9)
+        agreement = counts[winners, stickers] / self.window
+        support = weights[winners, stickers] / self.window
+        return _COLOR_CODES[winners].tobytes().decode('ascii'), agreement, support
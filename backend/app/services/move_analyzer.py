@@ -1,4 +1,9 @@
-import kociemba
+import logging
+
+from .cube_state import MOVE_NAMES, MOVE_TABLE, apply_moves, face_slice, invert_moves, parse_moves, sequence_permutation, to_array
+
+logger = logging.getLogger(__name__)
+
 
 class MoveAnalyzer:
     def analyze_move(self, prev_state: str, current_state: str, expected_move: str) -> str:
@@ -8,11 +13,98 @@ class MoveAnalyzer:
         """
         try:
             # Apply the expected move to the previous state
-            new_state = kociemba.apply_move(prev_state, expected_move)
+            new_state = apply_moves(prev_state, expected_move)
             if new_state == current_state:
                 return "correct"
             else:
                 return "wrong"
         except Exception as e:
-            print(f"Move analyzer error: {e}")
-            return "wrong"
\ No newline at end of file
+            logger.error("Move analyzer error: %s", e)
+            return "wrong"
+
+
+# Stateless, so one instance serves every session
+MOVE_ANALYZER = MoveAnalyzer()
+
+
+class SolveTracker:
+    """
+    Follows a user performing a solution by watching a single face of the cube.
+
+    Every intermediate state of the solution, and every state one wrong face turn away from it,
+    is computed once up front. Each observation is then a dict lookup of the watched face's
+    9 labels against the expected face of the next step and its mistake neighbourhood.
+    """
+
+    def __init__(self, state: str, moves, watched_face: str = 'F'):
+        self.watched_face = watched_face
+        self._face = face_slice(watched_face)
+        self._start(to_array(state), parse_moves(moves))
+
+    def _start(self, facelets, moves):
+        self.moves = moves
+        self.position = 0
+        # states[i] is the cube after the first i moves, neighbours[i, m] is states[i] after MOVE_NAMES[m]
+        states = [facelets]
+        for move in moves:
+            states.append(states[-1][sequence_permutation([move])])
+        self.states = states
+        neighbours = [state[MOVE_TABLE] for state in states]
+        self._faces = [state[self._face].tobytes() for state in states]
+        self._mistakes = []
+        for idx, options in enumerate(neighbours):
+            expected = self._faces[idx + 1] if idx < len(moves) else None
+            mistakes = {}
+            for name, neighbour in zip(MOVE_NAMES, options):
+                face = neighbour[self._face].tobytes()
+                # The expected step and "no move yet" win over any mistake that looks the same
+                if face != expected and face != self._faces[idx] and face not in mistakes:
+                    mistakes[face] = (name, neighbour)
+            self._mistakes.append(mistakes)
+
+    @property
+    def done(self) -> bool:
+        return self.position >= len(self.moves)
+
+    @property
+    def next_move(self):
+        return None if self.done else self.moves[self.position]
+
+    def expected_face(self) -> str:
+        """
+        Labels the watched face should show once the next move is done.
+        """
+        return self._faces[min(self.position + 1, len(self.moves))].decode('ascii')
+
+    def step_visible(self) -> bool:
+        """
+        False when the next move does not change the watched face (e.g. B while watching F).
+        Such moves can only be confirmed explicitly through advance().
+        """
+        return not self.done and self._faces[self.position + 1] != self._faces[self.position]
+
+    def advance(self):
+        if not self.done:
+            self.position += 1
+
+    def observe(self, face_colors: str) -> dict:
+        """
+        Match the labels of the watched face against the expected progress of the solution.
+        Returns a dict with "result" set to one of "solved", "correct", "waiting", "wrong", "unknown".
+        """
+        if self.done:
+            return {"result": "solved"}
+        face = face_colors.encode('ascii')
+        move = self.moves[self.position]
+        if face == self._faces[self.position + 1] and self.step_visible():
+            self.position += 1
+            return {"result": "solved" if self.done else "correct", "move": move}
+        if face == self._faces[self.position]:
+            return {"result": "waiting", "move": move}
+        mistake = self._mistakes[self.position].get(face)
+        if mistake is not None:
+            performed, state = mistake
+            # Undo the wrong turn first, then carry on with the rest of the solution
+            self._start(state, invert_moves([performed]) + self.moves[self.position:])
+            return {"result": "wrong", "move": move, "performed": performed}
+        return {"result": "unknown", "move": move}
@@ -0,0 +1,255 @@
+import base64
+import struct
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..api import frame_protocol
+from ..core.config import (PREPROCESS_BLUR_KSIZE, PREPROCESS_BRIGHTNESS, PREPROCESS_CONTRAST, PREPROCESS_MAX_HEIGHT,
+                           PREPROCESS_MAX_WIDTH, PREPROCESS_REDUCED_DECODE, PREPROCESS_STAGES,
+                           PRESENCE_THUMBNAIL_SIZE)
+from ..core.metrics import observe_stage
+from .buffer_pool import BufferPool
+
+PREPROCESS_STAGE_NAMES = ("resize", "contrast", "blur")
+
+# JPEG start-of-frame markers carry the image size; DHT (C4), JPG (C8) and DAC (CC) share the range
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_REDUCED_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) from the start-of-frame header of a JPEG without decoding it, or None.
+    """
+    data = memoryview(data).cast('B')
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from('>HH', data, pos + 5)
+            return width, height
+        pos += 2 + struct.unpack_from('>H', data, pos + 2)[0]
+    return None
+
+
+def clamp_bbox(bbox, width: int, height: int):
+    """
+    Clip an (x, y, w, h) box to a width x height frame, keeping at least one pixel.
+    """
+    x, y, w, h = (int(v) for v in bbox)
+    x = min(max(0, x), width - 1)
+    y = min(max(0, y), height - 1)
+    w = min(max(1, w), width - x)
+    h = min(max(1, h), height - y)
+    return x, y, w, h
+
+
+def target_scale(width: int, height: int, max_width: int, max_height: int) -> float:
+    # Same rule as the original pipeline: landscape frames are fit to max_width, others to max_height
+    if width <= max_width and height <= max_height:
+        return 1.0
+    return max_width / width if width > height else max_height / height
+
+
+class Preprocessor:
+    """
+    Decode and preprocess the frames of one session.
+
+    The cubeBbox crop (in source frame pixels) is applied first: raw BGR and YUV420 payloads are
+    sliced before any conversion, and JPEGs are decoded at the largest IMREAD_REDUCED_* factor that
+    still covers the output size. The remaining per-pixel stages (PREPROCESS_STAGES, in order) then
+    only touch the pixels that are kept, writing into buffers reused from frame to frame. The
+    returned image may therefore alias those buffers and is only valid until the next frame; copy it
+    to keep it. A session processes one frame at a time, so one Preprocessor per session is safe.
+    """
+
+    def __init__(self, stages=PREPROCESS_STAGES, max_width: int = PREPROCESS_MAX_WIDTH, max_height: int = PREPROCESS_MAX_HEIGHT,
+                 contrast: float = PREPROCESS_CONTRAST, brightness: float = PREPROCESS_BRIGHTNESS,
+                 blur_ksize: int = PREPROCESS_BLUR_KSIZE, reduced_decode: bool = PREPROCESS_REDUCED_DECODE,
+                 buffers: BufferPool = None):
+        if isinstance(stages, str):
+            stages = [stage.strip() for stage in stages.split(",") if stage.strip()]
+        unknown = set(stages) - set(PREPROCESS_STAGE_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown preprocessing stages {sorted(unknown)}, expected {', '.join(PREPROCESS_STAGE_NAMES)}")
+        if blur_ksize and blur_ksize % 2 == 0:
+            raise ValueError("PREPROCESS_BLUR_KSIZE must be odd (or 0 to disable blurring)")
+        self.stages = tuple(stages)
+        self.max_width = max_width
+        self.max_height = max_height
+        self.contrast = contrast
+        self.brightness = brightness
+        self.blur_ksize = blur_ksize
+        self.reduced_decode = reduced_decode
+        self.buffers = buffers if buffers is not None else BufferPool()
+
+    def _buffer(self, name: str, shape) -> np.ndarray:
+        return self.buffers.get(f"preprocess_{name}", shape)
+
+    def process(self, data: dict, binary_frame=None) -> Optional[np.ndarray]:
+        """
+        Decode a JSON (base64) or binary frame, crop it to its cubeBbox and run the configured stages.
+        Returns the BGR image, or None when it cannot be decoded.
+        """
+        start = time.perf_counter()
+        bbox = data.get("cubeBbox")
+        bbox = bbox if isinstance(bbox, (list, tuple)) and len(bbox) == 4 else None
+        if binary_frame is not None and binary_frame.encoding != frame_protocol.ENCODING_JPEG:
+            img, scale = self._decode_raw(binary_frame, bbox)
+        else:
+            payload = binary_frame.payload if binary_frame is not None else np.frombuffer(base64.b64decode(data["data"]), np.uint8)
+            img, scale = self._decode_jpeg(payload, bbox)
+        decoded = time.perf_counter()
+        observe_stage("decode", decoded - start)
+        if img is None:
+            return None
+
+        for stage in self.stages:
+            stage_start = time.perf_counter()
+            if stage == "resize":
+                img = self._resize(img, scale)
+            elif stage == "contrast":
+                img = cv2.convertScaleAbs(img, self._buffer("contrast", img.shape), self.contrast, self.brightness)
+            elif stage == "blur" and self.blur_ksize:
+                img = cv2.GaussianBlur(img, (self.blur_ksize, self.blur_ksize), 0, self._buffer("blur", img.shape))
+            observe_stage(f"preprocess_{stage}", time.perf_counter() - stage_start)
+        observe_stage("preprocess", time.perf_counter() - decoded)
+        return img
+
+    def thumbnail(self, data: dict, binary_frame=None, max_side: int = PRESENCE_THUMBNAIL_SIZE) -> Optional[np.ndarray]:
+        """
+        Small BGR image (longest side at most about max_side) of the cubeBbox crop of a frame, made
+        as cheaply as its encoding allows: JPEGs are decoded at 1/8 size, which only needs the DC
+        coefficient of each 8x8 block, and raw frames are subsampled without converting the rest.
+        None when the frame cannot be decoded. Aliases a reused buffer, like process().
+        """
+        bbox = data.get("cubeBbox")
+        bbox = bbox if isinstance(bbox, (list, tuple)) and len(bbox) == 4 else None
+        if binary_frame is not None and binary_frame.encoding != frame_protocol.ENCODING_JPEG:
+            img = self._thumbnail_raw(binary_frame, bbox, 2 * max_side)
+        else:
+            payload = binary_frame.payload if binary_frame is not None else np.frombuffer(base64.b64decode(data["data"]), np.uint8)
+            size = jpeg_size(payload)
+            factor = 8 if size is not None else 1
+            img = cv2.imdecode(payload, _REDUCED_FLAGS[factor])
+            if img is not None and bbox is not None:
+                x, y, w, h = clamp_bbox(bbox, *(size or (img.shape[1], img.shape[0])))
+                top, left = y // factor, x // factor
+                img = img[top:max(top + 1, (y + h) // factor), left:max(left + 1, (x + w) // factor)]
+        if img is None:
+            return None
+        # Area averaging also smooths out sensor noise, which would otherwise look like color
+        scale = max_side / max(img.shape[:2])
+        if scale >= 1.0:
+            return img
+        size = (max(1, int(img.shape[1] * scale)), max(1, int(img.shape[0] * scale)))
+        return cv2.resize(img, size, self._buffer("thumbnail", (size[1], size[0], 3)), interpolation=cv2.INTER_AREA)
+
+    def _thumbnail_raw(self, frame, bbox, max_side: int) -> Optional[np.ndarray]:
+        # Every step-th pixel of the crop, longest side at most max_side
+        width, height = frame.width, frame.height
+        if width == 0 or height == 0:
+            return None
+        x, y, w, h = clamp_bbox(bbox, width, height) if bbox is not None else (0, 0, width, height)
+        step = -(-max(w, h) // max_side)
+        if frame.encoding == frame_protocol.ENCODING_BGR:
+            if frame.payload.size != width * height * 3:
+                return None
+            return np.ascontiguousarray(frame.payload.reshape(height, width, 3)[y:y + h:step, x:x + w:step])
+        if frame.encoding == frame_protocol.ENCODING_YUV420:
+            if frame.payload.size != width * height * 3 // 2:
+                return None
+            # A smaller I420 image: the chroma planes sampled with the same step keep half the
+            # resolution of the sampled luma, from even coordinates so they stay aligned
+            x, y = x & ~1, y & ~1
+            plane = width * height
+            luma = frame.payload[:plane].reshape(height, width)[y:y + h:step, x:x + w:step]
+            rows, cols = slice(y // 2, (y + h) // 2, step), slice(x // 2, (x + w) // 2, step)
+            u = frame.payload[plane:plane + plane // 4].reshape(height // 2, width // 2)[rows, cols]
+            v = frame.payload[plane + plane // 4:].reshape(height // 2, width // 2)[rows, cols]
+            rows, cols = min(luma.shape[0] // 2, u.shape[0]), min(luma.shape[1] // 2, u.shape[1])
+            if rows == 0 or cols == 0:
+                return None
+            i420 = self._buffer("thumbnail_yuv", (3 * rows, 2 * cols))
+            i420[:2 * rows] = luma[:2 * rows, :2 * cols]
+            chroma = i420[2 * rows:].reshape(2, rows, cols)
+            chroma[0], chroma[1] = u[:rows, :cols], v[:rows, :cols]
+            return cv2.cvtColor(i420, cv2.COLOR_YUV2BGR_I420, self._buffer("thumbnail_bgr", (2 * rows, 2 * cols, 3)))
+        return None
+
+    def _resize(self, img: np.ndarray, scale: float) -> np.ndarray:
+        if scale >= 1.0:
+            return img
+        size = (max(1, int(img.shape[1] * scale)), max(1, int(img.shape[0] * scale)))
+        return cv2.resize(img, size, self._buffer("resize", (size[1], size[0], 3)), interpolation=cv2.INTER_LINEAR)
+
+    def _decode_jpeg(self, payload: np.ndarray, bbox):
+        """
+        Decode at a reduced size when the output is smaller anyway; returns (image, remaining scale).
+        """
+        size = jpeg_size(payload)
+        if size is None:  # Not a JPEG (or an unusual one): full decode, size from the image
+            img = cv2.imdecode(payload, cv2.IMREAD_COLOR)
+            if img is None:
+                return None, 1.0
+            size = (img.shape[1], img.shape[0])
+            factor = 1
+        else:
+            scale = target_scale(*size, self.max_width, self.max_height) if "resize" in self.stages else 1.0
+            factor = 1
+            if self.reduced_decode:
+                while factor < 8 and scale * factor * 2 <= 1.0:
+                    factor *= 2
+            img = cv2.imdecode(payload, _REDUCED_FLAGS[factor])
+            if img is None:
+                return None, 1.0
+        scale = target_scale(*size, self.max_width, self.max_height)
+        if bbox is not None:
+            x, y, w, h = clamp_bbox(bbox, *size)
+            top, left = y // factor, x // factor
+            img = img[top:max(top + 1, (y + h) // factor), left:max(left + 1, (x + w) // factor)]
+        # The decoded image is already 1/factor of the source size
+        return img, scale * factor
+
+    def _decode_raw(self, frame, bbox):
+        width, height = frame.width, frame.height
+        if width == 0 or height == 0:
+            return None, 1.0
+        scale = target_scale(width, height, self.max_width, self.max_height)
+        if frame.encoding == frame_protocol.ENCODING_BGR:
+            if frame.payload.size != width * height * 3:
+                return None, 1.0
+            img = frame.payload.reshape(height, width, 3)
+            if bbox is not None:
+                x, y, w, h = clamp_bbox(bbox, width, height)
+                img = img[y:y + h, x:x + w]
+            return img, scale
+        if frame.encoding == frame_protocol.ENCODING_YUV420:
+            if frame.payload.size != width * height * 3 // 2:
+                return None, 1.0
+            if bbox is None:
+                return cv2.cvtColor(frame.payload.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_I420), scale
+            # Crop the Y, U and V planes on even coordinates and convert only the crop
+            x, y, w, h = clamp_bbox(bbox, width, height)
+            x, y = x & ~1, y & ~1
+            w, h = max(2, min(w + 1, width - x) & ~1), max(2, min(h + 1, height - y) & ~1)
+            plane = width * height
+            luma = frame.payload[:plane].reshape(height, width)[y:y + h, x:x + w]
+            u = frame.payload[plane:plane + plane // 4].reshape(height // 2, width // 2)[y // 2:(y + h) // 2, x // 2:(x + w) // 2]
+            v = frame.payload[plane + plane // 4:].reshape(height // 2, width // 2)[y // 2:(y + h) // 2, x // 2:(x + w) // 2]
+            crop = self._buffer("yuv", (h * 3 // 2, w))
+            crop[:h] = luma
+            crop.reshape(-1)[w * h:w * h + u.size] = u.reshape(-1)
+            crop.reshape(-1)[w * h + u.size:] = v.reshape(-1)
+            return cv2.cvtColor(crop, cv2.COLOR_YUV2BGR_I420, self._buffer("yuv_bgr", (h, w, 3))), scale
+        return None, 1.0
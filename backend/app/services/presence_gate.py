@@ -0,0 +1,77 @@
+import cv2
+
+from ..core.config import PRESENCE_GATE_MARGIN, PRESENCE_MOTION_THRESHOLD, PRESENCE_THUMBNAIL_SIZE
+from ..core.metrics import PRESENCE_GATE_RESULTS, stage_timer
+from .cube_detector import presence_status
+
+STATIC = "static"
+REJECTED = "rejected"
+ESCALATED = "escalated"
+
+
+class PresenceGate:
+    """
+    The cheap first stages of the cascaded presence check of one session, run on a thumbnail of
+    the frame before it is decoded in full.
+
+    A frame that barely differs from the last one found without a cube is rejected as static; a
+    frame whose thumbnail lacks the colors of a cube (CubeDetector.detect_presence's statistics with
+    looser thresholds) is rejected too. Only the remaining frames are escalated to the full check,
+    and when that finds no cube either, absent() makes the frame the new static reference so an
+    unchanged scene is not escalated again. Not thread-safe: a session checks one frame at a time.
+    """
+
+    def __init__(self, preprocessor, thumbnail_size: int = PRESENCE_THUMBNAIL_SIZE,
+                 motion_threshold: float = PRESENCE_MOTION_THRESHOLD, margin: float = PRESENCE_GATE_MARGIN):
+        self.preprocessor = preprocessor
+        self.thumbnail_size = thumbnail_size
+        self.motion_threshold = motion_threshold
+        self.margin = margin
+        self._reference = None  # Gray thumbnail of the last frame without a cube
+        self._candidate = None  # Gray thumbnail of the frame escalated last
+        self.counts = {STATIC: 0, REJECTED: 0, ESCALATED: 0}
+
+    def check(self, data: dict, binary_frame=None) -> str:
+        """
+        STATIC or REJECTED when the frame shows no cube, ESCALATED when it needs the full check
+        (including frames the thumbnail cannot be made of, so the full decode reports the error).
+        """
+        with stage_timer("presence_gate"):
+            result = self._check(data, binary_frame)
+        self.counts[result] += 1
+        PRESENCE_GATE_RESULTS.inc(result)
+        return result
+
+    def _check(self, data: dict, binary_frame) -> str:
+        thumbnail = self.preprocessor.thumbnail(data, binary_frame, self.thumbnail_size)
+        self._candidate = None
+        if thumbnail is None:
+            return ESCALATED
+        gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        reference = self._reference
+        if reference is not None and reference.shape == gray.shape:
+            if cv2.norm(gray, reference, cv2.NORM_L1) / gray.size < self.motion_threshold:
+                return STATIC
+        if presence_status(cv2.cvtColor(thumbnail, cv2.COLOR_BGR2HSV), self.margin) == "cube_absent":
+            self._reference = gray
+            return REJECTED
+        self._candidate = gray
+        return ESCALATED
+
+    def absent(self):
+        """
+        The full check found no cube on the frame escalated last.
+        """
+        if self._candidate is not None:
+            self._reference = self._candidate
+            self._candidate = None
+
+    def reset(self):
+        """
+        Forget the static reference, e.g. once a cube was found and the scene will change.
+        """
+        self._reference = None
+        self._candidate = None
+
+    def stats(self) -> dict:
+        return dict(self.counts)
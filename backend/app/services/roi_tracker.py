@@ -0,0 +1,83 @@
+from ..core.config import ROI_TRACKER_MIN_IOU, ROI_TRACKER_PADDING
+
+
+def bbox_iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    overlap_w = min(ax + aw, bx + bw) - max(ax, bx)
+    overlap_h = min(ay + ah, by + bh) - max(ay, by)
+    if overlap_w <= 0 or overlap_h <= 0:
+        return 0.0
+    overlap = overlap_w * overlap_h
+    return overlap / (aw * ah + bw * bh - overlap)
+
+
+class RoiTracker:
+    """
+    Frame-to-frame tracker for the cube bbox of one session.
+
+    The cube barely moves between consecutive frames, so the backend first searches a window around
+    the previous bbox padded by `padding` times its size on every side. The result is trusted when it
+    overlaps the previous bbox by at least `min_iou` and does not touch the window edge (which would
+    mean the cube extends past the window); otherwise the frame is searched in full.
+    """
+
+    def __init__(self, padding: float = ROI_TRACKER_PADDING, min_iou: float = ROI_TRACKER_MIN_IOU):
+        self.padding = padding
+        self.min_iou = min_iou
+        self.bbox = None
+        self.frame_shape = None
+        self.hits = 0
+        self.misses = 0
+        self.full_searches = 0
+
+    def reset(self):
+        self.bbox = None
+        self.frame_shape = None
+
+    def _window(self, frame_shape):
+        if self.bbox is None or self.padding <= 0 or frame_shape[:2] != self.frame_shape:
+            return None
+        x, y, w, h = self.bbox
+        pad_x, pad_y = int(w * self.padding), int(h * self.padding)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(frame_shape[1], x + w + pad_x), min(frame_shape[0], y + h + pad_y)
+        return x0, y0, x1 - x0, y1 - y0
+
+    @staticmethod
+    def _inside_window(found, window, frame_shape) -> bool:
+        # Edges of the window that are also frame edges do not count as cut-offs
+        x, y, w, h = found
+        wx, wy, ww, wh = window
+        return ((x > 0 or wx == 0) and (y > 0 or wy == 0)
+                and (x + w < ww or wx + ww == frame_shape[1]) and (y + h < wh or wy + wh == frame_shape[0]))
+
+    def locate(self, img, locate):
+        """
+        Cube bbox in img coordinates using locate(img) -> bbox or None, searching the tracked window first.
+        """
+        window = self._window(img.shape)
+        if window is not None:
+            wx, wy, ww, wh = window
+            found = locate(img[wy:wy+wh, wx:wx+ww])
+            if found is not None and self._inside_window(found, window, img.shape):
+                candidate = (found[0] + wx, found[1] + wy, found[2], found[3])
+                if bbox_iou(candidate, self.bbox) >= self.min_iou:
+                    self.hits += 1
+                    self.bbox = candidate
+                    return candidate
+            self.misses += 1
+
+        self.full_searches += 1
+        self.bbox = locate(img)
+        self.frame_shape = img.shape[:2]
+        return self.bbox
+
+    def stats(self) -> dict:
+        tracked = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "full_searches": self.full_searches,
+            "hit_rate": self.hits / tracked if tracked else 0.0,
+        }
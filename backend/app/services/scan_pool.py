@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+from .calibration_store import get_calibration_profiles
+from .cube_detector import CubeDetector
+from .cube_validator import validation_error
+from .solver import Solver
+from ..core.config import SCAN_POOL_CHUNK_SIZE, SCAN_POOL_WORKERS, SCAN_VIDEO_SEGMENT_FRAMES
+
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"})
+VIDEO_EXTENSIONS = frozenset({".mp4", ".m4v", ".mov", ".avi", ".mkv", ".webm"})
+SCAN_MODES = ("net", "face")
+
+# Owned by each pool worker process and created on first use: detectors by calibration profile id
+# (None for the default color ranges), and the solver
+_worker_detectors = {}
+_worker_solver = None
+
+
+def _init_worker(log_level):
+    logging.getLogger().setLevel(log_level)
+
+
+def _detector(profile_id) -> CubeDetector:
+    detector = _worker_detectors.get(profile_id)
+    if detector is None:
+        detector = CubeDetector()
+        if profile_id is not None:
+            profile = get_calibration_profiles().load(profile_id)
+            if profile is None:
+                raise ValueError(f"No calibration profile {profile_id}")
+            detector.apply_profile(profile)
+        _worker_detectors[profile_id] = detector
+    return detector
+
+
+def _solver() -> Solver:
+    global _worker_solver
+    if _worker_solver is None:
+        _worker_solver = Solver()
+    return _worker_solver
+
+
+def _read_frames(unit):
+    """
+    (frame index, BGR image or None when unreadable) for the frames of a work unit: the image of an
+    ("image", path) unit, with index None, or every step-th frame of a ("video", path, start, stop,
+    step) segment. Skipped video frames are grabbed but not decoded.
+    """
+    if unit[0] == "image":
+        yield None, cv2.imread(unit[1], cv2.IMREAD_COLOR)
+        return
+    _, path, start, stop, step = unit
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            yield start, None
+            return
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while stop is None or index < stop:
+            if not capture.grab():
+                break
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                yield index, frame if ok else None
+            index += 1
+    finally:
+        capture.release()
+
+
+def _scan_net(detector: CubeDetector, img, solve: bool, result: dict):
+    # The image holds a whole net, 2 faces high by 3 wide in URFDLB order, as read by extract_colors
+    state, confidence = detector.extract_colors(cv2.cvtColor(img, cv2.COLOR_BGR2HSV), return_confidence=True)
+    result["state"] = state
+    result["confidence"] = round(float(confidence.mean()), 3)
+    result["error"] = validation_error(state)
+    if solve and result["error"] is None:
+        moves = _solver().solve(state, raise_errors=True)
+        result["moves"] = moves
+        result["length"] = len(moves)
+
+
+def _scan_face(detector: CubeDetector, img, solve: bool, result: dict):
+    status, face, bbox, confidence = detector.detect_face(img, return_confidence=True)
+    result["status"] = status
+    result["face"] = face
+    result["bbox"] = [int(v) for v in bbox] if bbox is not None else None
+    result["confidence"] = round(float(confidence.mean()), 3)
+
+
+# Per mode: the function filling in a result, and its fields (None until filled in)
+_SCANNERS = {
+    "net": (_scan_net, ("state", "confidence", "moves", "length")),
+    "face": (_scan_face, ("status", "face", "bbox", "confidence")),
+}
+
+
+def _scan_chunk(units, mode: str, solve: bool, profile_id):
+    """
+    Scan every frame of a chunk of work units inside a pool worker.
+    Returns one result dict per frame with its own timing and error.
+    """
+    scan, fields = _SCANNERS[mode]
+    results = []
+    try:
+        detector, setup_error = _detector(profile_id), None
+    except Exception as e:
+        detector, setup_error = None, str(e)
+    for unit in units:
+        source = unit[1]
+        if detector is not None:
+            detector.roi_tracker.reset()  # Only frames of the same video segment are tracked
+        for frame, img in _read_frames(unit):
+            start = time.perf_counter()
+            result = {"id": source if frame is None else f"{source}#{frame}", "source": source, "frame": frame, "mode": mode}
+            result.update(dict.fromkeys(fields))
+            result["error"] = None
+            try:
+                if detector is None:
+                    raise ValueError(setup_error)
+                if img is None:
+                    raise ValueError("Cannot read image" if frame is None else "Cannot read video frame")
+                scan(detector, img, solve, result)
+            except Exception as e:
+                result["error"] = str(e)
+            result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+            results.append(result)
+    return results
+
+
+def _walk(directory: str):
+    # Files below a directory in a stable (sorted) order
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            yield os.path.join(root, name)
+
+
+def _video_units(path: str, every: int, segment_frames: int):
+    capture = cv2.VideoCapture(path)
+    count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) if capture.isOpened() else 0
+    capture.release()
+    if count <= 0 or segment_frames <= 0:  # Length unknown (or unreadable): one unit to the end
+        yield ("video", path, 0, None, every)
+        return
+    for start in range(0, count, segment_frames):
+        yield ("video", path, start, min(start + segment_frames, count), every)
+
+
+def iter_units(paths, every: int = 1, segment_frames: int = SCAN_VIDEO_SEGMENT_FRAMES):
+    """
+    Work units for image and video files; directories are walked recursively for files with an
+    image or video extension. Videos are split into segments of segment_frames frames, scanning
+    every every-th frame.
+    """
+    every = max(1, every)
+    for path in paths:
+        listed = os.path.isdir(path)
+        for file in _walk(path) if listed else (path,):
+            extension = os.path.splitext(file)[1].lower()
+            if extension in VIDEO_EXTENSIONS:
+                yield from _video_units(file, every, segment_frames)
+            elif extension in IMAGE_EXTENSIONS or not listed:
+                yield ("image", file)
+
+
+def _tasks(units, chunk_size: int):
+    # Images are sent chunk_size at a time, video segments one per task
+    chunk = []
+    for unit in units:
+        if unit[0] == "video":
+            yield [unit]
+            continue
+        chunk.append(unit)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def create_scan_pool(workers: int = SCAN_POOL_WORKERS, log_level=None) -> ProcessPoolExecutor:
+    # Spawned rather than forked, as the solver pool: the API process runs executor threads
+    log_level = log_level if log_level is not None else logging.getLogger().level
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(log_level,))
+
+
+_scan_pool = None
+
+
+def get_scan_pool() -> ProcessPoolExecutor:
+    global _scan_pool
+    if _scan_pool is None:
+        _scan_pool = create_scan_pool()
+    return _scan_pool
+
+
+def _check_options(mode: str, profile_id):
+    if mode not in _SCANNERS:
+        raise ValueError(f"Unknown scan mode {mode!r}, expected {' or '.join(SCAN_MODES)}")
+    if profile_id is not None and get_calibration_profiles().load(profile_id) is None:
+        raise ValueError(f"No calibration profile {profile_id}")
+
+
+def scan_many(units, pool: ProcessPoolExecutor, mode: str = "net", solve: bool = False, profile_id=None,
+              chunk_size: int = SCAN_POOL_CHUNK_SIZE, max_pending: int = None):
+    """
+    Scan work units (iter_units) on a process pool, yielding result dicts in completion order.
+    At most max_pending tasks are in flight, so arbitrarily large archives stream in bounded memory.
+    Raises ValueError for an unknown mode or calibration profile before anything is scanned.
+    """
+    _check_options(mode, profile_id)
+    max_pending = max_pending or pool._max_workers * 4
+    pending = set()
+    for task in _tasks(units, chunk_size):
+        pending.add(pool.submit(_scan_chunk, task, mode, solve, profile_id))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from future.result()
+
+
+async def scan_stream(units, mode: str = "net", solve: bool = False, profile_id=None, pool: ProcessPoolExecutor = None,
+                      chunk_size: int = SCAN_POOL_CHUNK_SIZE, max_pending: int = None):
+    """
+    Async counterpart of scan_many(). Listing directories and probing videos blocks, so the next
+    task is taken from units in a thread; finished tasks are yielded as soon as they complete.
+    """
+    await asyncio.to_thread(_check_options, mode, profile_id)
+    pool = pool or get_scan_pool()
+    loop = asyncio.get_running_loop()
+    max_pending = max_pending or pool._max_workers * 4
+    tasks = _tasks(units, chunk_size)
+    pending = set()
+    while True:
+        task = await asyncio.to_thread(next, tasks, None)
+        if task is None:
+            break
+        pending.add(loop.run_in_executor(pool, _scan_chunk, task, mode, solve, profile_id))
+        if len(pending) >= max_pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            done = [future for future in pending if future.done()]
+        for future in done:
+            pending.discard(future)
+            for result in future.result():
+                yield result
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            for result in future.result():
+                yield result
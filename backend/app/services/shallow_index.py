@@ -0,0 +1,170 @@
+import struct
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .cube_state import FACES, MOVE_NAMES, MOVE_TABLE, SOLVED, apply_moves, invert_moves, is_solved, to_array
+
+# File layout: 32 byte header, then `count` sorted uint64 state hashes, then `count` uint32 packed paths.
+INDEX_MAGIC = b'RBXSHIDX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<8sIII12x')
+MAX_DEPTH = 6  # 6 moves x 5 bits fit in a uint32 path
+
+_MOVE_BITS = 5
+_MOVE_MASK = (1 << _MOVE_BITS) - 1
+_OPPOSITE = {'U': 'D', 'R': 'L', 'F': 'B', 'D': 'U', 'L': 'R', 'B': 'F'}
+
+# Zobrist table: a state's hash is the XOR of one random word per (facelet, label) pair
+_ZOBRIST = np.random.default_rng(0x52554249).integers(0, 2**64 - 1, size=(54, 256), dtype=np.uint64, endpoint=True)
+_FACELETS = np.arange(54)
+
+
+def state_hashes(states: np.ndarray) -> np.ndarray:
+    """
+    64-bit Zobrist hashes of an (n, 54) uint8 array of states.
+    """
+    return np.bitwise_xor.reduce(_ZOBRIST[_FACELETS, states], axis=1)
+
+
+def _allowed_after():
+    # allowed[last, move]: skip turning the same face twice and fix the order of commuting opposite faces
+    allowed = np.ones((len(MOVE_NAMES) + 1, len(MOVE_NAMES)), bool)
+    for last, last_name in enumerate(MOVE_NAMES, start=1):
+        for move, name in enumerate(MOVE_NAMES):
+            same_face = name[0] == last_name[0]
+            reordered = _OPPOSITE[name[0]] == last_name[0] and FACES.index(name[0]) < FACES.index(last_name[0])
+            allowed[last, move] = not (same_face or reordered)
+    return allowed
+
+
+def build_index(depth: int, block_size: int = 20000):
+    """
+    Breadth-first enumeration of every state within `depth` face turns of solved.
+    Returns (keys, paths) sorted by key, where paths packs the turns leading from solved to the state.
+    """
+    if not 0 <= depth <= MAX_DEPTH:
+        raise ValueError(f"Index depth must be between 0 and {MAX_DEPTH}")
+    allowed = _allowed_after()
+    solved = to_array(SOLVED)[None, :]
+    keys = [state_hashes(solved)]
+    paths = [np.zeros(1, np.uint32)]
+    seen = np.sort(keys[0])
+    frontier, frontier_paths, frontier_last = solved, paths[0], np.zeros(1, np.intp)
+
+    for level in range(depth):
+        layer_keys, layer_paths, layer_states, layer_last = [], [], [], []
+        keep_states = level + 1 < depth
+        for start in range(0, len(frontier), block_size):
+            parents = frontier[start:start + block_size]
+            parent_last = frontier_last[start:start + block_size]
+            parent_idx, move_idx = np.nonzero(allowed[parent_last])
+            children = parents[parent_idx[:, None], MOVE_TABLE[move_idx]]
+            child_keys = state_hashes(children)
+            child_paths = frontier_paths[start:start + block_size][parent_idx] | ((move_idx + 1).astype(np.uint32) << np.uint32(_MOVE_BITS * level))
+            # Drop states already reached at a shallower depth
+            position = np.searchsorted(seen, child_keys).clip(max=len(seen) - 1)
+            new = seen[position] != child_keys
+            layer_keys.append(child_keys[new])
+            layer_paths.append(child_paths[new])
+            layer_last.append(move_idx[new] + 1)
+            if keep_states:
+                layer_states.append(children[new])
+        layer_keys = np.concatenate(layer_keys)
+        # The same state reached through different paths of equal length keeps its first path
+        layer_keys, first = np.unique(layer_keys, return_index=True)
+        layer_paths = np.concatenate(layer_paths)[first]
+        keys.append(layer_keys)
+        paths.append(layer_paths)
+        seen = np.union1d(seen, layer_keys)
+        if keep_states:
+            frontier = np.concatenate(layer_states)[first]
+            frontier_paths = layer_paths
+            frontier_last = np.concatenate(layer_last)[first]
+
+    keys = np.concatenate(keys)
+    paths = np.concatenate(paths)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], paths[order]
+
+
+def write_index(path: str, depth: int, keys: np.ndarray, paths: np.ndarray):
+    with open(path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, depth, len(keys)))
+        f.write(keys.astype('<u8').tobytes())
+        f.write(paths.astype('<u4').tobytes())
+
+
+def decode_path(packed: int) -> list:
+    moves = []
+    while packed:
+        moves.append(MOVE_NAMES[(packed & _MOVE_MASK) - 1])
+        packed >>= _MOVE_BITS
+    return moves
+
+
+class ShallowIndex:
+    """
+    Memory-mapped table of optimal solutions for every state within `depth` turns of solved.
+
+    Keys are sorted Zobrist hashes, so a lookup is one binary search over the mapped file; the
+    pages are shared by every worker process that opens the same file. A hit is verified by
+    applying the solution, which also rules out hash collisions.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            magic, version, depth, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} is not a shallow solution index")
+        self.path = path
+        self.depth = depth
+        self.keys = np.memmap(path, dtype='<u8', mode='r', offset=INDEX_HEADER.size, shape=(count,))
+        self.paths = np.memmap(path, dtype='<u4', mode='r', offset=INDEX_HEADER.size + 8 * count, shape=(count,))
+        self.hits = 0
+        self.misses = 0
+        # Solver threads share the index; the counters are the only mutable state
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, state: str) -> Optional[list]:
+        """
+        Optimal solution for a canonical state (URFDLB labels, centers in place), or None.
+        """
+        key = state_hashes(to_array(state)[None, :])[0]
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            solution = invert_moves(decode_path(int(self.paths[position])))
+            if is_solved(apply_moves(state, solution)):
+                with self._lock:
+                    self.hits += 1
+                return solution
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"depth": self.depth, "states": len(self), "hits": hits, "misses": misses}
+
+
+_shallow_index = None
+_shallow_index_lock = threading.Lock()
+
+
+def get_shallow_index() -> Optional[ShallowIndex]:
+    """
+    Index configured through SOLVER_SHALLOW_INDEX_PATH, opened once per process; None when unset.
+    """
+    global _shallow_index
+    from ..core.config import SOLVER_SHALLOW_INDEX_PATH
+    if not SOLVER_SHALLOW_INDEX_PATH:
+        return None
+    with _shallow_index_lock:
+        if _shallow_index is None:
+            _shallow_index = ShallowIndex(SOLVER_SHALLOW_INDEX_PATH)
+        return _shallow_index
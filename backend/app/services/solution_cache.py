@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from ..core.config import SOLVER_CACHE_PATH, SOLVER_CACHE_SIZE
+
+
+class SolutionCache:
+    """
+    LRU cache of solutions keyed by canonical cube state, optionally backed by an SQLite file.
+
+    The in-memory LRU answers repeats within a worker; the SQLite store survives restarts and is
+    shared by every worker pointed at the same file. Thread-safe, since solves run on the frame executor.
+    """
+
+    def __init__(self, maxsize: int = SOLVER_CACHE_SIZE, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions (state TEXT PRIMARY KEY, moves TEXT NOT NULL)")
+            self._db.commit()
+
+    def get(self, state: str) -> Optional[list]:
+        with self._lock:
+            moves = self._entries.get(state)
+            if moves is not None:
+                self._entries.move_to_end(state)
+                self.hits += 1
+                return list(moves)
+            if self._db is not None:
+                row = self._db.execute("SELECT moves FROM solutions WHERE state = ?", (state,)).fetchone()
+                if row is not None:
+                    moves = tuple(row[0].split())
+                    self._remember(state, moves)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return list(moves)
+            self.misses += 1
+            return None
+
+    def put(self, state: str, moves: list):
+        moves = tuple(moves)
+        with self._lock:
+            self._remember(state, moves)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO solutions (state, moves) VALUES (?, ?)", (state, ' '.join(moves)))
+                self._db.commit()
+
+    def _remember(self, state: str, moves: tuple):
+        self._entries[state] = moves
+        self._entries.move_to_end(state)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_solution_cache() -> SolutionCache:
+    """
+    Worker-wide cache shared by every Solver that is not given its own.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SolutionCache(SOLVER_CACHE_SIZE, SOLVER_CACHE_PATH)
+        return _default_cache
@@ -1,14 +1,68 @@
+import logging
+import threading
+import time
+
 import kociemba
+from ..core.metrics import SOLVER_LOOKUPS, observe_stage
+from .cube_state import canonicalize, remap_moves
+from .cube_validator import validation_error
+from .shallow_index import ShallowIndex, get_shallow_index
+from .solution_cache import SolutionCache, get_solution_cache
+
+logger = logging.getLogger(__name__)
 
 class Solver:
-    def solve(self, state: str) -> list:
+    def __init__(self, cache: SolutionCache = None, shallow_index: ShallowIndex = None):
+        self.cache = cache if cache is not None else get_solution_cache()
+        self.shallow_index = shallow_index if shallow_index is not None else get_shallow_index()
+
+    def solve(self, state: str, raise_errors: bool = False) -> list:
         """
         Solve the Rubik's cube given the state string (54 characters).
-        Returns list of moves.
+        Any 6 distinct facelet labels are accepted; solutions are cached by canonical state so
+        recolored or rotated repeats of a cube are answered from the cache. States within the
+        depth of the shallow index (SOLVER_SHALLOW_INDEX_PATH) get an optimal solution from it
+        without running the two-phase search.
+        Returns list of moves, or an empty list on invalid states unless raise_errors is set.
         """
+        start = time.perf_counter()
+        source = "invalid"
         try:
-            algorithm = kociemba.solve(state)
-            return algorithm.split()
+            canonical, face_map = canonicalize(state)
+            source = "shallow_index"
+            moves = self.shallow_index.lookup(canonical) if self.shallow_index is not None else None
+            if moves is None:
+                source = "cache"
+                moves = self.cache.get(canonical)
+            if moves is None:
+                error = validation_error(canonical)
+                if error:
+                    raise ValueError(error)
+                source = "search"
+                moves = kociemba.solve(canonical).split()
+                self.cache.put(canonical, moves)
+            return remap_moves(moves, face_map)
         except Exception as e:
-            print(f"Solver error: {e}")
-            return []
\ No newline at end of file
+            source = "invalid"
+            if raise_errors:
+                raise
+            logger.error("Solver error: %s", e)
+            return []
+        finally:
+            observe_stage("solve", time.perf_counter() - start)
+            SOLVER_LOOKUPS.inc(source)
+
+
+_solver = None
+_solver_lock = threading.Lock()
+
+
+def get_solver() -> Solver:
+    """
+    Solver shared by the sessions of this worker; it only holds the shared cache and index.
+    """
+    global _solver
+    with _solver_lock:
+        if _solver is None:
+            _solver = Solver()
+        return _solver
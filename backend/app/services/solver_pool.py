@@ -0,0 +1,142 @@
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .solver import Solver
+from ..core.config import SOLVER_POOL_CHUNK_SIZE, SOLVER_POOL_WORKERS
+
+# Solver owned by each pool worker process, created by the pool initializer
+_worker_solver = None
+
+
+def _init_worker():
+    global _worker_solver
+    _worker_solver = Solver()
+
+
+def _solve_chunk(items):
+    """
+    Solve a chunk of (id, state) pairs inside a pool worker.
+    Returns one result dict per item with its own timing and error.
+    """
+    results = []
+    for item_id, state in items:
+        start = time.perf_counter()
+        try:
+            moves = _worker_solver.solve(state, raise_errors=True)
+            error = None
+        except Exception as e:
+            moves = None
+            error = str(e)
+        results.append({
+            "id": item_id,
+            "state": state,
+            "moves": moves,
+            "length": len(moves) if moves is not None else None,
+            "error": error,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        })
+    return results
+
+
+def create_solver_pool(workers: int = SOLVER_POOL_WORKERS) -> ProcessPoolExecutor:
+    # Spawned rather than forked: the API process runs executor threads that must not be forked mid-lock
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+
+
+_solver_pool = None
+
+
+def get_solver_pool() -> ProcessPoolExecutor:
+    global _solver_pool
+    if _solver_pool is None:
+        _solver_pool = create_solver_pool()
+    return _solver_pool
+
+
+def parse_batch_item(line, index: int):
+    """
+    Turn one input line into an (id, state) pair. Lines may be a JSON object with "state" and an
+    optional "id", a JSON string, or a bare 54-character state; ids default to the line index.
+    """
+    if isinstance(line, bytes):
+        line = line.decode('utf-8', errors='replace')
+    if isinstance(line, str):
+        line = line.strip()
+        try:
+            line = json.loads(line)
+        except ValueError:
+            return index, line
+    if isinstance(line, dict):
+        return line.get("id", index), str(line.get("state", ""))
+    return index, str(line)
+
+
+def _chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def solve_many(items, pool: ProcessPoolExecutor, chunk_size: int = SOLVER_POOL_CHUNK_SIZE, max_pending: int = None):
+    """
+    Solve (id, state) pairs on a process pool, yielding result dicts in completion order.
+    At most max_pending chunks are in flight, so arbitrarily long inputs stream in bounded memory.
+    """
+    max_pending = max_pending or pool._max_workers * 4
+    pending = set()
+    for chunk in _chunks(items, chunk_size):
+        pending.add(pool.submit(_solve_chunk, chunk))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from future.result()
+
+
+async def solve_stream(items, pool: ProcessPoolExecutor = None, chunk_size: int = SOLVER_POOL_CHUNK_SIZE, max_pending: int = None):
+    """
+    Async counterpart of solve_many() for an async iterable of (id, state) pairs.
+    Finished chunks are yielded as soon as they complete, even while input is still arriving.
+    """
+    pool = pool or get_solver_pool()
+    loop = asyncio.get_running_loop()
+    max_pending = max_pending or pool._max_workers * 4
+    pending = set()
+    chunk = []
+
+    def submit(items):
+        pending.add(loop.run_in_executor(pool, _solve_chunk, items))
+
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) < chunk_size:
+            continue
+        submit(chunk)
+        chunk = []
+        if len(pending) >= max_pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            done = [future for future in pending if future.done()]
+        for future in done:
+            pending.discard(future)
+            for result in future.result():
+                yield result
+    if chunk:
+        submit(chunk)
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            for result in future.result():
+                yield result
@@ -0,0 +1,33 @@
+"""
+Build the shallow solution index: every state within N face turns of solved with an optimal solution.
+
+    python -m app.tools.build_shallow_index --depth 5 -o shallow_index.bin
+
+Point SOLVER_SHALLOW_INDEX_PATH at the output file to have the solver use it.
+"""
+import argparse
+import os
+import sys
+import time
+
+from ..services.shallow_index import MAX_DEPTH, build_index, write_index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--depth", type=int, default=5, help=f"maximum solution length indexed (at most {MAX_DEPTH})")
+    parser.add_argument("-o", "--output", default="shallow_index.bin", help="index file to write")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    keys, paths = build_index(args.depth)
+    write_index(args.output, args.depth, keys, paths)
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(args.output) / 2**20
+    print(f"{len(keys)} states up to depth {args.depth} in {elapsed:.1f}s, {size_mb:.1f} MB written to {args.output}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Replay session recordings against a running server with concurrent simulated clients.
+
+    python -m app.tools.loadgen recordings/*.rbxr -n 16 --speed 1 --duration 60
+
+Each client replays one recording (assigned round-robin) over its own /ws connection: in real
+time (--speed 1), faster or slower (--speed 2, 0.5), or as fast as possible (--speed 0), where the
+next frame is sent as soon as the previous one was answered. Frames are tagged with frame ids the
+server echoes back, which gives the end-to-end latency of every processed frame; frames that never
+get an answer were dropped by the server's latest-frame queue.
+"""
+import argparse
+import asyncio
+import json
+import struct
+import sys
+import time
+
+import numpy as np
+import websockets
+
+from ..api.recording import DIRECTION_IN, Recording
+
+_FRAME_ID = struct.Struct('<I')
+_FRAME_ID_OFFSET = 8  # frame_id in the binary frame header
+
+
+class ClientStats:
+    def __init__(self, index: int, recording: str):
+        self.index = index
+        self.recording = recording
+        self.frames_sent = 0
+        self.frames_answered = 0
+        self.messages_received = 0
+        self.latencies = []
+        self.rejected = False
+        self.error = None
+
+
+def _prepare(messages) -> list:
+    """
+    Recorded client messages as (offset, kind, payload) with kind "hello", "frame", "binary" or
+    "text"; a hello asking for frame ids is added or amended so latencies can be measured.
+    """
+    prepared = []
+    has_hello = False
+    for message in messages:
+        if message.binary:
+            prepared.append((message.offset, "binary", message.data))
+            continue
+        data = json.loads(message.data)
+        if data.get("type") == "hello":
+            has_hello = True
+            data["frame_ids"] = True
+            prepared.append((message.offset, "hello", json.dumps(data)))
+        elif data.get("type") == "frame":
+            prepared.append((message.offset, "frame", data))
+        else:
+            prepared.append((message.offset, "text", message.data))
+    if not has_hello:
+        prepared.insert(0, (0.0, "hello", json.dumps({"type": "hello", "frame_ids": True})))
+    return prepared
+
+
+async def run_client(url: str, stats: ClientStats, messages: list, speed: float, duration: float, timeout: float):
+    pending = {}  # frame id -> (send time, answered event)
+    next_id = 0
+
+    async def receive(ws):
+        async for raw in ws:
+            stats.messages_received += 1
+            message = json.loads(raw)
+            if message.get("status") == "server_busy":
+                stats.rejected = True
+                return
+            frame_id = message.get("frame_id")
+            entry = pending.pop(frame_id, None)
+            if entry is not None:
+                stats.frames_answered += 1
+                stats.latencies.append(time.perf_counter() - entry[0])
+                entry[1].set()
+                # Frames are processed in order: older unanswered ones were dropped
+                for dropped in [pending_id for pending_id in pending if pending_id < frame_id]:
+                    del pending[dropped]
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            receiver = asyncio.create_task(receive(ws))
+            started = time.perf_counter()
+            loop_start = started
+            loops = 0
+            while not receiver.done():
+                for offset, kind, payload in messages:
+                    if receiver.done():
+                        break
+                    if kind == "hello" and loops:
+                        continue
+                    if speed > 0:
+                        delay = loop_start + offset / speed - time.perf_counter()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    if kind not in ("frame", "binary"):
+                        await ws.send(payload)
+                        continue
+                    frame_id, next_id = next_id, next_id + 1
+                    if kind == "binary":
+                        payload = bytearray(payload)
+                        _FRAME_ID.pack_into(payload, _FRAME_ID_OFFSET, frame_id)
+                    else:
+                        payload = json.dumps({**payload, "frame_id": frame_id})
+                    answered = asyncio.Event()
+                    pending[frame_id] = (time.perf_counter(), answered)
+                    stats.frames_sent += 1
+                    await ws.send(payload)
+                    if speed <= 0:
+                        try:
+                            await asyncio.wait_for(answered.wait(), timeout)
+                        except asyncio.TimeoutError:
+                            pending.pop(frame_id, None)
+                if not duration or time.perf_counter() - started >= duration:
+                    break
+                loop_start = time.perf_counter()
+                loops += 1
+            # Let the last frames in flight come back before hanging up
+            deadline = time.perf_counter() + timeout
+            while pending and not receiver.done() and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+            receiver.cancel()
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        if not stats.rejected:
+            stats.error = str(e) or type(e).__name__
+
+
+def percentiles(latencies) -> dict:
+    if not latencies:
+        return {}
+    latencies_ms = np.asarray(latencies) * 1000
+    summary = {f"p{pct}_ms": round(float(np.percentile(latencies_ms, pct)), 2) for pct in (50, 90, 95, 99)}
+    summary["max_ms"] = round(float(latencies_ms.max()), 2)
+    return summary
+
+
+def report(clients: list, elapsed: float) -> dict:
+    latencies = [latency for client in clients for latency in client.latencies]
+    sent = sum(client.frames_sent for client in clients)
+    answered = sum(client.frames_answered for client in clients)
+    return {
+        "clients": len(clients),
+        "rejected_clients": sum(client.rejected for client in clients),
+        "failed_clients": sum(client.error is not None for client in clients),
+        "elapsed_s": round(elapsed, 2),
+        "frames_sent": sent,
+        "frames_answered": answered,
+        "frames_dropped": sent - answered,
+        "throughput_fps": round(answered / elapsed, 1) if elapsed else 0.0,
+        "latency": percentiles(latencies),
+        "per_client": [{"client": client.index, "recording": client.recording, "frames_sent": client.frames_sent,
+                        "frames_answered": client.frames_answered, "rejected": client.rejected, "error": client.error,
+                        "latency": percentiles(client.latencies)} for client in clients],
+    }
+
+
+async def run(recordings: list, url: str, clients: int, speed: float, duration: float, ramp: float, timeout: float) -> dict:
+    prepared = [_prepare(recording.messages(DIRECTION_IN)) for recording in recordings]
+    stats = [ClientStats(idx, recordings[idx % len(recordings)].path) for idx in range(clients)]
+
+    async def start(client: ClientStats):
+        await asyncio.sleep(ramp * client.index / max(1, clients))
+        await run_client(url, client, prepared[client.index % len(prepared)], speed, duration, timeout)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(start(client) for client in stats))
+    return report(stats, time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recordings", nargs="+", help="session recordings (.rbxr)")
+    parser.add_argument("-n", "--clients", type=int, default=1, help="concurrent simulated clients")
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 0 for as fast as the server answers")
+    parser.add_argument("--duration", type=float, default=0, help="loop recordings for this many seconds (0: play once)")
+    parser.add_argument("--ramp", type=float, default=0, help="spread client connections over this many seconds")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds to wait for a frame's answer")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    recordings = [Recording(path) for path in args.recordings]
+    result = asyncio.run(run(recordings, args.url, args.clients, args.speed, args.duration, args.ramp, args.timeout))
+    latency = result["latency"]
+    print(f"{result['clients']} clients ({result['rejected_clients']} rejected, {result['failed_clients']} failed) "
+          f"in {result['elapsed_s']:.1f}s: {result['frames_answered']}/{result['frames_sent']} frames answered, "
+          f"{result['throughput_fps']:.1f} frames/s", file=sys.stderr)
+    if latency:
+        print("latency " + "  ".join(f"{key[:-3]} {value:.1f} ms" for key, value in latency.items()), file=sys.stderr)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0 if result["failed_clients"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Solve a file of cube states on all cores and write NDJSON results in completion order.
+
+    python -m app.tools.solve_batch states.txt -o solutions.ndjson
+
+Input lines may be bare 54-character states, JSON strings or NDJSON objects with "state" and "id".
+"""
+import argparse
+import json
+import sys
+import time
+
+from ..core.config import SOLVER_POOL_CHUNK_SIZE, SOLVER_POOL_WORKERS
+from ..services.solver_pool import create_solver_pool, parse_batch_item, solve_many
+
+
+def _read_items(stream):
+    index = 0
+    for line in stream:
+        if line.strip():
+            yield parse_batch_item(line, index)
+            index += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", nargs="?", default="-", help="file with one state per line, '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file, '-' for stdout")
+    parser.add_argument("-w", "--workers", type=int, default=SOLVER_POOL_WORKERS, help="solver processes")
+    parser.add_argument("--chunk-size", type=int, default=SOLVER_POOL_CHUNK_SIZE, help="states per worker task")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    solved = failed = 0
+    start = time.perf_counter()
+    with create_solver_pool(args.workers) as pool:
+        for result in solve_many(_read_items(source), pool, chunk_size=args.chunk_size):
+            sink.write(json.dumps(result) + "\n")
+            if result["error"]:
+                failed += 1
+            else:
+                solved += 1
+    elapsed = time.perf_counter() - start
+    total = solved + failed
+    print(f"{total} states ({solved} solved, {failed} failed) in {elapsed:.2f}s, {total / elapsed if elapsed else 0:.1f} states/s",
+          file=sys.stderr)
+    if sink is not sys.stdout:
+        sink.close()
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
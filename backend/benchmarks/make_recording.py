@@ -0,0 +1,46 @@
+"""
+Write a synthetic session recording for app.tools.loadgen, for when no browser recording is at hand.
+
+    python -m benchmarks.make_recording -o scan.rbxr --cubes 2 --fps 4
+
+The recording holds what the web client sends: a binary-frame hello, then JPEG frames of complete
+scans rendered by benchmarks.render (each face held for a few frames) at a fixed frame rate.
+"""
+import argparse
+import json
+import sys
+
+import cv2
+import numpy as np
+
+from app.api import frame_protocol
+from app.api.recording import DIRECTION_IN, RecordingWriter
+from .render import face_stream, random_state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", required=True, help="recording file to write")
+    parser.add_argument("--cubes", type=int, default=1, help="complete scans to record")
+    parser.add_argument("--frames-per-face", type=int, default=6)
+    parser.add_argument("--fps", type=float, default=4.0, help="frame rate of the simulated client")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    with RecordingWriter(args.output) as recording:
+        recording.write(DIRECTION_IN, json.dumps({"type": "hello", "binary": True, "encodings": ["jpeg"]}), 0.0)
+        frame_id = 0
+        for _ in range(args.cubes):
+            for _, _, frame in face_stream(rng, random_state(rng), args.frames_per_face):
+                jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes()
+                offset = (frame_id + 1) / args.fps
+                recording.write(DIRECTION_IN, frame_protocol.encode_frame(jpeg, frame_id, offset * 1000), offset)
+                frame_id += 1
+    print(f"{args.output}: {frame_id} frames, {frame_id / args.fps:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Deterministic synthetic renderer for cube faces and nets.
+
+Every image is produced from a numpy Generator, so the same seed always yields the same frames.
+Scenes vary lighting (gain and offset), sensor noise, cube scale and position, and perspective.
+"""
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from app.services.cube_state import FACES, MOVE_NAMES, SOLVED, apply_moves, face_slice
+
+# Sticker colors (BGR) inside the detector's default HSV ranges
+STICKER_BGR = {
+    'R': (30, 20, 190),
+    'O': (20, 110, 240),
+    'Y': (40, 220, 230),
+    'G': (60, 170, 20),
+    'B': (170, 60, 10),
+    'W': (250, 250, 250),
+}
+# Face letter -> sticker color for the scan orientation (yellow top, white bottom)
+FACE_COLORS = dict(zip(FACES, 'YRGWOB'))
+BODY_BGR = (15, 15, 15)
+
+
+@dataclass
+class Scene:
+    width: int = 640
+    height: int = 480
+    scale: float = 0.5         # cube side as a fraction of the frame height
+    center: tuple = (0.5, 0.5)  # cube center as fractions of width and height
+    gain: float = 1.0          # multiplicative lighting
+    offset: float = 0.0        # additive lighting
+    noise: float = 0.0         # gaussian noise sigma
+    skew: float = 0.0          # perspective jitter of the corners, as a fraction of the cube side
+
+
+def random_scene(rng: np.random.Generator, width: int = 640, height: int = 480) -> Scene:
+    scale = rng.uniform(0.3, 0.7)
+    margin = scale * height / 2 / width, scale / 2
+    return Scene(
+        width=width,
+        height=height,
+        scale=scale,
+        center=(rng.uniform(margin[0] + 0.05, 1 - margin[0] - 0.05), rng.uniform(margin[1] + 0.05, 1 - margin[1] - 0.05)),
+        gain=rng.uniform(0.9, 1.1),
+        offset=rng.uniform(-10, 10),
+        noise=rng.uniform(0, 6),
+        skew=rng.uniform(0, 0.06),
+    )
+
+
+def random_state(rng: np.random.Generator, moves: int = 25) -> str:
+    """
+    Facelet state after a random scramble, with face letters replaced by sticker colors.
+    """
+    scramble = [MOVE_NAMES[idx] for idx in rng.integers(0, len(MOVE_NAMES), moves)]
+    return ''.join(FACE_COLORS[face] for face in apply_moves(SOLVED, scramble))
+
+
+def _background(rng: np.random.Generator, scene: Scene) -> np.ndarray:
+    # Low-frequency, mostly neutral texture so contour search has something to reject
+    shape = (scene.height // 16 + 1, scene.width // 16 + 1)
+    gray = rng.integers(60, 140, shape + (1,)).astype(np.int16)
+    tint = rng.integers(-8, 9, shape + (3,))
+    small = np.clip(gray + tint, 0, 255).astype(np.uint8)
+    return cv2.resize(small, (scene.width, scene.height), interpolation=cv2.INTER_CUBIC)
+
+
+def _sticker_grid(colors: str, rows: int, cols: int, sticker: int = 40, gap: int = 1) -> np.ndarray:
+    grid = np.empty((rows * sticker, cols * sticker, 3), np.uint8)
+    grid[:] = BODY_BGR
+    for idx, color in enumerate(colors):
+        row, col = divmod(idx, cols)
+        y, x = row * sticker, col * sticker
+        grid[y + gap:y + sticker - gap, x + gap:x + sticker - gap] = STICKER_BGR[color]
+    return grid
+
+
+def _place(rng: np.random.Generator, texture: np.ndarray, scene: Scene, size) -> np.ndarray:
+    frame = _background(rng, scene)
+    width, height = size
+    cx, cy = scene.center[0] * scene.width, scene.center[1] * scene.height
+    src = np.float32([[0, 0], [texture.shape[1], 0], [texture.shape[1], texture.shape[0]], [0, texture.shape[0]]])
+    dst = np.float32([[cx - width / 2, cy - height / 2], [cx + width / 2, cy - height / 2],
+                      [cx + width / 2, cy + height / 2], [cx - width / 2, cy + height / 2]])
+    dst += rng.uniform(-scene.skew, scene.skew, dst.shape).astype(np.float32) * min(width, height)
+    matrix = cv2.getPerspectiveTransform(src, dst)
+    mask = cv2.warpPerspective(np.full(texture.shape[:2], 255, np.uint8), matrix, (scene.width, scene.height))
+    warped = cv2.warpPerspective(texture, matrix, (scene.width, scene.height))
+    frame[mask > 0] = warped[mask > 0]
+    return _expose(rng, frame, scene)
+
+
+def _expose(rng: np.random.Generator, frame: np.ndarray, scene: Scene) -> np.ndarray:
+    frame = frame.astype(np.float32) * scene.gain + scene.offset
+    if scene.noise:
+        frame += rng.normal(0, scene.noise, frame.shape).astype(np.float32)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def render_empty(rng: np.random.Generator, scene: Scene = None) -> np.ndarray:
+    """
+    BGR frame of the background alone, for presence detection.
+    """
+    scene = scene or random_scene(rng)
+    return _expose(rng, _background(rng, scene), scene)
+
+
+def render_face(rng: np.random.Generator, colors: str, scene: Scene = None) -> np.ndarray:
+    """
+    BGR frame of one face (9 sticker colors, row-major) in a random or given scene.
+    """
+    scene = scene or random_scene(rng)
+    side = scene.scale * scene.height
+    return _place(rng, _sticker_grid(colors, 3, 3), scene, (side, side))
+
+
+def render_net(rng: np.random.Generator, state: str, scene: Scene = None) -> np.ndarray:
+    """
+    BGR frame of all six faces laid out 2 faces high by 3 wide, as read by CubeDetector.extract_colors.
+    Faces appear in state order (U R F on the first row, D L B on the second).
+    """
+    scene = scene or random_scene(rng)
+    faces = [state[face_slice(face)] for face in FACES]
+    rows = [''.join(faces[row * 3 + col][r * 3:r * 3 + 3] for col in range(3)) for row in range(2) for r in range(3)]
+    side = scene.scale * scene.height / 2
+    return _place(rng, _sticker_grid(''.join(rows), 6, 9), scene, (side * 3, side * 2))
+
+
+def face_stream(rng: np.random.Generator, state: str, frames_per_face: int = 4):
+    """
+    Frames of a scan in /ws order (front, right, back, left, top, bottom), holding each face for
+    a few frames with small camera motion. Yields (face_name, colors, frame).
+    """
+    scan_faces = [('front', 'F'), ('right', 'R'), ('back', 'B'), ('left', 'L'), ('top', 'U'), ('bottom', 'D')]
+    for name, face in scan_faces:
+        scene = random_scene(rng)
+        for _ in range(frames_per_face):
+            scene.center = (scene.center[0] + rng.uniform(-0.01, 0.01), scene.center[1] + rng.uniform(-0.01, 0.01))
+            colors = state[face_slice(face)]
+            yield name, colors, render_face(rng, colors, scene)
@@ -0,0 +1,304 @@
+"""
+Benchmark the detection and solve paths on deterministic synthetic frames.
+
+    python -m benchmarks.run                      # run everything and print a table
+    python -m benchmarks.run --check              # fail if slower than benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline      # record the current machine's numbers
+    python -m benchmarks.run -k detect_face -n 500
+
+Run from the backend directory. Latency percentiles are per call; throughput is calls per second
+of a single thread. Baselines are machine specific, record them on the machine that runs --check.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app.api import frame_protocol
+from app.api.session import ScanSession
+from app.services.color_classifier import grid_rois
+from app.services.cube_detector import CubeDetector
+from app.services.preprocess import Preprocessor
+from app.services.presence_gate import ESCALATED, PresenceGate
+from app.services.solution_cache import SolutionCache
+from app.services.solver import Solver
+from .render import face_stream, random_scene, random_state, render_empty, render_face, render_net
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, iterations: int):
+    """
+    Register a benchmark. The function receives (rng, iterations) and returns (latencies_s, accuracy),
+    accuracy being None when the benchmark has no ground truth.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = (func, iterations)
+        return func
+    return decorator
+
+
+def measure(func, calls, warmup: int = 3):
+    """
+    Time func(*args) for every args tuple in calls; returns (latencies_s, results).
+    """
+    for args in calls[:warmup]:
+        func(*args)
+    latencies, results = [], []
+    for args in calls:
+        start = time.perf_counter()
+        results.append(func(*args))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def _face_frames(rng, n):
+    faces = [random_state(rng)[:9] for _ in range(n)]
+    return faces, [render_face(rng, face) for face in faces]
+
+
+@benchmark("isolate_cube", 200)
+def bench_isolate_cube(rng, n):
+    detector = CubeDetector()
+    detector.roi_tracker.padding = 0  # Full-frame search on every call
+    _, frames = _face_frames(rng, n)
+    latencies, _ = measure(detector.isolate_cube, [(frame,) for frame in frames])
+    return latencies, None
+
+
+@benchmark("isolate_cube_tracked", 200)
+def bench_isolate_cube_tracked(rng, n):
+    detector = CubeDetector()
+    frames = [frame for _, _, frame in face_stream(rng, random_state(rng), frames_per_face=max(1, n // 6))]
+    latencies, _ = measure(detector.isolate_cube, [(frame,) for frame in frames])
+    return latencies, None
+
+
+@benchmark("get_dominant_color", 2000)
+def bench_get_dominant_color(rng, n):
+    detector = CubeDetector()
+    faces, frames = _face_frames(rng, max(1, n // 9))
+    rois, expected = [], []
+    for face, frame in zip(faces, frames):
+        cube, _ = detector.isolate_cube(frame)
+        rois.extend(grid_rois(cv2.cvtColor(cube, cv2.COLOR_BGR2HSV), 3, 3, 30).reshape(9, 30, 30, 3))
+        expected.extend(face)
+    latencies, labels = measure(detector.get_dominant_color, [(roi,) for roi in rois])
+    return latencies, float(np.mean([label == color for label, color in zip(labels, expected)]))
+
+
+@benchmark("detect_face", 200)
+def bench_detect_face(rng, n):
+    detector = CubeDetector()
+    detector.roi_tracker.padding = 0
+    faces, frames = _face_frames(rng, n)
+    latencies, results = measure(detector.detect_face, [(frame,) for frame in frames])
+    return latencies, float(np.mean([colors == face for (_, colors, _), face in zip(results, faces)]))
+
+
+@benchmark("extract_colors", 200)
+def bench_extract_colors(rng, n):
+    detector = CubeDetector()
+    states = [random_state(rng) for _ in range(n)]
+    calls = []
+    for state in states:
+        scene = random_scene(rng, width=360, height=240)
+        scene.scale, scene.center, scene.skew = 1.0, (0.5, 0.5), 0.0  # Net fills the frame
+        calls.append((cv2.cvtColor(render_net(rng, state, scene), cv2.COLOR_BGR2HSV),))
+    latencies, results = measure(detector.extract_colors, calls)
+    return latencies, float(np.mean([result == state for result, state in zip(results, states)]))
+
+
+@benchmark("detect_presence", 500)
+def bench_detect_presence(rng, n):
+    detector = CubeDetector()
+    _, frames = _face_frames(rng, n // 2)
+    empty = [render_empty(rng) for _ in range(n - len(frames))]
+    expected = ["cube_present"] * len(frames) + ["cube_absent"] * len(empty)
+    latencies, results = measure(detector.detect_presence, [(frame,) for frame in frames + empty])
+    return latencies, float(np.mean([result == label for result, label in zip(results, expected)]))
+
+
+@benchmark("presence_gate", 500)
+def bench_presence_gate(rng, n):
+    """
+    Thumbnail stage of the presence check on binary JPEG frames, half of them showing a cube.
+    Accuracy is the fraction of cube frames escalated and empty frames rejected.
+    """
+    gate = PresenceGate(Preprocessor())
+    _, frames = _face_frames(rng, n // 2)
+    empty = [render_empty(rng) for _ in range(n - len(frames))]
+    calls = []
+    for idx, frame in enumerate(frames + empty):
+        jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+        calls.append(({"type": "frame"}, frame_protocol.parse_frame(frame_protocol.encode_frame(jpeg, idx, 0.0))))
+    latencies, results = measure(gate.check, calls)
+    expected = [True] * len(frames) + [False] * len(empty)
+    return latencies, float(np.mean([(result == ESCALATED) == label for result, label in zip(results, expected)]))
+
+
+@benchmark("solver_solve", 50)
+def bench_solver_solve(rng, n):
+    solver = Solver(cache=SolutionCache(maxsize=0))  # Every state is a cache miss
+    latencies, results = measure(solver.solve, [(random_state(rng),) for _ in range(n)], warmup=1)
+    return latencies, float(np.mean([bool(moves) for moves in results]))
+
+
+@benchmark("preprocess_1080p", 100)
+def bench_preprocess_1080p(rng, n):
+    """
+    Decode and preprocess of 1080p binary JPEG frames, every other one cropped to its cube bbox.
+    """
+    preprocessor = Preprocessor()
+    calls = []
+    for idx in range(n):
+        scene = random_scene(rng, width=1920, height=1080)
+        jpeg = cv2.imencode('.jpg', render_face(rng, random_state(rng)[:9], scene), [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+        side = int(scene.scale * scene.height * 1.2)
+        bbox = (max(0, int(scene.center[0] * scene.width - side / 2)), max(0, int(scene.center[1] * scene.height - side / 2)), side, side) if idx % 2 else None
+        data = {"type": "frame", "cubeBbox": list(bbox)} if bbox else {"type": "frame"}
+        calls.append((data, frame_protocol.parse_frame(frame_protocol.encode_frame(jpeg, idx, 0.0, bbox=bbox))))
+    latencies, _ = measure(preprocessor.process, calls)
+    return latencies, None
+
+
+class _RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, payload):
+        self.sent.append(payload)  # Parsed after timing
+
+    @property
+    def statuses(self) -> list:
+        return [json.loads(payload)["status"] for payload in self.sent]
+
+
+@benchmark("end_to_end_frame", 240)
+def bench_end_to_end_frame(rng, n):
+    """
+    Binary JPEG frames through ScanSession.process_frame: decode, preprocess, detection, consensus,
+    and validation plus solving on the last frame of each scan. Accuracy is the fraction of
+    scanned cubes that were solved.
+    """
+    frames_per_face = 4
+    cubes = max(1, n // (6 * frames_per_face))
+    payloads = []
+    for _ in range(cubes):
+        for _, _, frame in face_stream(rng, random_state(rng), frames_per_face):
+            payloads.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+
+    async def run():
+        socket = _RecordingSocket()
+        session = ScanSession(socket)
+        session.solver = Solver(cache=SolutionCache(maxsize=0))
+        session.solve_budget_ms = 0  # Single solve, as measured by the baseline; anytime solves wait out their budget
+        latencies = []
+        for frame_id, payload in enumerate(payloads):
+            if frame_id % (6 * frames_per_face) == 0:
+                session.tracker = None
+                session.cube_present = True
+                session.current_face = 0
+                session.faces_states = [None] * 6  # A new cube: faces left from an unfinished scan are not reused
+                session.faces_confidence = [None] * 6
+            start = time.perf_counter()
+            binary_frame = frame_protocol.parse_frame(frame_protocol.encode_frame(payload, frame_id, time.time()))
+            await session.process_frame(time.time(), {"type": "frame"}, binary_frame)
+            latencies.append(time.perf_counter() - start)
+        solved = sum(1 for status in socket.statuses if status == "tracking_started")
+        return latencies, solved / cubes
+
+    return asyncio.run(run())
+
+
+def summarize(latencies, accuracy) -> dict:
+    latencies_ms = np.asarray(latencies) * 1000
+    summary = {
+        "n": len(latencies),
+        "throughput_per_s": round(len(latencies) / float(np.sum(latencies)), 1),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+    }
+    for pct in (50, 90, 95, 99):
+        summary[f"p{pct}_ms"] = round(float(np.percentile(latencies_ms, pct)), 3)
+    if accuracy is not None:
+        summary["accuracy"] = round(accuracy, 3)
+    return summary
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Regressions of results against baseline: p50 or p95 slower than tolerance x baseline.
+    """
+    regressions = []
+    for name, summary in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if summary[key] > reference[key] * tolerance:
+                regressions.append(f"{name} {key}: {summary[key]:.3f} > {reference[key]:.3f} x {tolerance}")
+        if "accuracy" in reference and summary.get("accuracy", 1.0) < reference["accuracy"] - 0.05:
+            regressions.append(f"{name} accuracy: {summary['accuracy']:.3f} < {reference['accuracy']:.3f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", "--only", action="append", choices=sorted(BENCHMARKS), help="benchmark to run (repeatable)")
+    parser.add_argument("-n", "--iterations", type=int, help="override the per-benchmark iteration count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="exit 1 when a benchmark regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.3, help="allowed slowdown factor for --check")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)  # Detector warnings would drown the table
+    results = {}
+    for name in args.only or BENCHMARKS:
+        func, iterations = BENCHMARKS[name]
+        results[name] = summarize(*func(np.random.default_rng(args.seed), args.iterations or iterations))
+        summary = results[name]
+        accuracy = f"  acc {summary['accuracy']:.3f}" if "accuracy" in summary else ""
+        print(f"{name:24s} n={summary['n']:5d}  p50 {summary['p50_ms']:8.3f} ms  p95 {summary['p95_ms']:8.3f} ms  "
+              f"p99 {summary['p99_ms']:8.3f} ms  {summary['throughput_per_s']:9.1f}/s{accuracy}")
+
+    report = {
+        "meta": {"python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__,
+                 "machine": platform.machine(), "cpus": os.cpu_count(), "seed": args.seed},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        baseline = {"meta": report["meta"], "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline["results"] = json.load(f)["results"]
+        baseline["results"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    if args.check:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
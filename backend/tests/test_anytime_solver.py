@@ -0,0 +1,116 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.anytime_solver import PROCESS_EXIT_TIMEOUT, AnytimeSolve, solve_anytime
+from app.services.cube_state import SOLVED, apply_moves, canonicalize, is_solved
+from app.services.shallow_index import ShallowIndex, build_index, write_index
+from app.services.solution_cache import SolutionCache
+
+SCRAMBLED = apply_moves(SOLVED, "R U2 F' L D B2 R' U F2 D' L2 B")
+INVALID = SOLVED[:8] + 'R' + SOLVED[9:]
+
+
+async def collect(solve, cancel_after=None):
+    solutions = []
+    async for moves in solve:
+        solutions.append(moves)
+        if len(solutions) == cancel_after:
+            solve.cancel()
+    return solutions
+
+
+def test_solutions_get_shorter_until_the_budget_runs_out():
+    solve = AnytimeSolve(SCRAMBLED, budget=0.5, target_length=1, cache=SolutionCache())
+    solutions = asyncio.run(collect(solve))
+    assert solutions and all(is_solved(apply_moves(SCRAMBLED, moves)) for moves in solutions)
+    lengths = [len(moves) for moves in solutions]
+    assert lengths == sorted(set(lengths), reverse=True)
+    assert solve.outcome == "budget"
+    assert solve.best == solutions[-1]
+
+
+def test_search_stops_at_the_target_length():
+    cache = SolutionCache()
+    solve = AnytimeSolve(SCRAMBLED, budget=30, target_length=24, cache=cache)
+    solutions = asyncio.run(collect(solve))
+    assert len(solutions) == 1 and solve.outcome == "target"
+    assert cache.get(canonicalize(SCRAMBLED)[0]) is not None
+
+
+def test_cached_solution_within_target_skips_the_search():
+    cache = SolutionCache()
+    asyncio.run(collect(AnytimeSolve(SCRAMBLED, budget=30, target_length=24, cache=cache)))
+    solve = AnytimeSolve(SCRAMBLED, budget=30, target_length=24, cache=cache)
+    assert len(asyncio.run(collect(solve))) == 1
+    assert (solve.outcome, solve._process) == ("target", None)
+
+
+def test_shallow_states_are_answered_by_the_index(tmp_path):
+    path = str(tmp_path / "shallow.idx")
+    write_index(path, 2, *build_index(2))
+    solve = AnytimeSolve(apply_moves(SOLVED, "R U"), cache=SolutionCache(), shallow_index=ShallowIndex(path))
+    assert asyncio.run(collect(solve)) == [["U'", "R'"]]
+    assert solve.outcome == "exhausted"
+
+
+def test_cancel_stops_the_search():
+    solve = AnytimeSolve(SCRAMBLED, budget=30, target_length=1, cache=SolutionCache())
+    solutions = asyncio.run(collect(solve, cancel_after=1))
+    assert len(solutions) == 1
+    assert solve.cancelled
+    deadline = time.perf_counter() + PROCESS_EXIT_TIMEOUT
+    while solve._process.is_alive() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert solve._process.exitcode is not None
+
+
+class SlowExit:
+    # A killed process that has not exited yet
+    exitcode = None
+
+    def __init__(self):
+        self.joins = []
+
+    def join(self, timeout=None):
+        self.joins.append(timeout)
+
+
+def test_process_is_reaped_off_the_event_loop():
+    solve = AnytimeSolve(SCRAMBLED, cache=SolutionCache())
+    solve._process = SlowExit()
+
+    async def reap():
+        solve._reap_process()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(reap())
+    # Only a non-blocking join on the loop; the waiting one runs in a thread
+    assert solve._process.joins == [0, PROCESS_EXIT_TIMEOUT]
+
+
+def test_invalid_state():
+    solve = AnytimeSolve(INVALID, cache=SolutionCache())
+    with pytest.raises(ValueError):
+        asyncio.run(collect(solve))
+    assert solve.outcome == "invalid"
+    assert asyncio.run(solve_anytime("X" * 54)) is None
+
+
+def test_solve_anytime_returns_the_best_solution():
+    moves = asyncio.run(solve_anytime(apply_moves(SOLVED, "R U F' L2 D B'"), budget=0.2, target_length=20))
+    assert is_solved(apply_moves(apply_moves(SOLVED, "R U F' L2 D B'"), moves))
+
+
+def test_solve_endpoint_streams_solutions():
+    response = TestClient(app).post("/solve", params={"budget_ms": 200, "target_length": 24}, content=SCRAMBLED)
+    *solutions, done = [json.loads(line) for line in response.text.splitlines()]
+    assert solutions[-1]["moves"] == done["moves"]
+    assert (done["done"], done["outcome"], done["error"]) == (True, "target", None)
+    invalid = [json.loads(line) for line in TestClient(app).post("/solve", content=INVALID).text.splitlines()]
+    assert (invalid[-1]["outcome"], invalid[-1]["moves"]) == ("invalid", None)
+    assert invalid[-1]["error"]
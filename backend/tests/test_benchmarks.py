@@ -0,0 +1,78 @@
+import json
+from collections import Counter
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.cube_detector import CubeDetector
+from benchmarks import run
+from benchmarks.render import (
+    Scene, face_stream, random_scene, random_state, render_empty, render_face, render_net,
+)
+
+FACE = 'RGBOYWRGB'
+
+
+def test_renderer_is_deterministic():
+    first, second = np.random.default_rng(3), np.random.default_rng(3)
+    assert random_state(first) == random_state(second)
+    assert np.array_equal(render_face(first, FACE), render_face(second, FACE))
+    assert np.array_equal(render_empty(first), render_empty(second))
+
+
+def test_random_state_has_nine_stickers_of_each_color():
+    assert Counter(random_state(np.random.default_rng(0))) == Counter('RGBOYW' * 9)
+
+
+def test_rendered_face_is_detected():
+    detector = CubeDetector()
+    status, colors, _ = detector.detect_face(render_face(np.random.default_rng(0), FACE, Scene()))
+    assert (status, colors) == ("face_detected", FACE)
+
+
+def test_rendered_net_is_read():
+    rng = np.random.default_rng(0)
+    state = random_state(rng)
+    scene = Scene(width=360, height=240, scale=1.0)
+    assert CubeDetector().extract_colors(cv2.cvtColor(render_net(rng, state, scene), cv2.COLOR_BGR2HSV)) == state
+
+
+def test_random_scene_keeps_the_cube_in_frame():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        scene = random_scene(rng)
+        half_width = scene.scale * scene.height / 2 / scene.width
+        assert half_width < scene.center[0] < 1 - half_width
+        assert scene.scale / 2 < scene.center[1] < 1 - scene.scale / 2
+
+
+def test_face_stream_holds_each_face():
+    state = random_state(np.random.default_rng(0))
+    names = [name for name, _, _ in face_stream(np.random.default_rng(1), state, frames_per_face=2)]
+    assert names == [name for name in ('front', 'right', 'back', 'left', 'top', 'bottom') for _ in range(2)]
+
+
+def test_summarize():
+    summary = run.summarize([0.001] * 99 + [0.101], 0.5)
+    assert summary["n"] == 100
+    assert summary["p50_ms"] == pytest.approx(1.0)
+    assert summary["p99_ms"] > 1.0
+    assert summary["accuracy"] == 0.5
+    assert "accuracy" not in run.summarize([0.001], None)
+
+
+def test_compare_reports_regressions():
+    baseline = {"a": {"p50_ms": 1.0, "p95_ms": 2.0, "accuracy": 0.9}, "b": {"p50_ms": 1.0, "p95_ms": 1.0}}
+    results = {"a": {"p50_ms": 1.2, "p95_ms": 2.8, "accuracy": 0.8}, "b": {"p50_ms": 1.0, "p95_ms": 1.0},
+               "new": {"p50_ms": 9.0, "p95_ms": 9.0}}
+    assert run.compare(results, baseline, 1.3) == ["a p95_ms: 2.800 > 2.000 x 1.3", "a accuracy: 0.800 < 0.900"]
+
+
+def test_run_saves_and_checks_a_baseline(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    args = ["-k", "detect_face", "-n", "5", "--baseline", str(baseline)]
+    assert run.main(args + ["--save-baseline"]) == 0
+    assert set(json.loads(baseline.read_text())["results"]) == {"detect_face"}
+    assert run.main(args + ["--check", "--tolerance", "1000"]) == 0
+    assert "detect_face" in capsys.readouterr().out
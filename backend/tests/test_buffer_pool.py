@@ -0,0 +1,43 @@
+import numpy as np
+
+from app.services.buffer_pool import BufferPool
+
+
+def test_buffer_is_reused_for_the_same_shape():
+    pool = BufferPool()
+    first = pool.get("gray", (48, 64))
+    assert first.shape == (48, 64) and first.dtype == np.uint8
+    assert np.shares_memory(first, pool.get("gray", (48, 64)))
+
+
+def test_smaller_shape_reuses_the_allocation():
+    pool = BufferPool()
+    large = pool.get("gray", (48, 64))
+    small = pool.get("gray", (20, 30, 3))
+    assert small.shape == (20, 30, 3)
+    assert np.shares_memory(large, small)
+    assert pool.nbytes == 48 * 64
+
+
+def test_larger_shape_grows_the_buffer():
+    pool = BufferPool()
+    small = pool.get("gray", (10, 10))
+    large = pool.get("gray", (40, 40))
+    assert not np.shares_memory(small, large)
+    assert pool.nbytes == 40 * 40
+    assert np.shares_memory(large, pool.get("gray", (10, 10)))
+
+
+def test_dtype_change_reallocates():
+    pool = BufferPool()
+    pool.get("scratch", (8, 8))
+    floats = pool.get("scratch", (8, 8), np.float32)
+    assert floats.dtype == np.float32
+    assert pool.nbytes == 8 * 8 * 4
+
+
+def test_names_own_separate_buffers():
+    pool = BufferPool()
+    gray, hsv = pool.get("gray", (10, 10)), pool.get("hsv", (10, 10, 3))
+    assert not np.shares_memory(gray, hsv)
+    assert pool.nbytes == 100 + 300
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.session import active_sessions
+from app.main import app
+from app.services import calibration_store
+from app.services.calibration_store import (
+    CALIBRATION_STORES, CalibrationProfiles, FileCalibrationStore, MemoryCalibrationStore, validate_profile_id,
+)
+from app.services.cube_detector import DEFAULT_COLOR_RANGES, CubeDetector
+
+RANGES = DEFAULT_COLOR_RANGES
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    # The worker-wide profile cache, over a store that lives for one test
+    profiles = CalibrationProfiles(MemoryCalibrationStore())
+    monkeypatch.setattr(calibration_store, "_profiles", profiles)
+    return profiles
+
+
+@pytest.mark.parametrize("name", sorted(CALIBRATION_STORES))
+def test_store_round_trip(name, tmp_path):
+    path = str(tmp_path / ("profiles.db" if name == "sqlite" else "profiles"))
+    store = CALIBRATION_STORES[name](path)
+    record = {"color_ranges": {"W": [[0, 0, 200], [180, 50, 255]]}, "calibrated_colors": ["W"], "updated": 1.0}
+    assert store.get("cam") is None
+    store.put("cam", record)
+    store.put("b-cam", {**record, "updated": 2.0})
+    assert store.get("cam") == record
+    assert store.list() == ["b-cam", "cam"]
+    assert store.delete("cam") is True
+    assert store.delete("cam") is False
+    assert store.list() == ["b-cam"]
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "profiles.db")
+    CALIBRATION_STORES["sqlite"](path).put("cam", {"updated": 1.0})
+    assert CALIBRATION_STORES["sqlite"](path).get("cam") == {"updated": 1.0}
+
+
+@pytest.mark.parametrize("profile_id", ["cam", "usb:046d=0825", "a.b_c+d-e", "x" * 128])
+def test_valid_profile_ids(profile_id):
+    assert validate_profile_id(profile_id) == profile_id
+
+
+@pytest.mark.parametrize("profile_id", ["", "../escape", "a/b", "a\\b", "a b", "x" * 129, None, 7])
+def test_invalid_profile_ids(profile_id):
+    with pytest.raises(ValueError):
+        validate_profile_id(profile_id)
+
+
+def test_profile_ids_cannot_leave_the_file_store(tmp_path):
+    profiles = CalibrationProfiles(FileCalibrationStore(str(tmp_path / "profiles")))
+    with pytest.raises(ValueError):
+        profiles.save("../escape", RANGES, [])
+    with pytest.raises(ValueError):
+        profiles.load("../../etc/passwd")
+    assert os.listdir(tmp_path) == ["profiles"]
+    assert os.listdir(tmp_path / "profiles") == []
+
+
+def test_profiles_are_compiled_once():
+    profiles = CalibrationProfiles(MemoryCalibrationStore())
+    detector = CubeDetector()
+    saved = profiles.save("cam", detector.color_ranges, {"R"}, detector.classifier)
+    assert saved.classifier is detector.classifier
+    assert profiles.load("cam") is saved
+    assert profiles.stats() == {"store": "memory", "cached": 1, "hits": 1, "compiles": 0}
+
+
+def test_newer_record_is_recompiled():
+    store = MemoryCalibrationStore()
+    worker, other_worker = CalibrationProfiles(store), CalibrationProfiles(store)
+    first = worker.save("cam", RANGES, [])
+    other_worker.save("cam", RANGES, ["W"])
+    reloaded = worker.load("cam")
+    assert reloaded is not first
+    assert reloaded.calibrated_colors == ["W"]
+    assert worker.stats()["compiles"] == 2
+
+
+def test_deleted_profile_is_forgotten():
+    store = MemoryCalibrationStore()
+    worker, other_worker = CalibrationProfiles(store), CalibrationProfiles(store)
+    worker.save("cam", RANGES, [])
+    assert other_worker.delete("cam") is True
+    assert worker.load("cam") is None
+    assert worker.stats()["cached"] == 0
+
+
+def test_unknown_store_is_rejected(monkeypatch):
+    monkeypatch.setattr(calibration_store, "_profiles", None)
+    monkeypatch.setattr(calibration_store, "CALIBRATION_STORE", "redis")
+    with pytest.raises(ValueError, match="Unknown CALIBRATION_STORE"):
+        calibration_store.get_calibration_profiles()
+
+
+def test_session_loads_profile_from_hello(profiles):
+    profiles.save("cam", RANGES, {"W"})
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "calibration_profile": "cam"})
+        assert ws.receive_json()["calibration_profile"] == {"id": "cam", "loaded": True, "calibrated_colors": ["W"]}
+        [session] = active_sessions.values()
+        assert session.detector.calibrated_colors == {"W"}
+        ws.send_json({"type": "use_calibration_profile", "profile_id": "new-cam"})
+        reply = ws.receive_json()
+        assert (reply["status"], reply["calibration_profile"]["loaded"]) == ("calibration_profile", False)
+        # The calibration of "cam" must not carry over to, and later be saved as, "new-cam"
+        assert session.detector.calibrated_colors == frozenset()
+        ws.send_json({"type": "use_calibration_profile", "profile_id": "../cam"})
+        assert ws.receive_json()["status"] == "error"
+
+
+def test_calibration_profile_routes(profiles):
+    profiles.save("cam", RANGES, ["W"])
+    client = TestClient(app)
+    listing = client.get("/calibration/profiles").json()
+    assert (listing["profiles"], listing["store"]) == (["cam"], "memory")
+    profile = client.get("/calibration/profiles/cam").json()
+    assert (profile["id"], profile["calibrated_colors"]) == ("cam", ["W"])
+    assert client.get("/calibration/profiles/other").json()["message"] == "No calibration profile other"
+    assert client.get("/calibration/profiles/a b").json()["status"] == "error"
+    assert client.delete("/calibration/profiles/cam").json()["status"] == "success"
+    assert client.delete("/calibration/profiles/cam").json()["status"] == "error"
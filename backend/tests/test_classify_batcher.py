@@ -0,0 +1,85 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services import classify_batcher
+from app.services.classify_batcher import ClassifyBatcher, detect_face_batched
+from app.services.color_classifier import ColorClassifier, grid_rois
+from app.services.cube_detector import CubeDetector
+
+DETECTOR = CubeDetector()
+ROIS = grid_rois(np.random.default_rng(0).integers(0, 180, (24, 24, 3), dtype=np.uint8), 3, 3, 8)
+
+
+async def classify_faces(batcher, faces, expected=None):
+    # Every face is announced first, as sessions do before locating their cube
+    for _ in range(expected if expected is not None else faces):
+        batcher.expect()
+    return await asyncio.gather(*(batcher.classify(DETECTOR.classifier, ROIS) for _ in range(faces)))
+
+
+def test_faces_of_concurrent_sessions_share_a_batch():
+    batcher = ClassifyBatcher(wait=1.0)
+    results = asyncio.run(classify_faces(batcher, 3))
+    expected_labels, expected_confidence = DETECTOR.classifier.classify_labels(ROIS)
+    assert all(labels == expected_labels and np.array_equal(confidence, expected_confidence) for labels, confidence in results)
+    assert batcher.stats() == {"wait_ms": 1000.0, "max_batch": 64, "batches": 1, "faces": 3, "mean_batch_size": 3.0}
+
+
+def test_batches_are_capped():
+    batcher = ClassifyBatcher(wait=1.0, max_batch=2)
+    asyncio.run(classify_faces(batcher, 5))
+    assert (batcher.batches, batcher.faces) == (3, 5)
+
+
+def test_face_waits_at_most_the_batch_wait_for_others():
+    batcher = ClassifyBatcher(wait=0.05)
+
+    async def lone_face():
+        start = asyncio.get_running_loop().time()
+        await classify_faces(batcher, 1, expected=2)  # The other session never hands its face over
+        return asyncio.get_running_loop().time() - start
+
+    assert 0.04 <= asyncio.run(lone_face()) < 1.0
+    assert batcher.batches == 1
+
+
+def test_forgotten_face_releases_the_batch():
+    batcher = ClassifyBatcher(wait=10.0)
+
+    async def run():
+        batcher.expect()
+        batcher.expect()
+        face = asyncio.ensure_future(batcher.classify(DETECTOR.classifier, ROIS))
+        await asyncio.sleep(0)
+        batcher.forget()
+        return await asyncio.wait_for(face, 1.0)
+
+    assert asyncio.run(run())[0] == DETECTOR.classifier.classify_labels(ROIS)[0]
+
+
+def test_errors_reach_every_face_of_the_batch():
+    batcher = ClassifyBatcher(wait=1.0)
+
+    async def run():
+        batcher.expect()
+        batcher.expect()
+        broken = ColorClassifier.__new__(ColorClassifier)
+        return await asyncio.gather(batcher.classify(broken, ROIS), batcher.classify(DETECTOR.classifier, ROIS),
+                                    return_exceptions=True)
+
+    assert all(isinstance(result, Exception) for result in asyncio.run(run()))
+
+
+@pytest.mark.parametrize("wait", [0.0, 0.002])
+def test_detect_face_batched_matches_detect_face(monkeypatch, wait):
+    monkeypatch.setattr(classify_batcher, "_batcher", ClassifyBatcher(wait=wait))
+    img = np.full((480, 640, 3), 110, np.uint8)
+    img[120:360, 200:440] = (30, 20, 190)
+    detector = CubeDetector()
+    expected = detector.detect_face(img, 'R', True)
+    status, colors, bbox, confidence = asyncio.run(detect_face_batched(detector, img, 'R', True))
+    assert (status, colors, bbox) == expected[:3]
+    assert np.array_equal(confidence, expected[3])
+    assert classify_batcher.get_classify_batcher().batches == (1 if wait else 0)
@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.color_classifier import (
+    HUE_BINS, UNKNOWN, WHITE_MAX_SATURATION, WHITE_MIN_VALUE, ColorClassifier, classify_batch, grid_rois,
+)
+from app.services.cube_detector import DEFAULT_COLOR_RANGES
+
+
+RNG = np.random.default_rng(3)
+
+
+def reference_label(color_ranges, h, s, v):
+    # The per-sticker rule chain the tables are compiled from: white first, then ranges in dict order
+    if s < WHITE_MAX_SATURATION and v > WHITE_MIN_VALUE:
+        return 'W'
+    for color, (lower, upper) in color_ranges.items():
+        if lower[0] <= upper[0]:
+            hue_ok = lower[0] <= h <= upper[0]
+        else:
+            hue_ok = h >= lower[0] or h <= upper[0]
+        if hue_ok and s >= lower[1] and v >= lower[2]:
+            return color[0]
+    return UNKNOWN
+
+
+def random_hsv(shape):
+    return np.dstack([
+        RNG.integers(0, HUE_BINS, shape, dtype=np.uint8),
+        RNG.integers(0, 256, shape, dtype=np.uint8),
+        RNG.integers(0, 256, shape, dtype=np.uint8),
+    ])
+
+
+@pytest.mark.parametrize("color_ranges", [
+    DEFAULT_COLOR_RANGES,
+    {'R': ((170, 100, 80), (8, 255, 255)), 'Y': ((20, 60, 60), (40, 255, 255)), 'B': ((95, 40, 40), (125, 255, 255))},
+])
+def test_lookup_matches_rule_chain(color_ranges):
+    classifier = ColorClassifier(color_ranges)
+    hsv = random_hsv((1, 20000)).reshape(-1, 3).astype(np.intp)
+    # Plus every threshold the rules compare against, and its neighbours
+    edges = {WHITE_MAX_SATURATION, WHITE_MIN_VALUE}
+    for lower, upper in color_ranges.values():
+        edges.update(lower[1:])
+    hues = {0, HUE_BINS - 1}
+    for bounds in color_ranges.values():
+        hues.update(min(max(bound[0] + dh, 0), HUE_BINS - 1) for bound in bounds for dh in (-1, 0, 1))
+    grid = np.array([(h, s, v) for h in hues for s in edges for v in edges])
+    hsv = np.concatenate([hsv, grid, grid + [0, 1, 1], (grid - [0, 1, 1]).clip(0)])
+    labels = classifier.labels[classifier.lookup(hsv[:, 0], hsv[:, 1], hsv[:, 2])]
+    expected = [reference_label(color_ranges, h, s, v) for h, s, v in hsv]
+    assert labels.tolist() == expected
+
+
+def test_rule_tables_match_in_range():
+    classifier = ColorClassifier(DEFAULT_COLOR_RANGES)
+    hsv = random_hsv((64, 64))
+    masks = classifier.hue_lut[hsv[..., 0]] & classifier.sat_lut[hsv[..., 1]] & classifier.val_lut[hsv[..., 2]]
+    for rule, (lower, upper) in enumerate(DEFAULT_COLOR_RANGES.values(), start=1):
+        # The tables bound saturation and value from below only, as the detector always did
+        upper = (upper[0], 255, 255)
+        expected = cv2.inRange(hsv, np.array(lower, np.uint8), np.array(upper, np.uint8)) > 0
+        assert np.array_equal((masks >> rule) & 1 == 1, expected)
+
+
+def test_label_pixels_matches_lookup():
+    classifier = ColorClassifier(DEFAULT_COLOR_RANGES)
+    hsv = random_hsv((48, 80))
+    expected = classifier.lookup(hsv[..., 0], hsv[..., 1], hsv[..., 2])
+    assert np.array_equal(classifier.label_pixels(hsv), expected)
+
+
+def solid_face(colors, tile=8):
+    # A 3x3 face of uniform stickers with the given HSV colors, row-major
+    face = np.zeros((3 * tile, 3 * tile, 3), np.uint8)
+    for idx, color in enumerate(colors):
+        row, col = divmod(idx, 3)
+        face[row * tile:(row + 1) * tile, col * tile:(col + 1) * tile] = color
+    return face
+
+
+STICKERS = {'W': (0, 10, 240), 'R': (175, 200, 200), 'O': (18, 200, 200), 'Y': (30, 200, 200),
+            'G': (60, 200, 200), 'B': (110, 200, 200)}
+
+
+def test_classify_labels_solid_stickers():
+    classifier = ColorClassifier(DEFAULT_COLOR_RANGES)
+    expected = 'WROYGBRGU'
+    colors = [STICKERS.get(label, (140, 200, 100)) for label in expected]
+    labels, confidence = classifier.classify_labels(grid_rois(solid_face(colors), 3, 3, 8))
+    assert labels == expected
+    assert confidence.tolist() == [1.0] * 8 + [0.0]
+
+
+def test_classify_batch_matches_classify_labels():
+    default = ColorClassifier(DEFAULT_COLOR_RANGES)
+    calibrated = ColorClassifier({**DEFAULT_COLOR_RANGES, 'B': ((100, 50, 50), (140, 255, 255))})
+    requests = [(default, grid_rois(random_hsv((24, 24)), 3, 3, 8)) for _ in range(2)]
+    requests.insert(1, (calibrated, grid_rois(random_hsv((24, 24)), 3, 3, 8)))
+    for (labels, confidence), (classifier, rois) in zip(classify_batch(requests), requests):
+        expected_labels, expected_confidence = classifier.classify_labels(rois)
+        assert labels == expected_labels
+        assert np.array_equal(confidence, expected_confidence)
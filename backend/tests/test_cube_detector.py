@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.cube_detector import (
+    DEFAULT_COLOR_RANGES, CubeDetector, DetectorCore, get_detector_core, presence_status,
+)
+
+RED_PATCH = np.full((20, 20, 3), (30, 20, 190), np.uint8)
+
+
+def test_detectors_share_the_core():
+    first, second = CubeDetector(), CubeDetector()
+    assert first.core is second.core is get_detector_core()
+    assert first.classifier is first.core.classifier
+    assert first.buffers is not second.buffers
+    assert first.roi_tracker is not second.roi_tracker
+
+
+def test_default_ranges_are_read_only():
+    with pytest.raises(TypeError):
+        DEFAULT_COLOR_RANGES['W'] = ((0, 0, 0), (180, 255, 255))
+    with pytest.raises(TypeError):
+        get_detector_core().color_ranges['W'] = ((0, 0, 0), (180, 255, 255))
+
+
+def test_calibration_only_changes_its_own_detector():
+    core = DetectorCore()
+    calibrated, other = CubeDetector(core=core), CubeDetector(core=core)
+    assert calibrated.calibrate_color('R', RED_PATCH)
+    assert calibrated.calibrated_colors == {'R'}
+    assert calibrated.classifier is not core.classifier
+    assert calibrated.color_ranges['R'] != core.color_ranges['R']
+    assert other.calibrated_colors == frozenset()
+    assert other.classifier is core.classifier
+    assert other.color_ranges == dict(core.color_ranges)
+
+
+def test_reset_calibration_returns_to_the_core():
+    detector = CubeDetector(core=DetectorCore())
+    detector.calibrate_color('R', RED_PATCH)
+    detector.reset_calibration()
+    assert detector.calibrated_colors == frozenset()
+    assert detector.classifier is detector.core.classifier
+
+
+def test_calibration_matching_the_defaults_keeps_the_core_classifier():
+    detector = CubeDetector(core=DetectorCore())
+    detector._calibrate(dict(DEFAULT_COLOR_RANGES), {'W'})
+    assert detector.is_color_calibrated('W')
+    assert detector.calibration.color_ranges is None
+    assert detector.classifier is detector.core.classifier
+
+
+def test_isolate_cube_reuses_the_crop_buffer():
+    detector = CubeDetector(core=DetectorCore())
+    frame = np.full((240, 320, 3), 128, np.uint8)
+    cv2.rectangle(frame, (100, 60), (190, 150), (20, 20, 20), -1)
+    first, _ = detector.isolate_cube(frame)
+    second, bbox = detector.isolate_cube(frame)
+    assert np.shares_memory(first, second)
+    assert abs(bbox[0] - 100) <= 3 and abs(bbox[1] - 60) <= 3
+    assert detector.buffers.nbytes > 0
+
+
+def test_presence_status():
+    empty = cv2.cvtColor(np.full((60, 80, 3), 110, np.uint8), cv2.COLOR_BGR2HSV)
+    assert presence_status(empty) == "cube_absent"
+    colorful = np.full((60, 80, 3), 110, np.uint8)
+    colorful[:, :40] = (30, 20, 190)
+    colorful[:30, 40:] = (60, 170, 20)
+    hsv = cv2.cvtColor(colorful, cv2.COLOR_BGR2HSV)
+    assert presence_status(hsv) == "cube_present"
+    assert CubeDetector(core=DetectorCore()).detect_presence(colorful) == "cube_present"
+
+
+def test_presence_margin_loosens_the_check():
+    # 8% colored pixels: below the full check's ratio, above the loosened one
+    img = np.full((100, 100, 3), 110, np.uint8)
+    img[:8] = (30, 20, 190)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    assert presence_status(hsv) == "cube_absent"
+    assert presence_status(hsv, margin=0.5) == "cube_present"
@@ -0,0 +1,100 @@
+import kociemba
+import numpy as np
+import pytest
+
+from app.services.cube_state import (
+    FACES, MOVE_NAMES, MOVES, ROTATIONS, SOLVED, apply_batch, apply_moves, canonicalize, compose,
+    facelet_permutation, invert_moves, is_solved, parse_moves, remap_moves, to_array,
+)
+
+IDENTITY = np.arange(54)
+SCRAMBLE = "R U2 F' L D B2 R' U F2 D' L2 B"
+SCRAMBLED = apply_moves(SOLVED, SCRAMBLE)
+
+
+def rotate(state, rotation):
+    return ''.join(np.array(list(state))[rotation])
+
+
+@pytest.mark.parametrize("face", FACES)
+def test_quarter_turn_cycles_to_identity(face):
+    quarter = MOVES[face]
+    assert not np.array_equal(quarter, IDENTITY)
+    assert np.array_equal(compose(quarter, quarter, quarter, quarter), IDENTITY)
+    assert np.array_equal(compose(MOVES[face + '2'], MOVES[face + '2']), IDENTITY)
+    assert np.array_equal(compose(MOVES[face], MOVES[face + "'"]), IDENTITY)
+
+
+@pytest.mark.parametrize("axis", [(1, 0, 0), (0, 1, 0), (0, 0, 1)])
+def test_whole_cube_turn_cycles_to_identity(axis):
+    turn = facelet_permutation(axis)
+    assert not np.array_equal(compose(turn, turn), IDENTITY)
+    assert np.array_equal(compose(turn, turn, turn, turn), IDENTITY)
+
+
+def test_whole_cube_rotations():
+    assert len(ROTATIONS) == 24
+    assert len({rotation.tobytes() for rotation in ROTATIONS}) == 24
+    for rotation in ROTATIONS:
+        # Every orientation has order 1, 2, 3 or 4, so applying it 12 times is always the identity
+        assert np.array_equal(compose(*[rotation] * 12), IDENTITY)
+
+
+def test_sequence_and_inverse_return_to_solved():
+    assert not is_solved(SCRAMBLED)
+    assert apply_moves(SCRAMBLED, invert_moves(SCRAMBLE)) == SOLVED
+
+
+def test_commutator_has_order_six():
+    state = SOLVED
+    for turn in range(6):
+        state = apply_moves(state, "R U R' U'")
+        assert is_solved(state) == (turn == 5)
+
+
+def test_apply_batch_matches_apply_moves():
+    states = np.stack([to_array(SOLVED), to_array(SCRAMBLED)])
+    sequences = ["R", "U2 F'", SCRAMBLE]
+    batch = apply_batch(states, sequences)
+    assert batch.shape == (2, 3, 54)
+    for i, state in enumerate(states):
+        for j, sequence in enumerate(sequences):
+            assert np.array_equal(batch[i, j], apply_moves(state, sequence))
+
+
+def test_parse_moves_rejects_unknown_moves():
+    assert parse_moves("R U2 F'") == ["R", "U2", "F'"]
+    with pytest.raises(ValueError):
+        parse_moves("R X")
+
+
+def test_move_names_are_face_major():
+    assert MOVE_NAMES[:3] == ['U', 'U2', "U'"]
+    assert len(MOVE_NAMES) == 18
+
+
+def test_canonicalize_is_invariant_under_rotation_and_recoloring():
+    canonical, _ = canonicalize(SCRAMBLED)
+    for rotation in ROTATIONS:
+        assert canonicalize(rotate(SCRAMBLED, rotation))[0] == canonical
+    recolored = SCRAMBLED.translate(str.maketrans(FACES, 'WRGYOB'))
+    assert canonicalize(recolored)[0] == canonical
+
+
+def test_canonical_solved_state():
+    assert canonicalize(SOLVED.translate(str.maketrans(FACES, 'WRGYOB'))) == (SOLVED, {face: face for face in FACES})
+
+
+def test_remap_moves_solves_the_original_state():
+    recolored = rotate(SCRAMBLED, ROTATIONS[7]).translate(str.maketrans(FACES, 'WRGYOB'))
+    canonical, face_map = canonicalize(recolored)
+    # Any solution of the canonical state, remapped, solves the state it came from
+    solution = kociemba.solve(canonical).split()
+    assert is_solved(apply_moves(recolored, remap_moves(solution, face_map)))
+
+
+def test_canonicalize_rejects_bad_states():
+    with pytest.raises(ValueError):
+        canonicalize(SOLVED[:53])
+    with pytest.raises(ValueError):
+        canonicalize('U' * 54)
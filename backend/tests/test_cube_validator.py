@@ -0,0 +1,76 @@
+import kociemba
+import numpy as np
+import pytest
+
+from app.services.cube_state import FACES, SOLVED, apply_moves
+from app.services.cube_validator import is_valid_state, repair_state, validation_error
+
+SCRAMBLED = apply_moves(SOLVED, "R U2 F' L D B2 R' U F2 D' L2 B")
+
+
+def with_facelets(state, changes):
+    facelets = list(state)
+    for index, label in changes.items():
+        facelets[index] = label
+    return ''.join(facelets)
+
+
+def swap(state, *pairs):
+    # Exchange the facelets of each (a, b) pair of positions
+    return with_facelets(state, {index: state[other] for a, b in pairs for index, other in ((a, b), (b, a))})
+
+
+@pytest.mark.parametrize("state", [SOLVED, SCRAMBLED, SCRAMBLED.translate(str.maketrans(FACES, 'WRGYOB'))])
+def test_reachable_states_are_valid(state):
+    assert validation_error(state) is None
+    assert is_valid_state(state)
+
+
+@pytest.mark.parametrize("state, error", [
+    (SOLVED[:53], "54 facelets"),
+    ('U' * 54, "distinct center colors"),
+    (with_facelets(SOLVED, {0: 'R'}), "U appears 8 times"),
+    (swap(SOLVED, (8, 29)), "impossible color combination"),
+    (with_facelets(SOLVED, {8: SOLVED[20], 9: SOLVED[8], 20: SOLVED[9]}), "corner is twisted"),
+    (swap(SOLVED, (5, 10)), "edge is flipped"),
+    (swap(SOLVED, (5, 7), (10, 19)), "swapped"),
+    (swap(SCRAMBLED, (0, 2), (36, 45), (47, 11)), "swapped"),
+])
+def test_unreachable_states_are_rejected(state, error):
+    assert error in validation_error(state)
+    assert not is_valid_state(state)
+
+
+def test_errors_agree_with_the_solver():
+    # States the validator rejects are the ones the two-phase search rejects as well
+    assert kociemba.solve(SCRAMBLED)
+    for state in (swap(SOLVED, (5, 10)), swap(SOLVED, (5, 7), (10, 19))):
+        with pytest.raises(ValueError):
+            kociemba.solve(state)
+
+
+def test_repair_fixes_a_low_confidence_misread():
+    misread = with_facelets(SCRAMBLED, {12: 'D'})
+    confidence = np.full(54, 0.9, np.float32)
+    confidence[12] = 0.2
+    assert validation_error(misread) is not None
+    assert repair_state(misread, confidence) == (SCRAMBLED, [12])
+
+
+def test_repair_fixes_two_misreads():
+    # Two stickers exchanging their colors keep the counts balanced but break the cube
+    misread = swap(SCRAMBLED, (10, 19))
+    changed = [10, 19]
+    confidence = np.full(54, 0.9, np.float32)
+    confidence[changed] = 0.1
+    assert validation_error(misread) is not None
+    assert repair_state(misread, confidence) == (SCRAMBLED, changed)
+
+
+def test_repair_gives_up_beyond_max_changes():
+    misread = with_facelets(SOLVED, {0: 'R', 1: 'F'})
+    confidence = np.full(54, 0.9, np.float32)
+    confidence[[0, 1]] = 0.1
+    assert repair_state(misread, confidence, max_changes=1) is None
+    assert repair_state(misread, confidence, max_changes=2) == (SOLVED, [0, 1])
+    assert repair_state(with_facelets(SOLVED, {0: 'X'}), confidence) is None
@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import config
+from app.core.startup import HEAVY_MODULES
+from app.main import app
+from app.services.detector_backends import (
+    CUBE_CROP_SIZE, DETECTOR_BACKENDS, OpenCVBackend, crop_cube, get_detector_backend, register_backend,
+)
+
+
+def cube_frame(x=200, y=120, size=180):
+    img = np.full((480, 640, 3), 128, np.uint8)
+    cv2.rectangle(img, (x, y), (x + size, y + size), (20, 20, 20), -1)
+    return img
+
+
+def test_backends_are_registered_by_name():
+    assert DETECTOR_BACKENDS["opencv"] is OpenCVBackend
+    assert OpenCVBackend.name == "opencv"
+    assert "yolo" in DETECTOR_BACKENDS
+
+
+def test_register_backend():
+    @register_backend("test-backend")
+    class TestBackend:
+        def locate(self, img):
+            return 0, 0, img.shape[1], img.shape[0]
+
+    try:
+        assert isinstance(get_detector_backend("test-backend"), TestBackend)
+        assert get_detector_backend("test-backend") is get_detector_backend("test-backend")
+    finally:
+        del DETECTOR_BACKENDS["test-backend"]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown detector backend"):
+        get_detector_backend("nope")
+
+
+def test_default_backend_comes_from_config(monkeypatch):
+    monkeypatch.setattr(config, "DETECTOR_BACKEND", "opencv")
+    assert get_detector_backend() is get_detector_backend("opencv")
+
+
+def test_yolo_requires_a_model_path(monkeypatch):
+    monkeypatch.setattr(config, "YOLO_MODEL_PATH", "")
+    with pytest.raises(RuntimeError, match="YOLO_MODEL_PATH"):
+        DETECTOR_BACKENDS["yolo"]()
+
+
+def test_opencv_backend_finds_the_cube():
+    x, y, w, h = OpenCVBackend().locate(cube_frame())
+    assert abs(x - 200) <= 3 and abs(y - 120) <= 3
+    assert abs(w - 181) <= 6 and abs(h - 181) <= 6
+
+
+def test_opencv_backend_finds_nothing_on_a_blank_frame():
+    assert OpenCVBackend().locate(np.full((48, 64, 3), 128, np.uint8)) is None
+
+
+def test_crop_cube():
+    img = cube_frame()
+    crop = crop_cube(img, (200, 120, 181, 181))
+    assert crop.shape == (CUBE_CROP_SIZE, CUBE_CROP_SIZE, 3)
+    assert crop[5:-5, 5:-5].max() == 20
+
+
+def test_startup_report():
+    with TestClient(app) as client:
+        report = client.get("/startup").json()
+    assert {"import", "startup", "ready"} <= set(report["timings_ms"])
+    assert set(report["modules_loaded"]) == set(HEAVY_MODULES)
+    assert report["modules_loaded"]["cv2"] is True
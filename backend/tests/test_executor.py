@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.core.executor import LatestFrameQueue, run_in_frame_executor
+
+
+def test_full_queue_drops_the_oldest_frame():
+    queue = LatestFrameQueue(maxsize=2)
+    for frame in range(5):
+        queue.put(frame)
+    assert (queue.depth, queue.received, queue.dropped) == (2, 5, 3)
+
+    async def drain():
+        return [await queue.get(), await queue.get()]
+    assert asyncio.run(drain()) == [3, 4]
+
+
+def test_get_waits_for_the_next_frame():
+    async def scenario():
+        queue = LatestFrameQueue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put('frame')
+        return await asyncio.wait_for(getter, 1)
+    assert asyncio.run(scenario()) == 'frame'
+
+
+def test_maxsize_is_at_least_one():
+    queue = LatestFrameQueue(maxsize=0)
+    queue.put(1)
+    queue.put(2)
+    assert (queue.maxsize, queue.depth, queue.dropped) == (1, 1, 1)
+
+
+def test_run_in_frame_executor_passes_arguments():
+    async def scenario():
+        return await run_in_frame_executor(divmod, 7, 2)
+    assert asyncio.run(scenario()) == (3, 1)
+
+    async def failing():
+        return await run_in_frame_executor(int, 'x')
+    with pytest.raises(ValueError):
+        asyncio.run(failing())
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.services.face_consensus import FaceConsensus
+
+FACE = 'RRGYWBOOG'
+CONFIDENT = np.full(9, 0.9, np.float32)
+
+
+def test_steady_face_commits_on_third_frame():
+    consensus = FaceConsensus(window=5, threshold=0.6)
+    assert consensus.add(FACE, CONFIDENT) is None
+    assert consensus.add(FACE, CONFIDENT) is None
+    assert consensus.add(FACE, CONFIDENT) == FACE
+
+
+def test_single_misread_is_outvoted():
+    consensus = FaceConsensus(window=5, threshold=0.6)
+    misread = 'B' + FACE[1:]
+    results = [consensus.add(face, CONFIDENT) for face in (FACE, misread, FACE, FACE)]
+    assert results == [None, None, None, FACE]
+    face, agreement, support = consensus.vote()
+    assert face == FACE
+    assert agreement[0] == pytest.approx(0.6)
+    assert agreement[1:] == pytest.approx(0.8)
+    assert support[1] == pytest.approx(0.8 * 0.9)
+
+
+def test_disagreeing_frames_do_not_commit():
+    consensus = FaceConsensus(window=5, threshold=0.6)
+    faces = [FACE, 'O' + FACE[1:], 'Y' + FACE[1:], 'G' + FACE[1:], 'W' + FACE[1:]]
+    assert [consensus.add(face, CONFIDENT) for face in faces] == [None] * 5
+
+
+def test_misses_age_out_readings():
+    consensus = FaceConsensus(window=5, threshold=0.6)
+    consensus.add(FACE, CONFIDENT)
+    consensus.add(FACE, CONFIDENT)
+    for _ in range(3):
+        consensus.add_miss()
+    # Only one of the window's slots still holds the face
+    assert consensus.add(FACE, CONFIDENT) is None
+    assert consensus.vote()[1] == pytest.approx(np.full(9, 0.4))
+
+
+def test_ties_go_to_the_more_confident_label():
+    consensus = FaceConsensus(window=2, threshold=0.5)
+    low = np.full(9, 0.2, np.float32)
+    consensus.add('Y' * 9, low)
+    assert consensus.add('W' * 9, CONFIDENT) == 'W' * 9
+
+
+def test_reset_clears_the_window():
+    consensus = FaceConsensus(window=3, threshold=0.6)
+    consensus.add(FACE, CONFIDENT)
+    consensus.reset()
+    assert consensus.frames == 0
+    assert consensus.add(FACE, CONFIDENT) is None
+    assert consensus.add(FACE, CONFIDENT) == FACE
+
+
+@pytest.mark.parametrize("window, threshold", [(0, 0.6), (5, 0), (5, 1.5)])
+def test_rejects_bad_parameters(window, threshold):
+    with pytest.raises(ValueError):
+        FaceConsensus(window=window, threshold=threshold)
@@ -0,0 +1,114 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api import flow_control
+from app.api.flow_control import (
+    INITIAL_FPS, RESOLUTION_LADDER, AdmissionController, FlowController, cost_ratio,
+)
+from app.core.config import FLOW_MAX_FPS, FLOW_MIN_FPS
+from app.main import app
+
+REFERENCE_PIXELS = RESOLUTION_LADDER[0][0] * RESOLUTION_LADDER[0][1]
+
+
+def controller(frame_cost=None, parallelism=1, **kwargs):
+    admission = AdmissionController(utilization=1.0, **kwargs)
+    admission.parallelism = parallelism
+    if frame_cost is not None:
+        admission.observe(frame_cost, REFERENCE_PIXELS)
+    return admission
+
+
+def test_cost_ratio():
+    assert cost_ratio(REFERENCE_PIXELS) == pytest.approx(1.0)
+    assert cost_ratio(0) == pytest.approx(0.4)
+    assert cost_ratio(REFERENCE_PIXELS // 4) == pytest.approx(0.55)
+
+
+def test_capacity_follows_measured_frame_cost():
+    admission = controller()
+    assert admission.capacity() is None and admission.share(3) is None
+    admission.observe(0.1, REFERENCE_PIXELS)
+    assert admission.capacity() == pytest.approx(10)
+    admission.parallelism = 4
+    assert admission.share(2) == pytest.approx(20)
+    # Smaller frames are normalized to the reference size; the average moves slowly
+    admission.observe(0.055, REFERENCE_PIXELS // 4)
+    assert admission.cost == pytest.approx(0.1)
+    admission.observe(0.2, REFERENCE_PIXELS)
+    assert admission.cost == pytest.approx(0.11)
+
+
+def test_admission_limits():
+    assert controller().admit(100)
+    assert not controller(max_sessions=2).admit(2)
+    # 1 / 0.1 s = 10 frames per second; the smallest frames cost 0.55, so 18 sessions get 1 fps each
+    admission = controller(frame_cost=0.1)
+    assert admission.admit(17)
+    assert not admission.admit(18)
+    assert (admission.stats()["admitted"], admission.stats()["rejected"]) == (1, 1)
+
+
+def test_initial_target_before_any_frame():
+    target = FlowController(controller()).target(sessions=1, dropped=0)
+    assert target == {"status": "flow_control", "level": "normal", "fps": INITIAL_FPS, "max_width": 320,
+                      "max_height": 240, "jpeg_quality": 0.7, "roi": None}
+
+
+def test_frame_rate_is_capped():
+    assert FlowController(controller(frame_cost=0.001)).target(1, 0)["fps"] == FLOW_MAX_FPS
+
+
+def test_busy_worker_steps_down_the_ladder():
+    flow = FlowController(controller(frame_cost=0.1))
+    assert (flow.target(5, 0)["level"], flow.target(5, 0)["fps"]) == ("normal", 2.0)
+    degraded = flow.target(12, 0)
+    assert (degraded["level"], degraded["max_width"]) == ("degraded", 256)
+    overloaded = flow.target(40, 0)
+    assert (overloaded["level"], overloaded["max_width"], overloaded["fps"]) == ("overloaded", 160, FLOW_MIN_FPS)
+
+
+def test_dropped_frames_slow_the_client_down():
+    flow = FlowController(controller(frame_cost=0.1))
+    assert flow.update(2, 0)["fps"] == 5.0
+    assert flow.update(2, 3, force=True)["fps"] == 4.0
+
+
+def test_roi_is_the_padded_cube_bbox():
+    target = FlowController(controller(), roi_padding=0.25).target(1, 0, (100, 100, 200, 200), (480, 640))
+    assert target["roi"] == [0.08, 0.1, 0.47, 0.62]
+    assert FlowController(controller(), roi_padding=0.25).target(1, 0, (0, 0, 640, 480), (480, 640))["roi"] == [0, 0, 1, 1]
+
+
+def test_roi_is_composed_into_the_client_crop():
+    flow = FlowController(controller(), roi_padding=0.25)
+    crop = (0.25, 0.25, 0.5, 0.5)
+    assert flow.target(1, 0, (100, 100, 200, 200), (480, 640), crop)["roi"] == [0.29, 0.3, 0.23, 0.31]
+    # A cube touching the edge of the crop may extend past it: the crop widens to the whole frame
+    assert flow.target(1, 0, (0, 100, 200, 200), (480, 640), crop)["roi"] is None
+    assert flow.target(1, 0, (0, 100, 200, 200), (480, 640))["roi"] is not None
+
+
+def test_updates_are_rate_limited_and_only_sent_on_change():
+    flow = FlowController(controller())
+    assert flow.update(1, 0) is not None
+    assert flow.update(1, 0, (0, 0, 10, 10), (480, 640)) is None
+    assert flow.update(1, 0, force=True) is None
+    assert flow.update(1, 0, (0, 0, 10, 10), (480, 640), force=True)["roi"] is not None
+
+
+def test_hello_enables_flow_control():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "flow_control": True})
+        assert ws.receive_json()["status"] == "protocol"
+        assert ws.receive_json()["status"] == "flow_control"
+
+
+def test_busy_worker_refuses_new_sessions(monkeypatch):
+    monkeypatch.setattr(flow_control, "_admission", controller(frame_cost=10.0))
+    with TestClient(app).websocket_connect("/ws") as ws:
+        assert ws.receive_json()["status"] == "server_busy"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1013
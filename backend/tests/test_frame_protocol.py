@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import frame_protocol
+from app.api.frame_protocol import (
+    ENCODING_BGR, ENCODING_JPEG, ENCODING_YUV420, FRAME_HEADER_SIZE, decode_frame, encode_frame, negotiate, parse_frame,
+)
+from app.main import app
+
+IMAGE = np.random.default_rng(1).integers(0, 256, (12, 16, 3), dtype=np.uint8)
+
+
+def test_round_trip_keeps_header_fields():
+    frame = parse_frame(encode_frame(b'payload', frame_id=7, timestamp=1234.5, bbox=(1, 2, 30, 40)))
+    assert (frame.frame_id, frame.timestamp, frame.encoding, frame.bbox) == (7, 1234.5, ENCODING_JPEG, (1, 2, 30, 40))
+    assert frame.payload.tobytes() == b'payload'
+
+
+def test_client_crop_round_trip():
+    frame = parse_frame(encode_frame(b'', crop=(0.25, 0.1, 0.5, 1.2)))
+    assert (frame.bbox, frame.crop) == (None, (0.25, 0.1, 0.5, 1.0))
+    with pytest.raises(ValueError, match="either a bbox or a client crop"):
+        encode_frame(b'', bbox=(1, 2, 3, 4), crop=(0, 0, 1, 1))
+    both = bytearray(encode_frame(b'', bbox=(1, 2, 3, 4)))
+    both[6:8] = (frame_protocol.FLAG_HAS_BBOX | frame_protocol.FLAG_CLIENT_CROP).to_bytes(2, "little")
+    with pytest.raises(ValueError, match="either a bbox or a client crop"):
+        parse_frame(both)
+
+
+def test_payload_is_a_view_of_the_buffer():
+    buffer = bytearray(encode_frame(b'abc'))
+    frame = parse_frame(buffer)
+    buffer[FRAME_HEADER_SIZE] = ord('x')
+    assert frame.payload.tobytes() == b'xbc'
+    assert frame.bbox is None
+
+
+@pytest.mark.parametrize("buffer, error", [
+    (b'RBXF', "too short"),
+    (b'XXXX' + encode_frame(b'')[4:], "magic"),
+    (encode_frame(b'')[:4] + bytes([9]) + encode_frame(b'')[5:], "version"),
+    (encode_frame(b'', encoding=7), "encoding"),
+])
+def test_malformed_frames_are_rejected(buffer, error):
+    with pytest.raises(ValueError, match=error):
+        parse_frame(buffer)
+
+
+def test_negotiate():
+    assert negotiate(None) == ['jpeg']
+    assert negotiate(['yuv420', 'jpeg', 'webp']) == ['jpeg', 'yuv420']
+    assert negotiate(['webp']) == []
+
+
+def test_decode_raw_encodings():
+    height, width = IMAGE.shape[:2]
+    bgr = parse_frame(encode_frame(IMAGE.tobytes(), encoding=ENCODING_BGR, width=width, height=height))
+    assert np.array_equal(decode_frame(bgr), IMAGE)
+
+    yuv = cv2.cvtColor(IMAGE, cv2.COLOR_BGR2YUV_I420)
+    decoded = decode_frame(parse_frame(encode_frame(yuv.tobytes(), encoding=ENCODING_YUV420, width=width, height=height)))
+    assert np.array_equal(decoded, cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420))
+
+
+def test_decode_jpeg_and_bad_payloads():
+    _, jpeg = cv2.imencode('.jpg', IMAGE)
+    assert decode_frame(parse_frame(encode_frame(jpeg.tobytes()))).shape == IMAGE.shape
+    assert decode_frame(parse_frame(encode_frame(b'not a jpeg'))) is None
+    # Raw payloads must match the announced size
+    assert decode_frame(parse_frame(encode_frame(IMAGE.tobytes()[:-1], encoding=ENCODING_BGR, width=16, height=12))) is None
+    assert decode_frame(parse_frame(encode_frame(IMAGE.tobytes(), encoding=ENCODING_BGR))) is None
+
+
+def test_hello_negotiates_binary_frames():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_bytes(encode_frame(b''))
+        assert ws.receive_json()["status"] == "error"  # Binary frames need a hello first
+
+        ws.send_json({"type": "hello", "binary": True, "encodings": ["jpeg", "bgr"]})
+        reply = ws.receive_json()
+        assert (reply["status"], reply["mode"], reply["encodings"]) == ("protocol", "binary", ["jpeg", "bgr"])
+        assert reply["header_size"] == FRAME_HEADER_SIZE
+
+        ws.send_bytes(encode_frame(b'', encoding=ENCODING_YUV420))
+        assert ws.receive_json() == {"status": "detection_error", "message": "Frame encoding was not negotiated"}
+        ws.send_bytes(b'RBXF')
+        assert ws.receive_json()["status"] == "detection_error"
+
+
+def test_hello_without_a_common_encoding_stays_on_json():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "binary": True, "encodings": ["webp"]})
+        reply = ws.receive_json()
+        assert (reply["mode"], reply["encodings"], reply["version"]) == ("json", [], frame_protocol.FRAME_VERSION)
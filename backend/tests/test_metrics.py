@@ -0,0 +1,111 @@
+import base64
+import time
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.metrics import MetricsRegistry, REGISTRY
+from app.main import app
+from app.services.cube_state import SOLVED, apply_moves
+from app.services.solution_cache import SolutionCache
+from app.services.solver import Solver
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter(registry):
+    counter = registry.counter("test_total", "Things.", ("kind",))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    counter.inc("b")
+    assert counter.value("a") == 3
+    assert registry.render() == ('# HELP test_total Things.\n# TYPE test_total counter\n'
+                                 'test_total{kind="a"} 3\ntest_total{kind="b"} 1\n')
+
+
+def test_unlabeled_counter_starts_at_zero(registry):
+    registry.counter("test_total", "Things.")
+    assert registry.render().splitlines()[-1] == "test_total 0"
+
+
+def test_labels_must_match(registry):
+    counter = registry.counter("test_total", "Things.", ("kind",))
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_names_are_unique(registry):
+    registry.gauge("test_gauge", "A gauge.")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.counter("test_gauge", "Again.")
+
+
+def test_gauge(registry):
+    gauge = registry.gauge("test_gauge", "A gauge.")
+    gauge.set(1.5)
+    assert registry.render().splitlines()[-1] == "test_gauge 1.5"
+    gauge.set_function(lambda: 4)
+    assert registry.render().splitlines()[-1] == "test_gauge 4"
+
+
+def test_histogram(registry):
+    histogram = registry.histogram("test_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "decode")
+    assert histogram.count("decode") == 4
+    assert registry.render().splitlines()[2:] == [
+        'test_seconds_bucket{stage="decode",le="0.1"} 2',
+        'test_seconds_bucket{stage="decode",le="1"} 3',
+        'test_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'test_seconds_sum{stage="decode"} 3.65',
+        'test_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_histogram_times_blocks(registry):
+    histogram = registry.histogram("test_seconds", "Latency.", ("stage",))
+    with pytest.raises(RuntimeError):
+        with histogram.time("solve"):
+            raise RuntimeError
+    assert histogram.count("solve") == 1
+
+
+def test_solver_records_lookups_and_stage_time():
+    solver = Solver(cache=SolutionCache())
+    before = {source: metrics.SOLVER_LOOKUPS.value(source) for source in ("search", "cache", "invalid")}
+    solves = metrics.STAGE_SECONDS.count("solve")
+    state = apply_moves(SOLVED, "R U F' L2 D B'")
+    solver.solve(state)
+    solver.solve(state)
+    solver.solve("X" * 54)
+    assert {source: metrics.SOLVER_LOOKUPS.value(source) - count for source, count in before.items()} == {
+        "search": 1, "cache": 1, "invalid": 1}
+    assert metrics.STAGE_SECONDS.count("solve") == solves + 3
+
+
+def test_metrics_endpoint():
+    response = TestClient(app).get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert response.text == REGISTRY.render()
+    for name in ("rubix_stage_seconds", "rubix_active_sessions", "rubix_frames_received_total", "rubix_solver_lookups_total"):
+        assert f"# TYPE {name} " in response.text
+
+
+def test_every_answered_frame_is_timed():
+    frames = metrics.STAGE_SECONDS.count("frame")
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "frame", "data": base64.b64encode(b'not an image').decode()})
+        assert ws.receive_json()["status"] == "detection_error"
+        _, jpeg = cv2.imencode('.jpg', np.full((48, 64, 3), 110, np.uint8))
+        ws.send_json({"type": "frame", "data": base64.b64encode(jpeg.tobytes()).decode()})
+        assert ws.receive_json()["status"] == "no_cube"
+        deadline = time.perf_counter() + 1.0
+        while metrics.STAGE_SECONDS.count("frame") < frames + 2 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+    assert metrics.STAGE_SECONDS.count("frame") == frames + 2
@@ -0,0 +1,69 @@
+from app.services.cube_state import SOLVED, apply_moves, face_slice, invert_moves, is_solved
+from app.services.move_analyzer import MOVE_ANALYZER, SolveTracker
+
+SCRAMBLED = apply_moves(SOLVED, "R U2 F' L D B2")
+
+
+def test_expected_move_is_correct():
+    assert MOVE_ANALYZER.analyze_move(SCRAMBLED, apply_moves(SCRAMBLED, "U'"), "U'") == "correct"
+
+
+def test_other_move_is_wrong():
+    assert MOVE_ANALYZER.analyze_move(SCRAMBLED, apply_moves(SCRAMBLED, "U"), "U'") == "wrong"
+    assert MOVE_ANALYZER.analyze_move(SCRAMBLED, SCRAMBLED, "U'") == "wrong"
+
+
+def test_unknown_move_is_wrong(caplog):
+    with caplog.at_level("ERROR", logger="app.services.move_analyzer"):
+        assert MOVE_ANALYZER.analyze_move(SCRAMBLED, SCRAMBLED, "X") == "wrong"
+    assert any(record.message.startswith("Move analyzer error:") for record in caplog.records)
+
+
+def face(state, name='F'):
+    return state[face_slice(name)]
+
+
+def test_tracker_follows_the_solution():
+    solution = invert_moves("R U2 F' L D B2")
+    tracker = SolveTracker(SCRAMBLED, solution)
+    state = SCRAMBLED
+    for idx, move in enumerate(solution):
+        assert tracker.next_move == move
+        state = apply_moves(state, [move])
+        if tracker.step_visible():
+            expected = "solved" if idx == len(solution) - 1 else "correct"
+            assert tracker.observe(face(state)) == {"result": expected, "move": move}
+        else:
+            tracker.advance()
+    assert tracker.done
+    assert is_solved(state)
+    assert tracker.observe(face(state)) == {"result": "solved"}
+
+
+def test_tracker_waits_for_the_move():
+    tracker = SolveTracker(SCRAMBLED, ["F", "R"])
+    assert tracker.expected_face() == face(apply_moves(SCRAMBLED, "F"))
+    assert tracker.observe(face(SCRAMBLED)) == {"result": "waiting", "move": "F"}
+    assert tracker.position == 0
+
+
+def test_tracker_recovers_from_a_wrong_move():
+    tracker = SolveTracker(SCRAMBLED, ["F", "R"])
+    observation = tracker.observe(face(apply_moves(SCRAMBLED, "R")))
+    assert observation == {"result": "wrong", "move": "F", "performed": "R"}
+    # The wrong turn is undone first, then the solution carries on
+    assert tracker.moves == ["R'", "F", "R"]
+    assert tracker.observe(face(SCRAMBLED))["result"] == "correct"
+
+
+def test_tracker_reports_unknown_faces():
+    tracker = SolveTracker(SCRAMBLED, ["F"])
+    assert tracker.observe('UUUUUUUUU') == {"result": "unknown", "move": "F"}
+
+
+def test_moves_hidden_from_the_watched_face_need_confirmation():
+    tracker = SolveTracker(SCRAMBLED, ["B", "F"])
+    assert not tracker.step_visible()
+    assert tracker.observe(face(apply_moves(SCRAMBLED, "B")))["result"] == "waiting"
+    tracker.advance()
+    assert tracker.next_move == "F" and tracker.step_visible()
@@ -0,0 +1,148 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from app.api.frame_protocol import ENCODING_BGR, ENCODING_JPEG, ENCODING_YUV420, encode_frame, parse_frame
+from app.services.preprocess import Preprocessor, clamp_bbox, jpeg_size, target_scale
+
+IMAGE = cv2.resize(np.random.default_rng(2).integers(0, 256, (30, 40, 3), dtype=np.uint8), (1280, 960),
+                   interpolation=cv2.INTER_NEAREST)
+# Blocks larger than a thumbnail pixel, so subsampling and area averaging agree away from their edges
+BLOCKS = cv2.resize(np.random.default_rng(5).integers(0, 256, (6, 8, 3), dtype=np.uint8), (1280, 960),
+                    interpolation=cv2.INTER_NEAREST)
+
+
+def jpeg(img, quality=95):
+    return cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def json_frame(img, bbox=None):
+    data = {"data": base64.b64encode(jpeg(img)).decode()}
+    if bbox is not None:
+        data["cubeBbox"] = bbox
+    return data
+
+
+def binary_frame(img, encoding):
+    height, width = img.shape[:2]
+    if encoding == ENCODING_BGR:
+        payload = img.tobytes()
+    elif encoding == ENCODING_YUV420:
+        payload = cv2.cvtColor(img, cv2.COLOR_BGR2YUV_I420).tobytes()
+    else:
+        payload = jpeg(img)
+    return parse_frame(encode_frame(payload, encoding=encoding, width=width, height=height))
+
+
+def test_jpeg_size():
+    assert jpeg_size(jpeg(IMAGE)) == (1280, 960)
+    assert jpeg_size(cv2.imencode('.jpg', IMAGE, [cv2.IMWRITE_JPEG_PROGRESSIVE, 1])[1]) == (1280, 960)
+    assert jpeg_size(b'not a jpeg') is None
+    assert jpeg_size(jpeg(IMAGE)[:20]) is None
+
+
+@pytest.mark.parametrize("bbox, clamped", [
+    ((10, 20, 30, 40), (10, 20, 30, 40)),
+    ((-5, -5, 30, 40), (0, 0, 30, 40)),
+    ((90, 50, 30, 40), (90, 50, 10, 30)),
+    ((200, 200, 0, 0), (99, 79, 1, 1)),
+])
+def test_clamp_bbox(bbox, clamped):
+    assert clamp_bbox(bbox, 100, 80) == clamped
+
+
+@pytest.mark.parametrize("size, scale", [((640, 480), 1.0), ((1280, 960), 0.5), ((480, 960), 0.5), ((320, 240), 1.0)])
+def test_target_scale(size, scale):
+    assert target_scale(*size, 640, 480) == scale
+
+
+@pytest.mark.parametrize("kwargs", [{"stages": "resize,sharpen"}, {"blur_ksize": 4}])
+def test_rejects_bad_configuration(kwargs):
+    with pytest.raises(ValueError):
+        Preprocessor(**kwargs)
+
+
+def test_large_jpeg_is_decoded_reduced_to_the_output_size():
+    img = Preprocessor(stages="resize").process(json_frame(IMAGE))
+    assert img.shape == (480, 640, 3)
+    assert np.abs(img.astype(int) - cv2.resize(IMAGE, (640, 480)).astype(int)).mean() < 8
+
+
+def test_full_decode_matches_reduced_decode():
+    reduced = Preprocessor(stages="resize").process(json_frame(IMAGE))
+    full = Preprocessor(stages="resize", reduced_decode=False).process(json_frame(IMAGE))
+    assert reduced.shape == full.shape
+    assert np.abs(reduced.astype(int) - full.astype(int)).mean() < 8
+
+
+def test_bbox_is_cropped_before_resizing():
+    # The bbox is in source pixels; the crop keeps the source-to-output scale of the whole frame
+    img = Preprocessor(stages="resize").process(json_frame(IMAGE, bbox=[320, 240, 640, 480]))
+    assert img.shape == (240, 320, 3)
+    expected = cv2.resize(IMAGE[240:720, 320:960], (320, 240))
+    assert np.abs(img.astype(int) - expected.astype(int)).mean() < 8
+
+
+@pytest.mark.parametrize("encoding", [ENCODING_BGR, ENCODING_YUV420, ENCODING_JPEG])
+def test_binary_frames_are_cropped(encoding):
+    small = IMAGE[::4, ::4].copy()
+    img = Preprocessor(stages=()).process({"cubeBbox": [40, 30, 160, 120]}, binary_frame(small, encoding))
+    assert img.shape == (120, 160, 3)
+    # Chroma subsampling (YUV420, JPEG) only blurs colors along block edges
+    assert np.median(np.abs(img.astype(int) - small[30:150, 40:200].astype(int))) <= 4
+
+
+def test_contrast_and_blur_stages():
+    small = IMAGE[::4, ::4].copy()
+    img = Preprocessor(stages="contrast,blur", contrast=1.2, brightness=10, blur_ksize=3).process({}, binary_frame(small, ENCODING_BGR))
+    expected = cv2.GaussianBlur(cv2.convertScaleAbs(small, alpha=1.2, beta=10), (3, 3), 0)
+    assert np.array_equal(img, expected)
+
+
+def test_buffers_are_reused_between_frames():
+    preprocessor = Preprocessor(stages="contrast")
+    small = IMAGE[::4, ::4].copy()
+    first = preprocessor.process({}, binary_frame(small, ENCODING_BGR))
+    second = preprocessor.process({}, binary_frame(small, ENCODING_BGR))
+    assert np.shares_memory(first, second)
+
+
+@pytest.mark.parametrize("frame", [
+    ({"data": base64.b64encode(b'not an image').decode()}, None),
+    ({}, parse_frame(encode_frame(b'\x00' * 10, encoding=ENCODING_BGR, width=4, height=4))),
+    ({}, parse_frame(encode_frame(b'', encoding=ENCODING_YUV420, width=0, height=0))),
+])
+def test_undecodable_frames(frame):
+    assert Preprocessor().process(*frame) is None
+
+
+@pytest.mark.parametrize("encoding", [None, ENCODING_BGR, ENCODING_YUV420, ENCODING_JPEG])
+def test_thumbnail(encoding):
+    preprocessor = Preprocessor()
+    frame = ({}, binary_frame(BLOCKS, encoding)) if encoding is not None else (json_frame(BLOCKS),)
+    thumbnail = preprocessor.thumbnail(*frame, max_side=64)
+    assert thumbnail.shape == (48, 64, 3)
+    expected = cv2.resize(BLOCKS, (64, 48), interpolation=cv2.INTER_AREA)
+    assert np.median(np.abs(thumbnail.astype(int) - expected.astype(int))) <= 8
+
+
+@pytest.mark.parametrize("encoding", [None, ENCODING_BGR, ENCODING_YUV420, ENCODING_JPEG])
+def test_thumbnail_of_the_bbox(encoding):
+    preprocessor = Preprocessor()
+    bbox = [320, 240, 640, 480]
+    frame = ({"cubeBbox": bbox}, binary_frame(BLOCKS, encoding)) if encoding is not None else (json_frame(BLOCKS, bbox),)
+    thumbnail = preprocessor.thumbnail(*frame, max_side=32)
+    assert thumbnail.shape == (24, 32, 3)
+    expected = cv2.resize(BLOCKS[240:720, 320:960], (32, 24), interpolation=cv2.INTER_AREA)
+    assert np.median(np.abs(thumbnail.astype(int) - expected.astype(int))) <= 8
+
+
+@pytest.mark.parametrize("frame", [
+    ({"data": base64.b64encode(b'not an image').decode()}, None),
+    ({}, parse_frame(encode_frame(b'\x00' * 10, encoding=ENCODING_BGR, width=4, height=4))),
+    ({}, parse_frame(encode_frame(b'', encoding=ENCODING_YUV420, width=0, height=0))),
+])
+def test_undecodable_thumbnails(frame):
+    assert Preprocessor().thumbnail(*frame) is None
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+from app.api.frame_protocol import ENCODING_BGR, encode_frame, parse_frame
+from app.services.cube_detector import CubeDetector
+from app.services.preprocess import Preprocessor
+from app.services.presence_gate import ESCALATED, REJECTED, STATIC, PresenceGate
+
+STICKERS = [(30, 20, 190), (20, 110, 240), (40, 220, 230), (60, 170, 20), (170, 60, 10), (250, 250, 250)]
+
+
+def empty_frame(level=110):
+    return np.full((480, 640, 3), level, np.uint8)
+
+
+def cube_frame():
+    frame = empty_frame()
+    frame[120:360, 200:440] = 15
+    for idx in range(9):
+        row, col = divmod(idx, 3)
+        y, x = 120 + row * 80, 200 + col * 80
+        frame[y + 2:y + 78, x + 2:x + 78] = STICKERS[idx % len(STICKERS)]
+    return frame
+
+
+def check(gate, img, data=None):
+    height, width = img.shape[:2]
+    frame = parse_frame(encode_frame(img.tobytes(), encoding=ENCODING_BGR, width=width, height=height))
+    return gate.check(data or {}, frame)
+
+
+def test_cube_is_escalated():
+    assert check(PresenceGate(Preprocessor()), cube_frame()) == ESCALATED
+
+
+def test_empty_frames_are_rejected_then_static():
+    gate = PresenceGate(Preprocessor())
+    assert check(gate, empty_frame()) == REJECTED
+    assert check(gate, empty_frame(111)) == STATIC
+    # A change larger than the motion threshold is checked again
+    assert check(gate, empty_frame(140)) == REJECTED
+    assert gate.stats() == {STATIC: 1, REJECTED: 2, ESCALATED: 0}
+
+
+def test_absent_makes_the_escalated_frame_static():
+    gate = PresenceGate(Preprocessor())
+    assert check(gate, cube_frame()) == ESCALATED
+    assert check(gate, cube_frame()) == ESCALATED
+    gate.absent()
+    assert check(gate, cube_frame()) == STATIC
+
+
+def test_reset_forgets_the_reference():
+    gate = PresenceGate(Preprocessor())
+    check(gate, empty_frame())
+    gate.reset()
+    assert check(gate, empty_frame()) == REJECTED
+
+
+def test_bbox_limits_the_check():
+    gate = PresenceGate(Preprocessor())
+    assert check(gate, cube_frame(), {"cubeBbox": [0, 0, 150, 150]}) == REJECTED
+    assert check(gate, cube_frame(), {"cubeBbox": [200, 120, 240, 240]}) == ESCALATED
+
+
+def test_undecodable_frames_are_escalated():
+    gate = PresenceGate(Preprocessor())
+    assert gate.check({}, parse_frame(encode_frame(b'\x00' * 10, encoding=ENCODING_BGR, width=4, height=4))) == ESCALATED
+
+
+def test_frames_with_a_cube_are_never_rejected():
+    # The thumbnail thresholds are looser, so whatever the full check finds a cube on is escalated
+    detector = CubeDetector()
+    partial = empty_frame()
+    partial[140:340, 220:420] = STICKERS[0]  # One color over 13% of the frame
+    for frame in (cube_frame(), partial, cv2.GaussianBlur(cube_frame(), (31, 31), 0)):
+        assert detector.detect_presence(frame) == "cube_present"
+        assert check(PresenceGate(Preprocessor()), frame) == ESCALATED
@@ -0,0 +1,108 @@
+import asyncio
+import base64
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.executor import run_in_frame_executor
+from app.core.profiling import CURRENT_SESSION, ProfileCapture, active_capture, arm, disarm
+from app.main import app
+
+
+def busy_frame_job(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    metrics.observe_stage("classify", 0.002)
+    return total
+
+
+async def profile_frames(capture, frames=2, session_id=None):
+    arm(capture)
+    try:
+        for _ in range(frames):
+            token = CURRENT_SESSION.set(session_id)
+            try:
+                await run_in_frame_executor(busy_frame_job)
+            finally:
+                CURRENT_SESSION.reset(token)
+            if capture.matches():
+                capture.frame_done()
+        return await capture.wait()
+    finally:
+        disarm(capture)
+
+
+@pytest.mark.parametrize("kwargs", [{"mode": "perf"}, {"frames": 0}])
+def test_rejects_bad_parameters(kwargs):
+    with pytest.raises(ValueError):
+        ProfileCapture(**kwargs)
+
+
+def test_capture_length_is_capped():
+    assert ProfileCapture(seconds=10**6).seconds == ProfileCapture().seconds
+
+
+def test_sampling_collects_frame_executor_stacks():
+    result = asyncio.run(profile_frames(ProfileCapture("sampling", frames=2, interval_ms=1)))
+    assert result["frames"] == 2
+    assert result["samples"] > 0
+    assert "frame_executor;" in result["collapsed"]
+    assert "busy_frame_job" in result["collapsed"]
+    assert result["stages"]["classify"]["count"] == 2
+    assert result["stages"]["classify"]["mean_ms"] == pytest.approx(2.0)
+
+
+def test_cprofile_reports_top_functions():
+    result = asyncio.run(profile_frames(ProfileCapture("cprofile", frames=1)))
+    assert result["mode"] == "cprofile"
+    assert any("busy_frame_job" in row["function"] for row in result["functions"])
+    assert "collapsed" not in result
+
+
+def test_session_capture_ignores_other_sessions():
+    capture = ProfileCapture("sampling", frames=1, seconds=0.2, session_id=7)
+    result = asyncio.run(profile_frames(capture, session_id=8))
+    assert result["frames"] == 0
+    assert result["stages"] == {}
+    assert result["samples"] == 0
+
+
+def test_only_one_capture_is_armed():
+    first = arm(ProfileCapture("cprofile"))
+    try:
+        assert active_capture() is first
+        assert metrics.stage_hook == first.record_stage
+        with pytest.raises(RuntimeError, match="already running"):
+            arm(ProfileCapture("cprofile"))
+    finally:
+        disarm(first)
+    assert active_capture() is None
+    assert metrics.stage_hook is None
+
+
+def test_undecodable_frames_count_towards_a_capture():
+    capture = arm(ProfileCapture("cprofile", frames=2))
+    try:
+        with TestClient(app).websocket_connect("/ws") as ws:
+            for _ in range(2):
+                ws.send_json({"type": "frame", "data": base64.b64encode(b'not an image').decode()})
+                assert ws.receive_json()["status"] == "detection_error"
+            deadline = time.perf_counter() + 1.0
+            while capture.frames_seen < 2 and time.perf_counter() < deadline:
+                time.sleep(0.01)
+        assert capture.frames_seen == 2
+    finally:
+        disarm(capture)
+
+
+def test_profile_endpoint():
+    client = TestClient(app)
+    result = client.post("/profile", params={"seconds": 0.05}).json()
+    assert (result["status"], result["mode"], result["frames"]) == ("success", "sampling", 0)
+    assert client.post("/profile", params={"mode": "perf"}).json()["status"] == "error"
+    assert client.post("/profile", params={"session_id": 12345}).json()["message"] == "No active session 12345"
+    assert client.post("/profile", params={"seconds": 0.05, "format": "collapsed"}).headers["content-type"].startswith("text/plain")
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import frame_protocol, session as session_module
+from app.api.recording import (
+    DIRECTION_IN, DIRECTION_OUT, FILE_HEADER, RECORD_HEADER, RECORDING_MAGIC, Recording, RecordingWriter,
+)
+from app.main import app
+from app.tools import loadgen
+from benchmarks import make_recording
+
+
+def write_recording(path):
+    with RecordingWriter(str(path)) as writer:
+        writer.write(DIRECTION_IN, '{"type": "hello"}', 0.0)
+        writer.write(DIRECTION_IN, b'\x00\x01frame', 0.25)
+        writer.write(DIRECTION_OUT, '{"status": "no_cube"}', 0.3)
+    return path
+
+
+def test_round_trip(tmp_path):
+    with Recording(str(write_recording(tmp_path / "session.rbxr"))) as recording:
+        assert len(recording) == 3
+        assert recording.duration == 0.3
+        hello, frame, answer = recording
+        assert (hello.offset, hello.direction, hello.data, hello.binary) == (0.0, DIRECTION_IN, '{"type": "hello"}', False)
+        assert frame.binary and bytes(frame.data) == b'\x00\x01frame'
+        assert answer.direction == DIRECTION_OUT
+        assert [message.offset for message in recording.messages()] == [0.0, 0.25]
+        assert len(recording.messages(None)) == 3
+        assert recording[-1].data == '{"status": "no_cube"}'
+        del frame  # Binary payloads are views into the mapping
+
+
+def test_writer_timestamps_messages(tmp_path):
+    with RecordingWriter(str(tmp_path / "session.rbxr")) as writer:
+        writer.write(DIRECTION_IN, "first")
+        writer.write(DIRECTION_IN, "second")
+    with Recording(writer.path) as recording:
+        first, second = recording
+        assert 0 <= first.offset <= second.offset < 1
+        assert recording.started == pytest.approx(writer.started)
+
+
+def test_truncated_last_record_is_skipped(tmp_path):
+    path = write_recording(tmp_path / "session.rbxr")
+    data = path.read_bytes()
+    path.write_bytes(data[:-5])
+    with Recording(str(path)) as recording:
+        assert len(recording) == 2
+
+
+@pytest.mark.parametrize("content, error", [
+    (b'RBX', "too short"),
+    (FILE_HEADER.pack(b'NOPE', 1, 0.0), "not a session recording"),
+    (FILE_HEADER.pack(RECORDING_MAGIC, 9, 0.0), "version"),
+])
+def test_rejects_other_files(tmp_path, content, error):
+    path = tmp_path / "other.rbxr"
+    path.write_bytes(content)
+    with pytest.raises(ValueError, match=error):
+        Recording(str(path))
+
+
+def test_record_layout(tmp_path):
+    data = write_recording(tmp_path / "session.rbxr").read_bytes()
+    assert data[:4] == RECORDING_MAGIC
+    assert RECORD_HEADER.unpack_from(data, FILE_HEADER.size) == (len('{"type": "hello"}'), 0.0, DIRECTION_IN, 0)
+
+
+def test_make_recording(tmp_path):
+    path = str(tmp_path / "scan.rbxr")
+    assert make_recording.main(["-o", path, "--frames-per-face", "2", "--fps", "4"]) == 0
+    with Recording(path) as recording:
+        hello, *frames = recording.messages()
+        assert json.loads(hello.data)["binary"] is True
+        assert len(frames) == 12
+        parsed = [frame_protocol.parse_frame(frame.data) for frame in frames]
+        assert [frame.frame_id for frame in parsed] == list(range(12))
+        assert frames[-1].offset == pytest.approx(3.0)
+        assert frame_protocol.decode_frame(parsed[0]).shape == (480, 640, 3)
+        del frames, parsed
+
+
+def test_loadgen_asks_for_frame_ids(tmp_path):
+    with Recording(str(write_recording(tmp_path / "session.rbxr"))) as recording:
+        prepared = loadgen._prepare(recording.messages())
+        assert [kind for _, kind, _ in prepared] == ["hello", "binary"]
+        assert json.loads(prepared[0][2]) == {"type": "hello", "frame_ids": True}
+        del prepared
+    frame = type("Message", (), {"binary": False, "offset": 0.5, "data": '{"type": "frame", "data": ""}'})
+    assert [kind for _, kind, _ in loadgen._prepare([frame])] == ["hello", "frame"]
+
+
+def test_loadgen_report():
+    client = loadgen.ClientStats(0, "scan.rbxr")
+    client.frames_sent, client.frames_answered, client.latencies = 4, 3, [0.01, 0.02, 0.03]
+    result = loadgen.report([client], elapsed=1.5)
+    assert (result["frames_dropped"], result["throughput_fps"]) == (1, 2.0)
+    assert result["latency"]["p50_ms"] == 20.0
+    assert loadgen.percentiles([]) == {}
+
+
+def test_sessions_are_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_module, "SESSION_RECORDING_DIR", str(tmp_path))
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "frame_ids": True})
+        ws.receive_json()
+        ws.send_json({"type": "frame", "data": "bm90IGFuIGltYWdl", "frame_id": 41})
+        assert ws.receive_json() == {"status": "detection_error", "message": "Failed to decode image", "frame_id": 41}
+    recording_path, = tmp_path.iterdir()
+    with Recording(str(recording_path)) as recording:
+        directions = [message.direction for message in recording]
+        assert directions == [DIRECTION_IN, DIRECTION_OUT, DIRECTION_IN, DIRECTION_OUT]
+        assert json.loads(recording[-1].data)["frame_id"] == 41
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from app.services.detector_backends import OpenCVBackend
+from app.services.roi_tracker import RoiTracker, bbox_iou
+
+
+def cube_frame(x, y, size=100):
+    img = np.full((480, 640, 3), 128, np.uint8)
+    img[y:y+size, x:x+size] = 20
+    return img
+
+
+class RecordingLocator:
+    """
+    OpenCV contour backend that records the size of every image it searches.
+    """
+
+    def __init__(self):
+        self.backend = OpenCVBackend()
+        self.calls = []
+
+    def __call__(self, img):
+        self.calls.append(img.shape[:2])
+        return self.backend.locate(img)
+
+
+def near(bbox, expected, tolerance=3):
+    return bbox is not None and all(abs(a - b) <= tolerance for a, b in zip(bbox, expected))
+
+
+@pytest.mark.parametrize("a, b, iou", [
+    ((0, 0, 10, 10), (0, 0, 10, 10), 1.0),
+    ((0, 0, 10, 10), (5, 0, 10, 10), 50 / 150),
+    ((0, 0, 10, 10), (10, 0, 10, 10), 0.0),
+    ((0, 0, 10, 10), (20, 20, 5, 5), 0.0),
+])
+def test_bbox_iou(a, b, iou):
+    assert bbox_iou(a, b) == pytest.approx(iou)
+    assert bbox_iou(b, a) == pytest.approx(iou)
+
+
+def test_first_frame_is_searched_in_full():
+    tracker, locate = RoiTracker(), RecordingLocator()
+    assert near(tracker.locate(cube_frame(200, 100), locate), (200, 100, 100, 100))
+    assert locate.calls == [(480, 640)]
+    assert tracker.stats()["full_searches"] == 1
+
+
+def test_following_frames_search_the_window():
+    tracker, locate = RoiTracker(padding=0.25), RecordingLocator()
+    tracker.locate(cube_frame(200, 100), locate)
+    assert near(tracker.locate(cube_frame(210, 105), locate), (210, 105, 100, 100))
+    assert len(locate.calls) == 2 and locate.calls[1][0] < 200
+    assert tracker.stats() == {"hits": 1, "misses": 0, "full_searches": 1, "hit_rate": 1.0}
+
+
+def test_cube_leaving_the_window_triggers_a_full_search():
+    tracker, locate = RoiTracker(padding=0.25), RecordingLocator()
+    tracker.locate(cube_frame(200, 100), locate)
+    assert near(tracker.locate(cube_frame(450, 300), locate), (450, 300, 100, 100))
+    assert locate.calls[-1] == (480, 640)
+    assert tracker.stats()["misses"] == 1
+    assert tracker.stats()["full_searches"] == 2
+
+
+def test_window_clamped_to_frame_edges_still_counts():
+    tracker, locate = RoiTracker(padding=0.25), RecordingLocator()
+    tracker.locate(cube_frame(0, 0), locate)
+    assert near(tracker.locate(cube_frame(0, 0), locate), (0, 0, 100, 100))
+    assert tracker.stats()["hits"] == 1
+
+
+def test_low_overlap_triggers_a_full_search():
+    tracker, locate = RoiTracker(padding=0.25, min_iou=0.9), RecordingLocator()
+    tracker.locate(cube_frame(200, 100), locate)
+    assert near(tracker.locate(cube_frame(210, 110, 80), locate), (210, 110, 80, 80))
+    assert tracker.stats()["misses"] == 1
+
+
+def test_lost_cube_and_reset():
+    tracker, locate = RoiTracker(), RecordingLocator()
+    tracker.locate(cube_frame(200, 100), locate)
+    assert tracker.locate(np.full((480, 640, 3), 128, np.uint8), locate) is None
+    assert tracker.bbox is None
+    tracker.locate(cube_frame(200, 100), locate)
+    tracker.reset()
+    tracker.locate(cube_frame(200, 100), locate)
+    assert locate.calls[-1] == (480, 640)
+
+
+def test_zero_padding_disables_tracking():
+    tracker, locate = RoiTracker(padding=0), RecordingLocator()
+    tracker.locate(cube_frame(200, 100), locate)
+    tracker.locate(cube_frame(200, 100), locate)
+    assert locate.calls == [(480, 640), (480, 640)]
+    assert tracker.stats()["hit_rate"] == 0.0
+
+
+def test_new_frame_size_triggers_a_full_search():
+    tracker, locate = RoiTracker(), RecordingLocator()
+    tracker.locate(cube_frame(200, 100), locate)
+    tracker.locate(cube_frame(100, 50)[:240, :320], locate)
+    assert locate.calls[-1] == (240, 320)
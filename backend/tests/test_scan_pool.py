@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.main import app
+from app.services import scan_pool
+from app.services.cube_state import apply_moves, is_solved
+from app.services.scan_pool import _scan_chunk, create_scan_pool, iter_units, scan_many, scan_stream
+from app.tools import scan_batch
+from benchmarks.render import Scene, random_state, render_face, render_net
+
+FACE = 'RGBOYWRGB'
+NET_SCENE = Scene(width=360, height=240, scale=1.0)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with create_scan_pool(1) as pool:
+        yield pool
+
+
+def write_video(path, frames=7):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for idx in range(frames):
+        writer.write(np.full((48, 64, 3), idx * 30, np.uint8))
+    writer.release()
+
+
+@pytest.fixture
+def nets(tmp_path):
+    # Two readable nets, in a subdirectory, and a file that is not an image
+    rng = np.random.default_rng(1)
+    states = {}
+    (tmp_path / "nets").mkdir()
+    for name in ("a.png", "b.png"):
+        states[name] = random_state(rng)
+        cv2.imwrite(str(tmp_path / "nets" / name), render_net(rng, states[name], NET_SCENE))
+    (tmp_path / "nets" / "notes.txt").write_text("not an image")
+    return tmp_path, states
+
+
+def test_iter_units_walks_directories(tmp_path, nets):
+    write_video(tmp_path / "clip.avi")
+    units = list(iter_units([str(tmp_path)], every=2, segment_frames=3))
+    assert units == [
+        ("video", str(tmp_path / "clip.avi"), 0, 3, 2),
+        ("video", str(tmp_path / "clip.avi"), 3, 6, 2),
+        ("video", str(tmp_path / "clip.avi"), 6, 7, 2),
+        ("image", str(tmp_path / "nets" / "a.png")),
+        ("image", str(tmp_path / "nets" / "b.png")),
+    ]
+
+
+def test_files_named_explicitly_are_scanned(tmp_path):
+    path = str(tmp_path / "notes.txt")
+    assert list(iter_units([path])) == [("image", path)]
+
+
+def test_unreadable_video_is_one_unit(tmp_path):
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(b"not a video")
+    assert list(iter_units([str(path)], every=0)) == [("video", str(path), 0, None, 1)]
+
+
+def test_video_segments_scan_every_nth_frame(tmp_path):
+    write_video(tmp_path / "clip.avi")
+    results = []
+    for unit in iter_units([str(tmp_path / "clip.avi")], every=2, segment_frames=3):
+        results += _scan_chunk([unit], "face", False, None)
+    assert [result["frame"] for result in results] == [0, 2, 4, 6]
+    assert [result["id"] for result in results] == [f"{tmp_path / 'clip.avi'}#{idx}" for idx in (0, 2, 4, 6)]
+    assert all(result["error"] is None and result["status"] for result in results)
+
+
+def test_face_mode_reports_the_face(tmp_path):
+    path = str(tmp_path / "face.png")
+    cv2.imwrite(path, render_face(np.random.default_rng(0), FACE, Scene()))
+    [result] = _scan_chunk([("image", path)], "face", False, None)
+    assert (result["status"], result["face"], result["error"]) == ("face_detected", FACE, None)
+    assert len(result["bbox"]) == 4 and result["elapsed_ms"] > 0
+
+
+def test_unreadable_image_is_reported(nets):
+    root, _ = nets
+    [result] = _scan_chunk([("image", str(root / "nets" / "notes.txt"))], "net", False, None)
+    assert result["error"] == "Cannot read image"
+    assert (result["state"], result["moves"]) == (None, None)
+
+
+def test_unknown_profile_fails_every_frame(nets):
+    root, _ = nets
+    results = _scan_chunk([("image", str(root / "nets" / "a.png"))], "net", False, "no-such-profile")
+    assert results[0]["error"] == "No calibration profile no-such-profile"
+
+
+def test_scan_many_reads_and_solves_nets(pool, nets):
+    root, states = nets
+    results = list(scan_many(iter_units([str(root)]), pool, solve=True, chunk_size=1))
+    assert sorted(result["source"] for result in results) == [str(root / "nets" / name) for name in ("a.png", "b.png")]
+    for result in results:
+        state = states[result["source"].rsplit("/", 1)[1]]
+        assert (result["state"], result["error"], result["frame"]) == (state, None, None)
+        assert is_solved(apply_moves(result["state"], result["moves"]))
+        assert result["length"] == len(result["moves"])
+
+
+def test_bad_options_are_rejected_before_scanning(pool):
+    with pytest.raises(ValueError, match="Unknown scan mode"):
+        next(scan_many([], pool, mode="cube"))
+    with pytest.raises(ValueError, match="No calibration profile"):
+        next(scan_many([], pool, profile_id="no-such-profile"))
+
+
+def test_scan_stream(pool, nets):
+    root, states = nets
+
+    async def collect():
+        return [result async for result in scan_stream(iter_units([str(root)]), pool=pool, chunk_size=1, max_pending=1)]
+
+    results = asyncio.run(collect())
+    assert sorted(result["state"] for result in results) == sorted(states.values())
+
+
+def test_scan_batch_endpoint(pool, nets, monkeypatch):
+    root, states = nets
+    client = TestClient(app)
+    monkeypatch.setattr(routes, "SCAN_BATCH_ROOT", None)
+    assert client.post("/scan/batch", json={}).json()["status"] == "error"
+
+    monkeypatch.setattr(routes, "SCAN_BATCH_ROOT", str(root))
+    monkeypatch.setattr(scan_pool, "_scan_pool", pool)
+    response = client.post("/scan/batch", json={"paths": ["nets"]})
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(result["state"] for result in results) == sorted(states.values())
+    assert client.post("/scan/batch", json={"paths": ["../"]}).json()["message"].startswith("No such path")
+    assert client.post("/scan/batch", json={"mode": "cube"}).json()["message"].startswith("Unknown scan mode")
+
+
+def test_scan_batch_tool(nets, capsys):
+    root, states = nets
+    output = root / "states.ndjson"
+    assert scan_batch.main([str(root / "nets"), "-o", str(output), "-w", "1"]) == 0
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(result["state"] for result in results) == sorted(states.values())
+    assert "2 frames (2 scanned, 0 failed)" in capsys.readouterr().err
+    assert scan_batch.main([str(root / "nets"), "--profile", "no-such-profile", "-w", "1"]) == 2
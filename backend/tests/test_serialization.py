@@ -0,0 +1,41 @@
+import importlib
+import json
+import sys
+
+import numpy as np
+import pytest
+
+from app.core import serialization
+
+MESSAGE = {"status": "face_detected", "message": "✓ Front face scanned", "bbox": [np.int32(3), np.int64(4), 5, 6],
+           "agreement": np.float32(0.5), "confidence": np.array([0.25, 1.0]), "moves": ["R", "U'"]}
+EXPECTED = {"status": "face_detected", "message": "✓ Front face scanned", "bbox": [3, 4, 5, 6], "agreement": 0.5,
+            "confidence": [0.25, 1.0], "moves": ["R", "U'"]}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def dumps(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        yield serialization.dumps
+        return
+    # Reload the module as if orjson were not installed
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    fallback = importlib.reload(serialization)
+    assert fallback.ENCODER == "json"
+    yield fallback.dumps
+    monkeypatch.undo()
+    importlib.reload(serialization)
+
+
+def test_messages_are_compact_utf8(dumps):
+    payload = dumps(MESSAGE)
+    assert isinstance(payload, bytes)
+    assert json.loads(payload) == EXPECTED
+    assert b", " not in payload and b": " not in payload
+    assert "✓".encode() in payload
+
+
+def test_unknown_objects_are_rejected(dumps):
+    with pytest.raises(TypeError):
+        dumps({"status": object()})
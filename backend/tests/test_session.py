@@ -0,0 +1,264 @@
+import base64
+import json
+import threading
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import flow_control
+from app.api import session as session_module
+from app.main import app
+from app.services.cube_state import SOLVED, apply_moves, face_slice, is_solved
+
+# Sticker colors (BGR) inside the detector's default ranges
+STICKER_BGR = {'R': (30, 20, 190), 'O': (20, 110, 240), 'Y': (40, 220, 230), 'G': (60, 170, 20),
+               'B': (170, 60, 10), 'W': (250, 250, 250)}
+# Sticker color of each face letter in the scan orientation (yellow top, white bottom)
+FACE_COLORS = str.maketrans('URFDLB', 'YRGWOB')
+SCAN_FACES = [('front', 'F'), ('right', 'R'), ('back', 'B'), ('left', 'L'), ('top', 'U'), ('bottom', 'D')]
+SCRAMBLED = apply_moves(SOLVED, "R U2 F' L D B2 R' U F2 D' L2 B")
+# Statuses a frame can be answered with, whatever the session is doing
+FRAME_ANSWERS = ("no_cube", "cube_detected", "face_pending", "face_detected", "face_not_detected", "face_already_scanned",
+                 "move_correct", "move_wrong", "move_pending", "move_unrecognized", "tracking_complete")
+
+
+def face_frame(colors: str, sticker: int = 80) -> np.ndarray:
+    # A flat 3x3 face on a gray background
+    frame = np.full((480, 640, 3), 110, np.uint8)
+    top, left = 240 - 3 * sticker // 2, 320 - 3 * sticker // 2
+    frame[top:top + 3 * sticker, left:left + 3 * sticker] = 15
+    for idx, color in enumerate(colors):
+        row, col = divmod(idx, 3)
+        y, x = top + row * sticker, left + col * sticker
+        frame[y + 2:y + sticker - 2, x + 2:x + sticker - 2] = STICKER_BGR[color]
+    return frame
+
+
+def face_colors(state: str, face: str) -> str:
+    return state[face_slice(face)].translate(FACE_COLORS)
+
+
+def send_frame(ws, img, **fields):
+    _, jpeg = cv2.imencode('.jpg', img)
+    ws.send_json({"type": "frame", "data": base64.b64encode(jpeg.tobytes()).decode(), **fields})
+
+
+def receive_until(ws, *statuses):
+    # Messages up to the first with one of the statuses (diagnostics in between are skipped over)
+    messages = []
+    while True:
+        messages.append(ws.receive_json())
+        if messages[-1]["status"] in statuses:
+            return messages
+
+
+def scan_face(ws, colors):
+    # Holds the face in view until it is committed; returns the messages answering each frame
+    answers = []
+    while len(answers) < 10:
+        send_frame(ws, face_frame(colors))
+        answers.append(receive_until(ws, "face_pending", "face_detected", "face_not_detected", "face_already_scanned")[-1])
+        if answers[-1]["status"] == "face_detected":
+            return answers
+    raise AssertionError(f"face {colors} was not committed: {answers}")
+
+
+def test_scan_run_end_to_end():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        send_frame(ws, np.full((480, 640, 3), 110, np.uint8))
+        assert receive_until(ws, "no_cube", "cube_detected")[-1]["status"] == "no_cube"
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        assert receive_until(ws, "no_cube", "cube_detected")[-1]["status"] == "cube_detected"
+
+        for name, face in SCAN_FACES:
+            answers = scan_face(ws, face_colors(SCRAMBLED, face))
+            # A steady face is committed once the consensus window agrees, on its third frame
+            assert [answer["status"] for answer in answers] == ["face_pending", "face_pending", "face_detected"]
+            detected = answers[-1]
+            assert (detected["status"], detected["face"], detected["colors"]) == ("face_detected", name, face_colors(SCRAMBLED, face))
+        messages = receive_until(ws, "solution_ready")
+        moves = messages[-1]["moves"]
+        assert is_solved(apply_moves(SCRAMBLED, moves))
+        # The anytime solver reports every shorter solution; guidance starts from the last one
+        improved = [message["moves"] for message in messages if message["status"] == "solution_improved"]
+        assert improved and improved[-1] == moves
+
+        # Guided solve: the front face is watched while the moves are performed
+        started = receive_until(ws, "tracking_started")[-1]
+        assert (started["moves"], started["next_move"]) == (moves, moves[0])
+        if started["needs_confirmation"]:
+            ws.send_json({"type": "confirm_move"})
+        else:
+            send_frame(ws, face_frame(face_colors(apply_moves(SCRAMBLED, moves[:1]), 'F')))
+        correct = receive_until(ws, "move_correct")[-1]
+        assert (correct["move_index"], correct["next_move"]) == (1, moves[1])
+
+
+def test_held_face_is_committed_once():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        assert receive_until(ws, "no_cube", "cube_detected")[-1]["status"] == "cube_detected"
+        front = face_colors(SCRAMBLED, 'F')
+        answers = []
+        for _ in range(7):
+            send_frame(ws, face_frame(front))
+            answers.append(receive_until(ws, "face_pending", "face_detected", "face_already_scanned")[-1])
+        # The votes start over after the commit, and agree on the same face again
+        assert [answer["status"] for answer in answers] == ["face_pending", "face_pending", "face_detected",
+                                                            "face_pending", "face_pending", "face_already_scanned",
+                                                            "face_already_scanned"]
+        assert (answers[-1]["face"], answers[-1]["scanned_face"]) == ("right", "front")
+        # Turning the cube to the next face carries on with the scan
+        answers = scan_face(ws, face_colors(SCRAMBLED, 'R'))
+        assert (answers[-1]["status"], answers[-1]["face"]) == ("face_detected", "right")
+
+
+def test_misread_sticker_is_repaired():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        receive_until(ws, "no_cube", "cube_detected")
+        for name, face in SCAN_FACES:
+            colors = face_colors(SCRAMBLED, face)
+            if face == 'R':
+                # One corner sticker is read as the color of the one next to it
+                colors = colors[:2] + colors[1] + colors[3:]
+            scan_face(ws, colors)
+        messages = receive_until(ws, "solution_ready")
+        repaired = next(message for message in messages if message["status"] == "scan_repaired")
+        assert repaired["stickers"] == [{"face": "right", "index": 2, "from": face_colors(SCRAMBLED, 'R')[1],
+                                         "to": face_colors(SCRAMBLED, 'R')[2]}]
+        assert is_solved(apply_moves(SCRAMBLED, messages[-1]["moves"]))
+
+
+@pytest.mark.parametrize("stage", ["validate", "solve"])
+def test_rescan_while_the_scan_completes(stage, monkeypatch):
+    # The completed scan is held in the frame executor, while validating it (the repair search) or
+    # while solving it without a budget, until the rescan has been handled
+    started, release = threading.Event(), threading.Event()
+
+    def held(function):
+        def wrapper(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return function(*args, **kwargs)
+        return wrapper
+
+    if stage == "validate":
+        monkeypatch.setattr(session_module, "repair_state", held(session_module.repair_state))
+    else:
+        monkeypatch.setattr(session_module, "SOLVER_BUDGET_MS", 0)
+        solver = session_module.get_solver()
+        monkeypatch.setattr(solver, "solve", held(solver.solve))
+    with TestClient(app).websocket_connect("/ws") as ws:
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        receive_until(ws, "no_cube", "cube_detected")
+        for _, face in SCAN_FACES:
+            colors = face_colors(SCRAMBLED, face)
+            if face == 'R':
+                colors = colors[:2] + colors[1] + colors[3:]  # Needs a repair
+            scan_face(ws, colors)
+        assert started.wait(5)
+        ws.send_json({"type": "rescan"})
+        messages = receive_until(ws, "scan_restarted")
+        release.set()
+        assert messages[-1]["face"] == "front"
+        # The superseded scan neither reports a solution nor wipes the restarted one, so the next
+        # frame is read as the front face (rather than a presence check or a guided solve move)
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        messages = receive_until(ws, *FRAME_ANSWERS)
+        assert [message["status"] for message in messages] == ["face_pending"]
+        assert messages[-1]["face"] == "front"
+
+
+def test_rescan_of_one_face():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        receive_until(ws, "no_cube", "cube_detected")
+        for _, face in SCAN_FACES[:2]:
+            scan_face(ws, face_colors(SCRAMBLED, face))
+        ws.send_json({"type": "rescan", "face": "sideways"})
+        assert receive_until(ws, "error")[-1]["message"] == "Invalid face to rescan."
+        ws.send_json({"type": "rescan", "face": "front"})
+        assert receive_until(ws, "scan_restarted")[-1]["face"] == "front"
+        assert scan_face(ws, face_colors(SCRAMBLED, 'F'))[-1]["face"] == "front"
+        # The right face is still scanned, so the scan carries on with the back face
+        assert scan_face(ws, face_colors(SCRAMBLED, 'B'))[-1]["face"] == "back"
+
+
+def test_debug_messages_are_opt_in():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello"})
+        assert ws.receive_json()["debug"] is False
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        assert ws.receive_json()["status"] == "cube_detected"
+        ws.send_json({"type": "hello", "debug": True})
+        ws.receive_json()
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        assert [ws.receive_json()["status"], ws.receive_json()["status"]] == ["face_pending", "debug_info"]
+
+
+def test_batched_binary_responses():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "batch": True, "binary_responses": True, "frame_ids": True, "debug": True})
+        hello = json.loads(ws.receive_bytes())
+        assert (hello["batch"], hello["responses"]) == (True, "binary")
+        _, jpeg = cv2.imencode('.jpg', face_frame(face_colors(SCRAMBLED, 'F')))
+        ws.send_json({"type": "frame", "data": base64.b64encode(jpeg.tobytes()).decode(), "frame_id": 5})
+        result = json.loads(ws.receive_bytes())
+        assert (result["status"], result["frame_id"]) == ("frame_result", 5)
+        assert [message["status"] for message in result["messages"]] == ["cube_detected"]
+
+
+def test_bad_frames_are_reported():
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "frame", "data": base64.b64encode(b'not an image').decode()})
+        assert receive_until(ws, "detection_error")[-1]["message"] == "Failed to decode image"
+        ws.send_json({"type": "frame", "data": "", "cubeBbox": [1, 2]})
+        assert receive_until(ws, "error")[-1]["message"].startswith("Invalid cubeBbox")
+        ws.send_json({"type": "frame", "data": "", "crop": [0.5, 0.5, 0, 1]})
+        assert receive_until(ws, "error")[-1]["message"].startswith("Invalid crop")
+
+
+def test_session_reports_its_frame_buffers():
+    with TestClient(app) as client, client.websocket_connect("/ws") as ws:
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        assert receive_until(ws, "no_cube", "cube_detected")[-1]["status"] == "cube_detected"
+        sessions = client.get("/sessions").json()["sessions"]
+    assert len(sessions) == 1 and sessions[0]["buffer_bytes"] > 0
+
+
+def test_empty_frames_are_answered_from_thumbnails():
+    with TestClient(app) as client, client.websocket_connect("/ws") as ws:
+        for _ in range(2):
+            send_frame(ws, np.full((480, 640, 3), 110, np.uint8))
+            assert receive_until(ws, "no_cube", "cube_detected")[-1]["status"] == "no_cube"
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')))
+        assert receive_until(ws, "no_cube", "cube_detected")[-1]["status"] == "cube_detected"
+        session = client.get("/sessions").json()["sessions"][0]
+    assert session["presence_gate"] == {"static": 1, "rejected": 1, "escalated": 1}
+    assert session["frames_processed"] == 3
+
+
+def test_flow_control_roi_is_in_full_frame_coordinates(monkeypatch):
+    monkeypatch.setattr(flow_control, "FLOW_UPDATE_INTERVAL", 0.0)
+    crop = [0.1, 0.1, 0.8, 0.8]
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "flow_control": True})
+        assert receive_until(ws, "flow_control")[-1]["roi"] is None
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')), crop=crop)
+        assert receive_until(ws, "cube_detected")[-1]["status"] == "cube_detected"
+        send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')), crop=crop)
+        assert receive_until(ws, "face_pending")[-1]["status"] == "face_pending"
+        roi = receive_until(ws, "flow_control")[-1]["roi"]
+        # The face fills the middle of the cropped frame, so of the middle of the crop
+        x, y, w, h = roi
+        assert 0.1 < x < 0.5 < x + w < 0.9 and 0.1 < y < 0.5 < y + h < 0.9
+        for _ in range(10):
+            send_frame(ws, face_frame(face_colors(SCRAMBLED, 'F')), crop=crop)
+            messages = receive_until(ws, "face_pending", "face_detected")
+            if messages[-1]["status"] == "face_detected":
+                break
+        # Once a face is committed the cube is turned, so the ROI goes back to the whole camera frame
+        assert [message["roi"] for message in messages if message["status"] == "flow_control"][-1] is None
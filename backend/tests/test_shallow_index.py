@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.cube_state import SOLVED, apply_moves, is_solved
+from app.services.shallow_index import INDEX_HEADER, ShallowIndex, build_index, decode_path, write_index
+from app.services.solution_cache import SolutionCache
+from app.services.solver import Solver
+
+DEPTH = 3
+# Distinct states within 0..3 face turns of solved (with the redundant sequences pruned)
+STATES_BY_DEPTH = [1, 18, 243, 3240]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("index") / "shallow.idx")
+    keys, paths = build_index(DEPTH, block_size=100)
+    write_index(path, DEPTH, keys, paths)
+    return ShallowIndex(path)
+
+
+def test_index_holds_every_shallow_state(index):
+    assert len(index) == sum(STATES_BY_DEPTH)
+    assert all(index.keys[1:] > index.keys[:-1])
+
+
+@pytest.mark.parametrize("scramble", ["", "R", "U2", "R U F'", "F2 B L'", "D L D'"])
+def test_lookup_returns_an_optimal_solution(index, scramble):
+    state = apply_moves(SOLVED, scramble)
+    solution = index.lookup(state)
+    assert solution is not None
+    assert is_solved(apply_moves(state, solution))
+    assert len(solution) == len(scramble.split())
+
+
+def test_lookup_misses_deeper_states(index):
+    assert index.lookup(apply_moves(SOLVED, "R U F' L2")) is None
+    assert index.stats()["misses"] >= 1
+
+
+def test_concurrent_lookups_are_all_counted(index):
+    before = index.stats()
+    states = [apply_moves(SOLVED, "R U"), apply_moves(SOLVED, "R U F' L2")] * 200
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(index.lookup, states))
+    after = index.stats()
+    assert after["hits"] - before["hits"] == 200
+    assert after["misses"] - before["misses"] == 200
+
+
+def test_paths_round_trip(index):
+    for packed in index.paths[:50]:
+        moves = decode_path(int(packed))
+        assert len(moves) <= DEPTH
+        assert index.lookup(apply_moves(SOLVED, moves)) is not None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(b"\0" * INDEX_HEADER.size)
+    with pytest.raises(ValueError):
+        ShallowIndex(str(path))
+    with pytest.raises(ValueError):
+        build_index(7)
+
+
+def test_solver_answers_shallow_states_from_the_index(index):
+    cache = SolutionCache(maxsize=4)
+    solver = Solver(cache=cache, shallow_index=index)
+    assert solver.solve(apply_moves(SOLVED, "R U")) == ["U'", "R'"]
+    # Rotated and recolored states are looked up by their canonical form
+    assert solver.solve(apply_moves(SOLVED, "R U").translate(str.maketrans('URFDLB', 'WRGYOB'))) == ["U'", "R'"]
+    assert cache.stats()["size"] == 0
+    deep = apply_moves(SOLVED, "R U F' L2 D")
+    assert is_solved(apply_moves(deep, solver.solve(deep)))
+    assert cache.stats()["size"] == 1
@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.services.cube_state import FACES, ROTATIONS, SOLVED, apply_moves, is_solved
+from app.services.solution_cache import SolutionCache
+from app.services.solver import Solver
+
+SCRAMBLED = apply_moves(SOLVED, "R U2 F' L D B2 R' U F2 D' L2 B")
+
+
+def rotate(state, rotation):
+    return ''.join(np.array(list(state))[rotation])
+
+
+def test_lru_eviction():
+    cache = SolutionCache(maxsize=2)
+    cache.put('a', ['R'])
+    cache.put('b', ['U'])
+    assert cache.get('a') == ['R']  # 'a' is now the most recent entry
+    cache.put('c', ['F'])
+    assert cache.get('b') is None
+    assert cache.get('c') == ['F']
+    stats = cache.stats()
+    assert (stats["size"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 2, 1)
+
+
+def test_rotated_and_recolored_repeats_hit_the_cache():
+    cache = SolutionCache(maxsize=16)
+    solver = Solver(cache=cache)
+    assert is_solved(apply_moves(SCRAMBLED, solver.solve(SCRAMBLED)))
+    assert cache.stats()["size"] == 1
+
+    for rotation in ROTATIONS[::5]:
+        repeat = rotate(SCRAMBLED, rotation).translate(str.maketrans(FACES, 'WRGYOB'))
+        assert is_solved(apply_moves(repeat, solver.solve(repeat)))
+    stats = cache.stats()
+    assert stats["size"] == 1
+    assert stats["hits"] == len(ROTATIONS[::5])
+
+
+def test_solutions_persist_on_disk(tmp_path):
+    path = str(tmp_path / "solutions.db")
+    moves = Solver(cache=SolutionCache(maxsize=4, path=path)).solve(SCRAMBLED)
+
+    reopened = SolutionCache(maxsize=4, path=path)
+    assert Solver(cache=reopened).solve(SCRAMBLED) == moves
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["misses"], stats["persistent"]) == (1, 0, True)
+
+
+def test_unsolvable_states_are_not_cached():
+    cache = SolutionCache(maxsize=4)
+    miscolored = SOLVED[:8] + 'R' + SOLVED[9:]
+    assert Solver(cache=cache).solve(miscolored) == []
+    assert cache.stats()["size"] == 0
+
+
+def test_invalid_states_are_logged(caplog):
+    miscolored = SOLVED[:8] + 'R' + SOLVED[9:]
+    with caplog.at_level("ERROR", logger="app.services.solver"):
+        assert Solver(cache=SolutionCache(maxsize=4)).solve(miscolored) == []
+    assert any(record.message.startswith("Solver error:") for record in caplog.records)
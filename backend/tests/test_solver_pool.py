@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import solver_pool
+from app.services.cube_state import SOLVED, apply_moves, is_solved
+from app.services.solver import Solver
+from app.services.solver_pool import create_solver_pool, parse_batch_item, solve_many, solve_stream
+
+STATES = [apply_moves(SOLVED, scramble) for scramble in ("R U F'", "L2 D B", "F R' U2 L")]
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with create_solver_pool(2) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize("line, item", [
+    (SOLVED, (3, SOLVED)),
+    (f"  {SOLVED}\n".encode(), (3, SOLVED)),
+    (json.dumps(SOLVED), (3, SOLVED)),
+    (json.dumps({"id": "a", "state": SOLVED}), ("a", SOLVED)),
+    ({"state": SOLVED}, (3, SOLVED)),
+    ({"id": 9}, (9, "")),
+])
+def test_parse_batch_item(line, item):
+    assert parse_batch_item(line, 3) == item
+
+
+def check_results(results, states):
+    assert sorted(result["id"] for result in results) == list(range(len(states)))
+    for result in results:
+        state = states[result["id"]]
+        assert result["state"] == state
+        if result["error"] is None:
+            assert is_solved(apply_moves(state, result["moves"]))
+            assert result["length"] == len(result["moves"])
+        else:
+            assert (result["moves"], result["length"]) == (None, None)
+
+
+def test_solve_many_reports_each_state(pool):
+    states = STATES + ["not a cube"]
+    results = list(solve_many(enumerate(states), pool, chunk_size=2))
+    check_results(results, states)
+    assert [result["id"] for result in results if result["error"]] == [3]
+
+
+def test_solve_stream_consumes_an_async_iterable(pool):
+    async def items():
+        for item in enumerate(STATES):
+            yield item
+
+    async def collect():
+        return [result async for result in solve_stream(items(), pool, chunk_size=1, max_pending=1)]
+    check_results(asyncio.run(collect()), STATES)
+
+
+def test_batch_endpoint_streams_ndjson(pool, monkeypatch):
+    monkeypatch.setattr(solver_pool, "_solver_pool", pool)
+    client = TestClient(app)
+    response = client.post("/solve/batch", json=STATES)
+    check_results([json.loads(line) for line in response.text.splitlines()], STATES)
+
+    body = "\n".join(json.dumps({"id": idx, "state": state}) for idx, state in enumerate(STATES))
+    response = client.post("/solve/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    check_results([json.loads(line) for line in response.text.splitlines()], STATES)
+
+
+@pytest.mark.parametrize("body, message", [
+    ("[not json", "Invalid JSON body"),
+    (json.dumps({"state": SOLVED}), "Expected a JSON array of states"),
+])
+def test_batch_endpoint_rejects_malformed_bodies(body, message):
+    response = TestClient(app).post("/solve/batch", content=body, headers={"content-type": "application/json"})
+    assert response.json()["status"] == "error"
+    assert response.json()["message"].startswith(message)
+
+
+def test_solver_raises_errors_on_request():
+    solver = Solver()
+    assert solver.solve("not a cube") == []
+    with pytest.raises(ValueError):
+        solver.solve("not a cube", raise_errors=True)
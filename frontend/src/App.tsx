@@ -1,5 +1,5 @@
 import { useState, useEffect, useRef } from 'react'
-import CameraFeed, { CameraFeedRef } from './components/CameraFeed'
+import CameraFeed, { CameraFeedRef, FlowControl } from './components/CameraFeed'
 import AlgorithmDisplay from './components/AlgorithmDisplay'
 import VideoInputDropdown from './components/VideoInputDropdown'
 import Calibration from './components/Calibration'
@@ -17,9 +17,15 @@ interface ScannedFace {
 
 import LoadingPage from './components/LoadingPage'
 
+// Calibrations are saved per camera on the backend, so reconnects skip recalibration
+const calibrationProfileId = (deviceId: string) =>
+  `camera:${(deviceId || 'default').replace(/[^A-Za-z0-9_.:=+-]/g, '_').slice(0, 120)}`
+
 function App() {
   const [status, setStatus] = useState('Connecting to server...')
   const [moves, setMoves] = useState<string[]>([])
+  const [currentMove, setCurrentMove] = useState(0)
+  const [needsMoveConfirmation, setNeedsMoveConfirmation] = useState(false)
   const [isWsOpen, setIsWsOpen] = useState(false)
   const [selectedDeviceId, setSelectedDeviceId] = useState('')
   const [calibratedColors, setCalibratedColors] = useState<Record<string, RGB>>({
@@ -42,9 +48,21 @@ function App() {
   const [scanningPhase, setScanningPhase] = useState(false)
   const [currentFaceIndex, setCurrentFaceIndex] = useState(0)
   const [scanProgress, setScanProgress] = useState(0)
+  const [binaryFrames, setBinaryFrames] = useState(false)
+  const [flowControl, setFlowControl] = useState<FlowControl | null>(null)
 
   const wsRef = useRef<WebSocket | null>(null)
   const cameraRef = useRef<CameraFeedRef>(null)
+  const selectedDeviceIdRef = useRef(selectedDeviceId)
+
+  // Switch to the calibration profile of the newly selected camera
+  useEffect(() => {
+    if (selectedDeviceIdRef.current === selectedDeviceId) return
+    selectedDeviceIdRef.current = selectedDeviceId
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'use_calibration_profile', profile_id: calibrationProfileId(selectedDeviceId) }))
+    }
+  }, [selectedDeviceId])
 
   // Backend readiness check
   useEffect(() => {
@@ -80,6 +98,7 @@ function App() {
     let attempt = 1
     const maxAttempts = 5
     let ws: WebSocket | null = null
+    let busyRetryAfter: number | null = null  // Seconds, set when the backend turned this connection away
 
     const connectWebSocket = () => {
       if (attempt > maxAttempts) {
@@ -89,16 +108,37 @@ function App() {
       }
 
       ws = new WebSocket('ws://localhost:8000/ws')
+      ws.binaryType = 'arraybuffer'
       wsRef.current = ws
 
       ws.onopen = () => {
+        // Ask the backend for binary JPEG frames instead of base64 JSON, and for one binary
+        // message per processed frame instead of one per status
+        ws?.send(JSON.stringify({ type: 'hello', binary: true, encodings: ['jpeg'], flow_control: true,
+                                  batch: true, binary_responses: true,
+                                  calibration_profile: calibrationProfileId(selectedDeviceIdRef.current) }))
         setIsWsOpen(true)
         setStatus('Place the cube in front of the camera')
       }
 
-      ws.onmessage = (event) => {
-        const data = JSON.parse(event.data)
+      const handleMessage = (data: any) => {
         switch (data.status) {
+          case 'protocol':
+            setBinaryFrames(data.mode === 'binary')
+            if (data.calibration_profile?.loaded) {
+              setCalibrationMessage('Saved calibration loaded for this camera')
+            }
+            break
+          case 'calibration_profile':
+            setCalibrationMessage(data.message || '')
+            break
+          case 'flow_control':
+            setFlowControl(data)
+            break
+          case 'server_busy':
+            busyRetryAfter = data.retry_after
+            setStatus(data.message || 'The server is busy, retrying shortly.')
+            break
           case 'face_not_detected':
             setCubeBbox(null)
             setStatus(data.message || 'Detection failed: No cube detected. Try better lighting or adjust cube angle.')
@@ -168,14 +208,58 @@ function App() {
             }
             setStatus(data.message || `✓ ${data.face} face scanned successfully`)
             break
+          case 'face_pending':
+            // Face seen but not committed yet: the backend waits for several frames to agree
+            if (data.bbox) {
+              setCubeBbox(data.bbox)
+            }
+            setStatus(data.message || 'Hold the face steady...')
+            break
+          case 'face_already_scanned':
+            // The face in view was scanned before: usually the cube has not been turned yet
+            if (data.bbox) {
+              setCubeBbox(data.bbox)
+            }
+            setStatus(data.message || 'This face was already scanned. Turn the cube to the next face.')
+            break
           case 'scan_complete':
             setScanningPhase(false)
             setStatus(data.message || 'All faces scanned. Generating solution...' )
             break
+          case 'solution_improved':
+            // The backend is still looking for a shorter solution; show the best one so far
+            setMoves(data.moves || [])
+            setStatus(data.message || '')
+            break
+          case 'scan_restarted':
+            setMoves([])
+            setScanningPhase(true)
+            setStatus(data.message || '')
+            break
           case 'solution_ready':
             setMoves(data.moves || [])
+            setCurrentMove(0)
             setStatus(data.message || 'Solution found!' )
             break
+          case 'tracking_started':
+          case 'move_wrong':
+            setMoves(data.moves || [])
+            setCurrentMove(data.move_index ?? 0)
+            setNeedsMoveConfirmation(!!data.needs_confirmation)
+            setStatus(data.message || '')
+            break
+          case 'move_correct':
+          case 'move_pending':
+            setCurrentMove(data.move_index ?? 0)
+            setNeedsMoveConfirmation(!!data.needs_confirmation)
+            setStatus(data.message || '')
+            break
+          case 'tracking_complete':
+          case 'tracking_stopped':
+            setCurrentMove(data.move_index ?? 0)
+            setNeedsMoveConfirmation(false)
+            setStatus(data.message || '')
+            break
           case 'no_cube':
             setScanningPhase(false)
             setStatus(data.message || "No cube detected. Please place the Rubik's Cube in front of the camera." )
@@ -190,10 +274,28 @@ function App() {
         }
       }
 
+      const decoder = new TextDecoder()
+      ws.onmessage = (event) => {
+        const data = JSON.parse(typeof event.data === 'string' ? event.data : decoder.decode(event.data))
+        // A frame_result holds everything the backend answered to one frame, in order
+        for (const message of data.status === 'frame_result' ? data.messages : [data]) {
+          handleMessage(message)
+        }
+      }
+
       ws.onclose = () => {
+        setBinaryFrames(false)
+        setFlowControl(null)
+        setIsWsOpen(false)
+        if (busyRetryAfter !== null) {
+          // Turned away by admission control: not a failure, retry when the backend suggests
+          const delay = busyRetryAfter * 1000
+          busyRetryAfter = null
+          setTimeout(connectWebSocket, delay)
+          return
+        }
         attempt++
         setStatus('Connection lost. Retrying...')
-        setIsWsOpen(false)
         const delay = Math.min(3000 * 2 ** (attempt - 1), 30000) // exponential backoff max 30s
         setTimeout(connectWebSocket, delay)
       }
@@ -222,9 +324,20 @@ function App() {
     }
   }
 
+  // Confirm a guided-solve move the camera cannot see
+  const handleConfirmMove = () => {
+    if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'confirm_move' }))
+    }
+  }
+
   // Rescan face handler
   const handleRescanFace = (face: string) => {
     setScannedFaces(prev => prev.filter(f => f.face !== face))
+    // Also abandons a solve the backend may be running for the old scan
+    if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'rescan', face }))
+    }
   }
 
   // Dismiss error/warning handler
@@ -271,14 +384,26 @@ function App() {
         </h1>
         <div className="flex flex-col items-center justify-center gap-8">
           <section className="w-full max-w-3xl">
-            <AlgorithmDisplay moves={moves} currentMove={0} />
+            <AlgorithmDisplay moves={moves} currentMove={currentMove} />
+            {needsMoveConfirmation && (
+              <div className="mt-4 text-center">
+                <button
+                  onClick={handleConfirmMove}
+                  className="px-4 py-2 rounded-lg bg-blue-600 hover:bg-blue-500 text-white font-semibold"
+                >
+                  Confirm {moves[currentMove]} done
+                </button>
+              </div>
+            )}
           </section>
           <CameraFeed
             ref={cameraRef}
             ws={wsRef.current}
             wsOpen={isWsOpen}
+            binaryFrames={binaryFrames}
             deviceId={selectedDeviceId}
             cubeBbox={cubeBbox}
+            flowControl={flowControl}
             scanningPhase={scanningPhase}
             currentFaceIndex={currentFaceIndex}
             scanProgress={scanProgress}
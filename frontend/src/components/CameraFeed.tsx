@@ -1,24 +1,95 @@
 import { useRef, useEffect, forwardRef, useImperativeHandle, useState } from 'react'
 
+// Binary frame header, mirrors backend/app/api/frame_protocol.py (32 bytes, little-endian)
+const FRAME_HEADER_SIZE = 32
+const FRAME_VERSION = 1
+const ENCODING_JPEG = 0
+const FLAG_CLIENT_CROP = 0x2
+const CROP_UNITS = 10000
+
+// crop: region of the full video frame the payload was cut from, normalized to 0-1 (null for all of it)
+const encodeBinaryFrame = (payload: Uint8Array, frameId: number, timestamp: number, crop: number[] | null): ArrayBuffer => {
+  const buffer = new ArrayBuffer(FRAME_HEADER_SIZE + payload.byteLength)
+  const view = new DataView(buffer)
+  view.setUint8(0, 0x52)  // 'R'
+  view.setUint8(1, 0x42)  // 'B'
+  view.setUint8(2, 0x58)  // 'X'
+  view.setUint8(3, 0x46)  // 'F'
+  view.setUint8(4, FRAME_VERSION)
+  view.setUint8(5, ENCODING_JPEG)
+  view.setUint16(6, crop ? FLAG_CLIENT_CROP : 0, true)  // frames are already cropped client-side, no bbox
+  view.setUint32(8, frameId >>> 0, true)
+  view.setFloat64(12, timestamp, true)
+  // The bbox fields (20..27) carry the client crop; width/height (28..31) stay zero for JPEG payloads
+  if (crop) {
+    crop.forEach((v, i) => view.setUint16(20 + i * 2, Math.min(CROP_UNITS, Math.max(0, Math.round(v * CROP_UNITS))), true))
+  }
+  new Uint8Array(buffer, FRAME_HEADER_SIZE).set(payload)
+  return buffer
+}
+
+// Targets sent by the backend in "flow_control" messages; roi is normalized to the full video frame
+export interface FlowControl {
+  fps: number
+  max_width: number
+  max_height: number
+  jpeg_quality: number
+  roi: [number, number, number, number] | null
+  level: 'normal' | 'degraded' | 'overloaded'
+}
+
+// Used until the backend sends its first flow_control message
+const DEFAULT_FLOW: FlowControl = { fps: 4, max_width: 320, max_height: 240, jpeg_quality: 0.7, roi: null, level: 'normal' }
+
 interface CameraFeedProps {
   ws: WebSocket | null
   wsOpen: boolean
+  binaryFrames?: boolean
   deviceId?: string
   cubeBbox?: [number, number, number, number]  // x, y, w, h
   scanningPhase?: boolean
   currentFaceIndex?: number
   scanProgress?: number
+  flowControl?: FlowControl | null
 }
 
 export interface CameraFeedRef {
   capture: () => void
 }
 
-const CameraFeed = forwardRef<CameraFeedRef, CameraFeedProps>(({ ws, wsOpen, deviceId, cubeBbox, scanningPhase, currentFaceIndex, scanProgress }, ref) => {
+const CameraFeed = forwardRef<CameraFeedRef, CameraFeedProps>(({ ws, wsOpen, binaryFrames, deviceId, cubeBbox, scanningPhase, currentFaceIndex, scanProgress, flowControl }, ref) => {
   const videoRef = useRef<HTMLVideoElement>(null)
   const canvasRef = useRef<HTMLCanvasElement>(null)
   const overlayRef = useRef<HTMLCanvasElement>(null)
   const [isVideoReady, setIsVideoReady] = useState(false)
+  const frameIdRef = useRef(0)
+  // Region of the video sent to the backend (x, y, w, h in video pixels), null for the whole frame
+  const cropRef = useRef<[number, number, number, number] | null>(null)
+  const lastRoiRef = useRef<string | null>(null)
+  const flow = flowControl || DEFAULT_FLOW
+
+  // The backend's ROI is in full video frame coordinates: every frame reports the crop it was cut
+  // from, so the backend can widen the ROI again as well as narrow it
+  useEffect(() => {
+    const video = videoRef.current
+    const roi = flowControl?.roi || null
+    const roiKey = roi ? roi.join(',') : null
+    if (roiKey === lastRoiRef.current) return  // Only the rate or size changed
+    lastRoiRef.current = roiKey
+    if (!roi || !video || video.videoWidth === 0) {
+      cropRef.current = null
+      return
+    }
+    const [rx, ry, rw, rh] = roi
+    const [vw, vh] = [video.videoWidth, video.videoHeight]
+    cropRef.current = [rx * vw, ry * vh, Math.max(1, rw * vw), Math.max(1, rh * vh)]
+  }, [flowControl])
+
+  // A new camera has a different field of view
+  useEffect(() => {
+    cropRef.current = null
+    lastRoiRef.current = null
+  }, [deviceId])
 
   // Removed capture method as automatic sending is sufficient
 
@@ -65,52 +136,6 @@ const CameraFeed = forwardRef<CameraFeedRef, CameraFeedProps>(({ ws, wsOpen, dev
     checkCameraAvailability()
   }, [])
 
-  useEffect(() => {
-    if (!wsOpen || !ws || ws.readyState !== WebSocket.OPEN) {
-      console.log('WebSocket not ready for sending frames:', { wsOpen, wsReadyState: ws?.readyState })
-      return
-    }
-
-    const interval = setInterval(() => {
-      if (videoRef.current && canvasRef.current && ws.readyState === WebSocket.OPEN && isVideoReady && videoRef.current.videoWidth > 0) {
-        const canvas = canvasRef.current
-        const ctx = canvas.getContext('2d')
-        if (ctx) {
-          const [x, y, w, h] = cubeBbox || [0, 0, videoRef.current.videoWidth, videoRef.current.videoHeight]
-          // Limit size to max 320x240 while preserving aspect ratio
-          let width = w
-          let height = h
-          const maxWidth = 320
-          const maxHeight = 240
-          const aspectRatio = w / h
-          if (width > maxWidth) {
-            width = maxWidth
-            height = maxWidth / aspectRatio
-          }
-          if (height > maxHeight) {
-            height = maxHeight
-            width = maxHeight * aspectRatio
-          }
-          canvas.width = width
-          canvas.height = height
-          ctx.clearRect(0, 0, width, height)
-          ctx.drawImage(videoRef.current, x, y, w, h, 0, 0, width, height)
-          const dataURL = canvas.toDataURL('image/jpeg', 0.7)
-          const base64 = dataURL.split(',')[1]
-          console.log('Sending frame automatically, canvas size:', width, height)
-          ws.send(JSON.stringify({ type: 'frame', data: base64 }))
-          console.log('Frame sent')
-        } else {
-          console.log('No canvas context')
-        }
-      } else {
-        console.log('Not sending: video ready?', isVideoReady, 'video width:', videoRef.current?.videoWidth, 'ws ready:', ws.readyState)
-      }
-    }, 250) // Send frame every 250ms (4fps)
-
-    return () => clearInterval(interval)
-  }, [ws, wsOpen, isVideoReady, cubeBbox])
-
   // Draw grid overlay when cubeBbox changes
   useEffect(() => {
     if (overlayRef.current && cubeBbox) {
@@ -229,10 +254,7 @@ const CameraFeed = forwardRef<CameraFeedRef, CameraFeedProps>(({ ws, wsOpen, dev
     draw()
   }, [cubeBbox, scanningPhase, currentFaceIndex, scanProgress])
 
-  // Modify frame capture to crop to cubeBbox if available
-  // Removed capture method
-
-  // Modify automatic frame sending to crop to cubeBbox if available
+  // Send frames at the rate, size, quality and crop asked for by the backend
   useEffect(() => {
     if (!wsOpen || !ws || ws.readyState !== WebSocket.OPEN) {
       return
@@ -243,12 +265,12 @@ const CameraFeed = forwardRef<CameraFeedRef, CameraFeedProps>(({ ws, wsOpen, dev
         const canvas = canvasRef.current
         const ctx = canvas.getContext('2d')
         if (ctx) {
-          const [x, y, w, h] = cubeBbox || [0, 0, videoRef.current.videoWidth, videoRef.current.videoHeight]
-          // Limit size to max 320x240 while preserving aspect ratio
+          const [x, y, w, h] = cropRef.current || [0, 0, videoRef.current.videoWidth, videoRef.current.videoHeight]
+          // Limit size to the requested maximum while preserving aspect ratio
           let width = w
           let height = h
-          const maxWidth = 320
-          const maxHeight = 240
+          const maxWidth = flow.max_width
+          const maxHeight = flow.max_height
           const aspectRatio = w / h
           if (width > maxWidth) {
             width = maxWidth
@@ -262,15 +284,27 @@ const CameraFeed = forwardRef<CameraFeedRef, CameraFeedProps>(({ ws, wsOpen, dev
           canvas.height = height
           ctx.clearRect(0, 0, width, height)
           ctx.drawImage(videoRef.current, x, y, w, h, 0, 0, width, height)
-          const dataURL = canvas.toDataURL('image/jpeg', 0.7)
-          const base64 = dataURL.split(',')[1]
-          ws.send(JSON.stringify({ type: 'frame', data: base64 }))
+          const [vw, vh] = [videoRef.current.videoWidth, videoRef.current.videoHeight]
+          const crop = cropRef.current ? [x / vw, y / vh, w / vw, h / vh] : null
+          if (binaryFrames) {
+            const frameId = frameIdRef.current++
+            const timestamp = performance.now()
+            canvas.toBlob(async (blob) => {
+              if (!blob || ws.readyState !== WebSocket.OPEN) return
+              const jpeg = new Uint8Array(await blob.arrayBuffer())
+              ws.send(encodeBinaryFrame(jpeg, frameId, timestamp, crop))
+            }, 'image/jpeg', flow.jpeg_quality)
+          } else {
+            const dataURL = canvas.toDataURL('image/jpeg', flow.jpeg_quality)
+            const base64 = dataURL.split(',')[1]
+            ws.send(JSON.stringify(crop ? { type: 'frame', data: base64, crop } : { type: 'frame', data: base64 }))
+          }
         }
       }
-    }, 250)
+    }, 1000 / flow.fps)
 
     return () => clearInterval(interval)
-  }, [ws, wsOpen, isVideoReady, cubeBbox])
+  }, [ws, wsOpen, isVideoReady, binaryFrames, flow.fps, flow.max_width, flow.max_height, flow.jpeg_quality])
 
 
   return (